@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+"""
+Non-interactive batch search, it is the implementation of the ``fr query``
+command.
+
+Each input line is ``dataset<TAB>query``, the dataset can also be an alias
+(see :mod:`findref.router`). Blank lines and lines starting with ``#`` are
+skipped. Each query is preprocessed like the interactive UI does, and the
+output is one JSON object per input query, in the input order::
+
+    {"line": 1, "dataset": "boto3", "query": "s3 put_object", "error": null,
+     "results": [{"title": "...", "subtitle": "...", "url": "https://..."}]}
+
+The index of each dataset is built once before searching. Large batches are
+split into chunks and searched by a process pool, each worker opens the
+indexes once and reuses them for all of its chunks.
+"""
+
+import typing as T
+import sys
+import json
+import dataclasses
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from . import models
+from . import router
+from .query import preprocess_query
+from .registry import DataSetRegistry
+from .paths import dir_index, dir_cache
+
+
+T_RECORD = T.Dict[str, T.Any]
+
+
+@dataclasses.dataclass
+class BatchQuery:
+    """
+    One query of the batch.
+
+    :param line: the line number in the input, starting from 1.
+    :param dataset: the dataset name, None if it is not a known dataset.
+    :param query: the raw query, it is preprocessed before searching.
+    :param error: the error message if the line can't be searched.
+    """
+
+    line: int
+    dataset: T.Optional[str]
+    query: str
+    error: T.Optional[str] = None
+
+    def to_record(
+        self,
+        results: T.Optional[T.List[T.Dict[str, str]]] = None,
+        error: T.Optional[str] = None,
+    ) -> T_RECORD:
+        return {
+            "line": self.line,
+            "dataset": self.dataset,
+            "query": self.query,
+            "error": error or self.error,
+            "results": results or [],
+        }
+
+
+def parse_line(line_no: int, line: str) -> BatchQuery:
+    """
+    Parse a ``dataset<TAB>query`` line.
+    """
+    line = line.rstrip("\r\n")
+    if "\t" not in line:
+        return BatchQuery(
+            line=line_no,
+            dataset=None,
+            query=line,
+            error="expect 'dataset<TAB>query'",
+        )
+    name, query = line.split("\t", 1)
+    dataset = router.resolve(name.strip())
+    if dataset is None:
+        return BatchQuery(
+            line=line_no,
+            dataset=None,
+            query=query,
+            error=f"unknown dataset {name.strip()!r}",
+        )
+    return BatchQuery(line=line_no, dataset=dataset, query=query)
+
+
+def parse_lines(lines: T.Iterable[str]) -> T.List[BatchQuery]:
+    return [
+        parse_line(line_no, line)
+        for line_no, line in enumerate(lines, start=1)
+        if line.strip() and (line.startswith("#") is False)
+    ]
+
+
+def search_one(
+    registry: DataSetRegistry,
+    query: BatchQuery,
+    limit: int = 5,
+) -> T_RECORD:
+    """
+    Search one query with the warm dataset of the registry, it never builds
+    the index.
+    """
+    if query.error is not None:
+        return query.to_record()
+    try:
+        ds = registry.get(query.dataset)
+        dct_list = ds.search_index(query=preprocess_query(query.query), limit=limit)
+        doc_class = models.get_doc_class(query.dataset)
+        results = list()
+        for dct in dct_list:
+            doc = doc_class.from_dict(dct)
+            results.append(
+                {"title": doc.title, "subtitle": doc.subtitle, "url": doc.arg}
+            )
+    except Exception as e:
+        return query.to_record(error=f"{e!r}")
+    return query.to_record(results=results)
+
+
+# the registry of the worker process, created once by the initializer
+_worker_registry: T.Optional[DataSetRegistry] = None
+
+
+def _init_worker(dir_index: Path, dir_cache: Path):  # pragma: no cover
+    global _worker_registry
+    _worker_registry = DataSetRegistry(dir_index=dir_index, dir_cache=dir_cache)
+
+
+def _search_chunk(
+    queries: T.List[BatchQuery],
+    limit: int,
+) -> T.List[T_RECORD]:  # pragma: no cover
+    return [search_one(_worker_registry, query, limit=limit) for query in queries]
+
+
+def prepare_indexes(
+    registry: DataSetRegistry,
+    datasets: T.Iterable[str],
+) -> T.Dict[str, str]:
+    """
+    Build the index of the given datasets if it is missing or expired.
+
+    :return: the dataset name -> the error message of the failed datasets.
+    """
+    errors = dict()
+    for dataset in datasets:
+        try:
+            ds = registry.get(dataset)
+            if ds.is_fresh() is False:
+                ds.refresh_index(multi_thread=False)
+                registry.invalidate(dataset)
+        except Exception as e:
+            errors[dataset] = f"failed to create index: {e!r}"
+    return errors
+
+
+def run_batch(
+    lines: T.Iterable[str],
+    limit: int = 5,
+    processes: T.Optional[int] = None,
+    chunk_size: int = 200,
+    dir_index: Path = dir_index,
+    dir_cache: Path = dir_cache,
+    registry: T.Optional[DataSetRegistry] = None,
+) -> T.Iterable[T_RECORD]:
+    """
+    Search all queries, yield the result records in the input order.
+
+    :param limit: the max number of results per query.
+    :param processes: number of worker processes, default is the number of
+        CPU. The batch is searched in this process if it is 1, or if there
+        are less than two chunks.
+    :param chunk_size: number of queries per worker task.
+    :param registry: where to get the warm dataset objects in this process,
+        default is a new registry on ``dir_index`` and ``dir_cache``.
+    """
+    if registry is None:
+        registry = DataSetRegistry(dir_index=dir_index, dir_cache=dir_cache)
+    queries = parse_lines(lines)
+    errors = prepare_indexes(
+        registry,
+        dict.fromkeys(query.dataset for query in queries if query.error is None),
+    )
+    for query in queries:
+        if query.dataset in errors:
+            query.error = errors[query.dataset]
+
+    if (processes == 1) or (len(queries) < 2 * chunk_size):
+        for query in queries:
+            yield search_one(registry, query, limit=limit)
+        return
+
+    chunks = [queries[i : i + chunk_size] for i in range(0, len(queries), chunk_size)]
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_worker,
+        initargs=(registry.dir_index, registry.dir_cache),
+    ) as pool:
+        for records in pool.map(_search_chunk, chunks, [limit] * len(chunks)):
+            yield from records
+
+
+def write_jsonl(records: T.Iterable[T_RECORD], stream: T.TextIO) -> T.Tuple[int, int]:
+    """
+    Write one JSON object per line.
+
+    :return: number of records and number of records with an error.
+    """
+    n_records, n_errors = 0, 0
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        n_records += 1
+        if record["error"] is not None:
+            n_errors += 1
+    stream.flush()
+    return n_records, n_errors
+
+
+def query(
+    path: T.Optional[str] = None,
+    output: T.Optional[str] = None,
+    limit: int = 5,
+    processes: T.Optional[int] = None,
+) -> T.Tuple[int, int]:
+    """
+    Read the queries from the file or stdin, write the JSON Lines to the
+    output file or stdout.
+
+    :return: number of records and number of records with an error.
+    """
+    if (path is None) or (path == "-"):
+        lines = sys.stdin.readlines()
+    else:
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+    records = run_batch(lines, limit=limit, processes=processes)
+    if output is None:
+        return write_jsonl(records, sys.stdout)
+    with open(output, "w", encoding="utf-8") as f:
+        return write_jsonl(records, f)
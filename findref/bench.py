@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+
+"""
+Reproducible benchmark of index build, query latency and memory per dataset,
+it is the implementation of the ``fr bench`` command.
+
+Nothing is downloaded. For each dataset, a fixture release with synthetic
+documents is generated from a fixed random seed and written in the
+compressed release format, then each dataset is benchmarked in a fresh
+process:
+
+- ``parse_time``: decode the fixture release into documents, in seconds.
+- ``build_time``: build the index from the parsed documents, in seconds.
+- ``index_size``: the size of the index on disk, in bytes.
+- ``latency``: p50 / p95 / p99 / mean latency of a replayed query corpus, in
+  milliseconds. The corpus mimics typing: prefixes of words taken from the
+  documents, multi-word queries and typos. The queries are preprocessed like
+  the UI does, each query is unique so the query cache never hits.
+- ``peak_rss``: the peak resident memory of the benchmark process, in bytes.
+
+The results are written as JSON, :func:`compare` reports the metrics that
+got worse than a baseline result, e.g. one from the previous commit.
+"""
+
+import typing as T
+import os
+import sys
+import json
+import time
+import random
+import platform
+import tempfile
+import statistics
+import subprocess
+import dataclasses
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from .constants import DataSetEnum
+from .query import preprocess_query
+from ._version import __version__
+
+
+BENCH_FORMAT_VERSION = 1
+
+# lower is better for all of them
+METRICS = [
+    "parse_time",
+    "build_time",
+    "index_size",
+    "latency.p50",
+    "latency.p95",
+    "latency.p99",
+    "peak_rss",
+]
+
+# common words in the reference documents, more frequent first
+_common_words = (
+    "get put list create delete update describe object bucket table "
+    "s3 ec2 iam lambda dynamodb sqs sns kms rds ecs eks glue athena "
+    "role policy user group key value item stream queue topic function "
+    "resource provider data source read write frame series index column "
+    "dag task operator sensor hook connection variable schedule "
+    "construct stack app props config client service instance cluster "
+    "network subnet vpc security rule alarm metric log event trigger "
+    "merge join apply map filter sort group aggregate pivot to from"
+).split()
+
+
+_syllables = (
+    "ba be bi bo bu ca co da de di do fa fe ga go ka ke ko la le li lo ma me "
+    "mi mo na ne no pa pe po ra re ri ro sa se si so ta te ti to va ve vo za ze"
+).split()
+
+
+def _make_vocabulary(rnd: random.Random, n: int = 2000) -> T.List[str]:
+    """
+    The common words plus made up words, so the vocabulary is as big as the
+    real documents.
+    """
+    words = list(_common_words)
+    while len(words) < n:
+        words.append("".join(rnd.choices(_syllables, k=rnd.randint(2, 4))))
+    return words
+
+
+def make_fixture_docs(
+    dataset: str,
+    n_docs: int,
+    seed: int = 1,
+) -> T.List[T.Dict[str, T.Any]]:
+    """
+    Generate synthetic documents for the dataset. Every field of the
+    document class, which are the stored fields of the index, gets a value,
+    word frequency is skewed so some words are in many documents.
+    """
+    from . import models
+
+    rnd = random.Random(f"{dataset}-{seed}")
+    vocabulary = _make_vocabulary(rnd)
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    field_names = [
+        field.name for field in dataclasses.fields(models.get_doc_class(dataset))
+    ]
+    docs = list()
+    for i in range(n_docs):
+        doc = dict()
+        for name in field_names:
+            if name == "url":
+                doc[name] = f"https://example.com/{dataset}/{i}.html"
+                continue
+            words = rnd.choices(vocabulary, weights=weights, k=rnd.randint(1, 3))
+            sep = rnd.choice(["_", " "])
+            doc[name] = sep.join(words)
+        docs.append(doc)
+    return docs
+
+
+def make_query_corpus(
+    docs: T.List[T.Dict[str, T.Any]],
+    n_queries: int,
+    seed: int = 1,
+) -> T.List[str]:
+    """
+    Generate unique queries like a user typing them: every prefix of a word
+    from a document, optionally after another word from the same document,
+    and some typos.
+    """
+    rnd = random.Random(seed)
+    queries = dict()
+    attempts = 0
+    while (len(queries) < n_queries) and (attempts < n_queries * 50):
+        attempts += 1
+        doc = rnd.choice(docs)
+        words = [
+            word
+            for key, value in doc.items()
+            if key != "url" and isinstance(value, str)
+            for word in value.replace("_", " ").split()
+            if len(word) >= 2
+        ]
+        if not words:
+            continue
+        last = rnd.choice(words)
+        first = rnd.choice(words) if rnd.random() < 0.5 else None
+        if (rnd.random() < 0.1) and (len(last) >= 4):
+            i = rnd.randrange(len(last) - 1)
+            last = last[:i] + last[i + 1] + last[i] + last[i + 2 :]
+        for end in range(2, len(last) + 1):
+            query = last[:end] if first is None else f"{first} {last[:end]}"
+            queries.setdefault(query, None)
+            if len(queries) >= n_queries:
+                break
+    return list(queries)
+
+
+def write_fixture_release(
+    dataset: str,
+    docs: T.List[T.Dict[str, T.Any]],
+    path: Path,
+):
+    """
+    Write the documents as a compressed release file.
+    """
+    from . import models
+
+    release = models.Release(
+        metadata=models.Metadata(dataset_name=dataset),
+        docs=docs,
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(release.to_compressed_binary())
+
+
+def get_percentiles(values: T.List[float]) -> T.Dict[str, float]:
+    if len(values) == 1:
+        return {"p50": values[0], "p95": values[0], "p99": values[0], "mean": values[0]}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": cuts[49],
+        "p95": cuts[94],
+        "p99": cuts[98],
+        "mean": statistics.fmean(values),
+    }
+
+
+def get_dir_size(dir_path: Path) -> int:
+    return sum(p.stat().st_size for p in dir_path.rglob("*") if p.is_file())
+
+
+def get_peak_rss() -> T.Optional[int]:
+    """
+    The peak resident memory of this process in bytes, None if it is not
+    available on this platform.
+    """
+    try:
+        import resource
+    except ImportError:  # pragma: no cover
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def bench_one(
+    dataset: str,
+    path_release: Path,
+    queries: T.List[str],
+    dir_root: Path,
+    backend: T.Optional[str] = None,
+    limit: int = 50,
+) -> T.Dict[str, T.Any]:
+    """
+    Benchmark one dataset in this process. It runs in a fresh worker process
+    so the peak memory only belongs to this dataset.
+    """
+    from . import models
+    from .searcher import create_warm_dataset
+
+    start = time.perf_counter()
+    with path_release.open("rb") as f:
+        items = models.iter_compressed_release(f)
+        next(items)
+        docs = list(items)
+    parse_time = time.perf_counter() - start
+
+    dir_index = dir_root / dataset / ".index"
+    ds = create_warm_dataset(
+        dataset=dataset,
+        dir_index=dir_index,
+        dir_cache=dir_root / dataset / ".cache",
+    )
+    ds.updater = None
+    ds.prebuilt_downloader = None
+    ds.downloader = lambda: docs
+    if backend is not None:
+        ds.backend = backend
+    start = time.perf_counter()
+    ds.refresh_index(multi_thread=False)
+    if ds.backend != "whoosh":
+        ds.get_memory_index()
+    build_time = time.perf_counter() - start
+
+    latencies = list()
+    n_hits = 0
+    for query in queries:
+        query = preprocess_query(query)
+        start = time.perf_counter()
+        n_hits += len(ds.search_index(query=query, limit=limit))
+        latencies.append((time.perf_counter() - start) * 1000)
+    ds.close_searcher()
+
+    return {
+        "dataset": dataset,
+        "backend": ds.backend,
+        "n_docs": len(docs),
+        "n_queries": len(queries),
+        "n_hits": n_hits,
+        "release_size": path_release.stat().st_size,
+        "parse_time": parse_time,
+        "build_time": build_time,
+        "index_size": get_dir_size(dir_index),
+        "latency": get_percentiles(latencies),
+        "peak_rss": get_peak_rss(),
+    }
+
+
+def get_environment() -> T.Dict[str, T.Any]:
+    """
+    Where the benchmark ran, so results from different commits are comparable.
+    """
+    try:
+        import sayt
+
+        sayt_version = sayt.__version__
+    except Exception:  # pragma: no cover
+        sayt_version = None
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:  # pragma: no cover
+        commit = None
+    return {
+        "findref": __version__,
+        "sayt": sayt_version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def run_bench(
+    datasets: T.Optional[T.Iterable[str]] = None,
+    n_docs: int = 5000,
+    n_queries: int = 200,
+    seed: int = 1,
+    backend: T.Optional[str] = None,
+    dir_root: T.Optional[Path] = None,
+    isolate: bool = True,
+    echo: T.Callable[[str], T.Any] = print,
+) -> T.Dict[str, T.Any]:
+    """
+    Benchmark the given datasets.
+
+    :param datasets: list of dataset names, all datasets if not given.
+    :param n_docs: number of synthetic documents per dataset.
+    :param n_queries: number of queries in the replayed corpus per dataset.
+    :param seed: the random seed of the documents and the queries.
+    :param backend: force the search backend, default is the dataset's one.
+    :param dir_root: where to put the fixtures and the indexes, a temporary
+        directory if not given.
+    :param isolate: benchmark each dataset in a fresh process, so that the
+        peak memory is per dataset.
+
+    :return: the JSON serializable result.
+    """
+    if datasets is None:
+        datasets = [dataset.value for dataset in DataSetEnum]
+    else:
+        datasets = [DataSetEnum(dataset).value for dataset in datasets]
+    params = dict(n_docs=n_docs, n_queries=n_queries, seed=seed, backend=backend)
+    with tempfile.TemporaryDirectory() as dir_tmp:
+        dir_root = Path(dir_tmp) if dir_root is None else Path(dir_root)
+        results = list()
+        for dataset in datasets:
+            docs = make_fixture_docs(dataset, n_docs=n_docs, seed=seed)
+            queries = make_query_corpus(docs, n_queries=n_queries, seed=seed)
+            path_release = dir_root / "fixtures" / f"{dataset}.frr"
+            write_fixture_release(dataset, docs, path_release)
+            del docs
+            kwargs = dict(
+                dataset=dataset,
+                path_release=path_release,
+                queries=queries,
+                dir_root=dir_root,
+                backend=backend,
+            )
+            if isolate:
+                with ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context("spawn"),
+                ) as pool:
+                    result = pool.submit(bench_one, **kwargs).result()
+            else:
+                result = bench_one(**kwargs)
+            results.append(result)
+            echo(format_result(result))
+    return {
+        "version": BENCH_FORMAT_VERSION,
+        "created_at": time.time(),
+        "environment": get_environment(),
+        "params": params,
+        "results": results,
+    }
+
+
+def format_result(result: T.Dict[str, T.Any]) -> str:
+    latency = result["latency"]
+    peak_rss = result["peak_rss"]
+    peak_rss = "n/a" if peak_rss is None else f"{peak_rss / 1024 / 1024:.0f} MB"
+    return (
+        f"{result['dataset']:<20} {result['backend']:<7} "
+        f"parse {result['parse_time']:.2f}s  build {result['build_time']:.2f}s  "
+        f"index {result['index_size'] / 1024 / 1024:.1f} MB  "
+        f"p50 {latency['p50']:.2f}ms  p95 {latency['p95']:.2f}ms  "
+        f"p99 {latency['p99']:.2f}ms  rss {peak_rss}"
+    )
+
+
+def get_metric(result: T.Dict[str, T.Any], metric: str) -> T.Optional[float]:
+    value = result
+    for key in metric.split("."):
+        value = value[key]
+    return value
+
+
+def compare(
+    baseline: T.Dict[str, T.Any],
+    current: T.Dict[str, T.Any],
+    threshold: float = 0.1,
+) -> T.List[str]:
+    """
+    Compare two benchmark results of the same parameters.
+
+    :param threshold: report a metric if it is this much worse than the
+        baseline, 0.1 means 10%.
+
+    :return: one message per regression.
+    """
+    baseline_results = {
+        (result["dataset"], result["backend"]): result for result in baseline["results"]
+    }
+    regressions = list()
+    for result in current["results"]:
+        key = (result["dataset"], result["backend"])
+        if key not in baseline_results:
+            continue
+        for metric in METRICS:
+            old = get_metric(baseline_results[key], metric)
+            new = get_metric(result, metric)
+            if (old is None) or (new is None) or (old <= 0):
+                continue
+            change = (new - old) / old
+            if change > threshold:
+                regressions.append(
+                    f"{key[0]} ({key[1]}) {metric}: {old:.4g} -> {new:.4g} "
+                    f"(+{change:.0%})"
+                )
+    return regressions
+
+
+def bench(
+    datasets: T.Optional[T.Iterable[str]] = None,
+    output: T.Optional[str] = None,
+    baseline: T.Optional[str] = None,
+    threshold: float = 0.1,
+    **kwargs,
+) -> T.List[str]:
+    """
+    Run the benchmark, write the result to the output JSON file, and compare
+    it with the baseline JSON file if given.
+
+    :return: the regressions against the baseline.
+    """
+    result = run_bench(datasets=datasets, **kwargs)
+    if output is not None:
+        Path(output).write_text(json.dumps(result, indent=4))
+    if baseline is None:
+        return []
+    baseline_result = json.loads(Path(baseline).read_text())
+    if baseline_result["params"] != result["params"]:
+        print("warning: the baseline was run with different parameters")
+    regressions = compare(baseline_result, result, threshold=threshold)
+    for line in regressions:
+        print(f"regression: {line}")
+    return regressions
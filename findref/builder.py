@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+"""
+Download the dataset and build the index in a background thread.
+
+The terminal UI keeps accepting keystrokes while the index is being built.
+If there is an old index on disk, it keeps serving queries until the new
+index is committed, then the new index is swapped in atomically
+(see :meth:`findref.searcher.WarmDataSet._build_index`).
+
+If another ``fr`` process is already building the same index, the build
+waits for it instead of downloading and building it again, see
+:meth:`findref.searcher.WarmDataSet.refresh_index`.
+"""
+
+import typing as T
+import time
+import threading
+import dataclasses
+
+from .registry import DataSetRegistry, registry
+
+
+@dataclasses.dataclass
+class IndexBuild:
+    """
+    The state of one background index build.
+
+    :param dataset: the dataset name.
+    :param n_indexed: number of documents indexed so far.
+    :param n_total: total number of documents, None if unknown yet.
+    :param started_at: the build start time in epoch seconds.
+    :param finished_at: the build end time in epoch seconds, None if running.
+    :param error: the exception raised by the build, if any.
+    :param is_waiting: another process is building the same index, this build
+        waits for it instead of building it again.
+    :param waiting_for: the pid of that process, None if it is unknown.
+    """
+
+    dataset: str
+    n_indexed: int = 0
+    n_total: T.Optional[int] = None
+    started_at: float = dataclasses.field(default_factory=time.time)
+    finished_at: T.Optional[float] = None
+    error: T.Optional[Exception] = None
+    is_waiting: bool = False
+    waiting_for: T.Optional[int] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.finished_at is None
+
+    @property
+    def is_succeeded(self) -> bool:
+        return (self.finished_at is not None) and (self.error is None)
+
+    @property
+    def is_failed(self) -> bool:
+        return self.error is not None
+
+    @property
+    def elapsed(self) -> float:
+        end = time.time() if self.finished_at is None else self.finished_at
+        return end - self.started_at
+
+    @property
+    def progress(self) -> str:
+        """
+        Human-readable progress, for example ``"1,000 / 5,000 documents"``.
+        """
+        if self.is_waiting:
+            if self.waiting_for is None:
+                return "waiting for another findref process"
+            return f"waiting for findref process {self.waiting_for}"
+        if self.n_total is None:
+            return f"{self.n_indexed:,} documents"
+        else:
+            return f"{self.n_indexed:,} / {self.n_total:,} documents"
+
+
+T_BUILD_CALLBACK = T.Callable[[IndexBuild], T.Any]
+
+
+@dataclasses.dataclass
+class BackgroundIndexBuilder:
+    """
+    Run at most one background index build per dataset.
+
+    :param registry: the registry to get the dataset object from.
+    """
+
+    registry: DataSetRegistry
+
+    _builds: T.Dict[str, IndexBuild] = dataclasses.field(
+        default_factory=dict, init=False, repr=False
+    )
+    _lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    def get(self, dataset: str) -> T.Optional[IndexBuild]:
+        """
+        Get the latest build of the given dataset, None if never started.
+        """
+        return self._builds.get(dataset)
+
+    def is_building(self, dataset: str) -> bool:
+        build = self.get(dataset)
+        return (build is not None) and build.is_running
+
+    def start(
+        self,
+        dataset: str,
+        on_progress: T.Optional[T_BUILD_CALLBACK] = None,
+        on_done: T.Optional[T_BUILD_CALLBACK] = None,
+    ) -> IndexBuild:
+        """
+        Start a background build for the given dataset. If there is already
+        a running build, return it instead of starting a new one.
+
+        :param on_progress: called with the :class:`IndexBuild` object in the
+            worker thread when more documents are indexed.
+        :param on_done: called with the :class:`IndexBuild` object in the
+            worker thread when the build is finished or failed.
+        """
+        with self._lock:
+            build = self._builds.get(dataset)
+            if (build is not None) and build.is_running:
+                return build
+            build = IndexBuild(dataset=dataset)
+            self._builds[dataset] = build
+
+        def run():
+            def wait(pid: T.Optional[int]):
+                build.is_waiting = True
+                build.waiting_for = pid
+                if on_progress is not None:
+                    on_progress(build)
+
+            def update(n_indexed: int, n_total: T.Optional[int]):
+                build.is_waiting = False
+                build.n_indexed = n_indexed
+                build.n_total = n_total
+                if on_progress is not None:
+                    on_progress(build)
+
+            try:
+                ds = self.registry.get(dataset)
+                ds.refresh_index(on_progress=update, progress_every=500, on_wait=wait)
+                # swap in a new dataset object with a searcher on the new index
+                self.registry.invalidate(dataset)
+            except Exception as e:
+                build.error = e
+            finally:
+                build.is_waiting = False
+            build.finished_at = time.time()
+            if on_done is not None:
+                on_done(build)
+
+        thread = threading.Thread(
+            target=run,
+            name=f"findref-build-{dataset}",
+            daemon=True,
+        )
+        thread.start()
+        return build
+
+    def wait(self, dataset: str, timeout: T.Optional[float] = None) -> bool:
+        """
+        Block until the build of the given dataset finished. Mostly for
+        testing and non-interactive usage.
+
+        :return: True if there is no running build after waiting.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while self.is_building(dataset):
+            if (deadline is not None) and (time.time() >= deadline):
+                return False
+            time.sleep(0.01)
+        return True
+
+
+builder = BackgroundIndexBuilder(registry=registry)
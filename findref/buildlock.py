@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cross-process coordination of the index builds.
+
+Several ``fr`` processes share the same index directory, for example three
+terminal panes opened on a fresh machine, or two of them noticing that the
+dataset expired at the same time. Only one of them should download the
+release and build the index, the others wait for it and keep serving the
+previous index meanwhile:
+
+- :class:`FileLock`: an exclusive lock on a lock file next to the index,
+  ``fcntl.flock`` on Unix and ``msvcrt.locking`` on Windows. The operating
+  system releases it when the process exits or crashes, so there is no stale
+  lock to expire. The ``sayt`` tracker file checks then writes a JSON file,
+  two processes can both see it unlocked and both build.
+- the build generation marker: a counter in a JSON file, increased after
+  every successful build. A process reads it before waiting for the lock,
+  if it changed once the lock is acquired, another process has just built
+  the index and there is nothing left to do.
+
+Both files are written to a temporary file first, then moved into place,
+a reader never sees a partially written file.
+
+This module only imports the standard library.
+"""
+
+import typing as T
+import os
+import json
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+    import msvcrt
+
+
+def _try_lock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:  # pragma: no cover
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(fd: int):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:  # pragma: no cover
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """
+    Exclusive cross-process lock on a file. Two instances on the same path
+    also exclude each other in the same process.
+
+    :param path: the lock file, it is created if not exists and never removed.
+    :param poll_interval: how many seconds to wait between two attempts.
+    """
+
+    def __init__(self, path: T.Union[str, Path], poll_interval: float = 0.1):
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self._fd: T.Optional[int] = None
+
+    @property
+    def is_locked(self) -> bool:
+        """
+        Return True if this instance holds the lock.
+        """
+        return self._fd is not None
+
+    def acquire(
+        self,
+        blocking: bool = True,
+        timeout: T.Optional[float] = None,
+    ) -> bool:
+        """
+        Acquire the lock, and write the pid of this process into the file.
+
+        :param blocking: wait for the lock if it is held by someone else.
+        :param timeout: give up after this many seconds, wait forever if None.
+
+        :return: True if the lock is acquired.
+        """
+        if self._fd is not None:
+            raise RuntimeError(f"{self.path} is already locked by this object")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        while _try_lock(fd) is False:
+            if (blocking is False) or (
+                (deadline is not None) and (time.monotonic() >= deadline)
+            ):
+                os.close(fd)
+                return False
+            time.sleep(self.poll_interval)
+        self._fd = fd
+        if fcntl is not None:
+            os.ftruncate(fd, 0)
+            os.write(fd, str(os.getpid()).encode("ascii"))
+        return True
+
+    def release(self):
+        """
+        Release the lock if this instance holds it.
+        """
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            _unlock(fd)
+            os.close(fd)
+
+    def get_owner(self) -> T.Optional[int]:
+        """
+        Return the pid of the process that holds or last held the lock, None
+        if it is unknown.
+        """
+        try:
+            return int(self.path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+def write_atomic(path: Path, text: str):
+    """
+    Write the text to a temporary file in the same directory, then move it
+    into place.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path_tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path_tmp.write_text(text)
+        os.replace(path_tmp, path)
+    finally:
+        path_tmp.unlink(missing_ok=True)
+
+
+def read_generation(path: Path) -> int:
+    """
+    Read the build generation, 0 if there was no build yet.
+    """
+    try:
+        return int(json.loads(path.read_text())["generation"])
+    except (FileNotFoundError, ValueError, KeyError, TypeError):
+        return 0
+
+
+def bump_generation(path: Path) -> int:
+    """
+    Increase the build generation after a successful build, it must be called
+    while holding the build lock.
+
+    :return: the new generation.
+    """
+    generation = read_generation(path) + 1
+    data = {"generation": generation, "pid": os.getpid(), "built_at": time.time()}
+    write_atomic(path, json.dumps(data))
+    return generation
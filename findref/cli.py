@@ -2,11 +2,205 @@
 
 """
 This module implements the command line interface.
+
+- ``fr``: enter the interactive UI.
+- ``fr warmup``: download and index datasets in parallel.
+- ``fr query``: search many ``dataset<TAB>query`` lines, output JSON Lines.
+- ``fr mirror``: snapshot the dataset releases into a local mirror directory.
+- ``fr bench``: benchmark index build, query latency and memory per dataset.
+- ``fr daemon``: serve queries from warm indexes over a Unix domain socket.
+- ``fr schema``: report the size of each field of the local indexes.
+- ``fr --profile-startup``: report the time to the first screen and the
+  import time of each module.
+
+Only the standard library is imported at module level, ``fire`` is only
+needed for the sub commands.
 """
 
-import fire
+import typing as T
+import sys
+
+
+class Command:
+    """
+    findref command line interface, run ``fr`` without arguments to enter
+    the interactive UI.
+    """
+
+    def ui(self):
+        """
+        Enter findref interactive UI.
+        """
+        from .ui import main as ui_main
+
+        ui_main()
+
+    def warmup(self, *datasets: str, processes: T.Optional[int] = None):
+        """
+        Download and index all or selected datasets in parallel, exit with
+        non-zero code if any of them failed.
+
+        Example: ``fr warmup``, ``fr warmup boto3 tf --processes 2``
+        """
+        from .warmup import warmup
+
+        results = warmup(datasets=datasets or None, processes=processes)
+        if not all(result.is_succeeded for result in results):
+            sys.exit(1)
+
+    def query(
+        self,
+        path: T.Optional[str] = None,
+        output: T.Optional[str] = None,
+        limit: int = 5,
+        processes: T.Optional[int] = None,
+    ):
+        """
+        Search many ``dataset<TAB>query`` lines from the file or stdin, write
+        the results as JSON Lines to the output file or stdout, exit with
+        non-zero code if any line failed.
+
+        Example: ``fr query queries.tsv --limit 3``,
+        ``cut -f1,2 calls.tsv | fr query --output refs.jsonl``
+        """
+        from .batch import query
+
+        n_records, n_errors = query(
+            path=path,
+            output=output,
+            limit=limit,
+            processes=processes,
+        )
+        if n_errors:
+            print(f"{n_errors} of {n_records} queries failed", file=sys.stderr)
+            sys.exit(1)
+
+    def mirror(self, dir_root: str, *datasets: str, tag: T.Optional[str] = None):
+        """
+        Snapshot all or selected dataset releases into a mirror directory,
+        with the ``SHA256SUMS`` checksums. Set
+        ``FINDREF_RELEASE_SOURCE=${dir_root}`` on machines without internet
+        access to index from the mirror.
+
+        Example: ``fr mirror /mnt/findref-mirror``,
+        ``fr mirror ./mirror boto3 tf --tag 2024-02-15``
+        """
+        from .sources import mirror
+
+        tag_name = mirror(dir_root=dir_root, datasets=datasets or None, tag_name=tag)
+        print(f"mirrored release {tag_name} to {dir_root}")
+
+    def bench(
+        self,
+        *datasets: str,
+        output: T.Optional[str] = None,
+        baseline: T.Optional[str] = None,
+        threshold: float = 0.1,
+        docs: int = 5000,
+        queries: int = 200,
+        seed: int = 1,
+        backend: T.Optional[str] = None,
+    ):
+        """
+        Benchmark all or selected datasets with synthetic fixture releases,
+        write the result as JSON, exit with non-zero code if any metric is
+        ``threshold`` worse than the baseline result.
+
+        Example: ``fr bench --output bench.json``,
+        ``fr bench boto3 --baseline bench.json --threshold 0.2``
+        """
+        from .bench import bench
+
+        regressions = bench(
+            datasets=datasets or None,
+            output=output,
+            baseline=baseline,
+            threshold=threshold,
+            n_docs=docs,
+            n_queries=queries,
+            seed=seed,
+            backend=backend,
+        )
+        if regressions:
+            sys.exit(1)
+
+    def daemon(self, action: str = "start"):
+        """
+        Manage the findref daemon, it keeps the indexes warm and serves
+        queries over a Unix domain socket, ``fr`` uses it if it is running.
+
+        Example: ``fr daemon`` (run in foreground), ``fr daemon status``,
+        ``fr daemon stop``
+        """
+        from .daemon import DaemonServer, get_client
+
+        if action == "start":
+            server = DaemonServer().start()
+            warmed = server.warm()
+            print(f"findref daemon listening on {server.path}")
+            print(f"warm datasets: {', '.join(warmed) or 'none'}")
+            server.serve_forever()
+            return
+        client = get_client()
+        if client is None:
+            print("findref daemon is not running")
+            sys.exit(1)
+        if action == "status":
+            print(client.ping())
+        elif action == "stop":
+            client.shutdown()
+            print("findref daemon stopped")
+        else:
+            print(f"unknown action {action!r}, use 'start', 'status' or 'stop'")
+            sys.exit(1)
+
+    def schema(self, *datasets: str):
+        """
+        Report the number of terms, postings and stored bytes of each field
+        of all or selected local indexes, run ``fr warmup`` first.
+
+        Example: ``fr schema``, ``fr schema boto3 tf``
+        """
+        from .models import DataSetEnum
+        from .paths import dir_index, dir_cache
+        from .schema import format_field_sizes
+        from .searcher import create_warm_dataset
+
+        for dataset in datasets or [member.value for member in DataSetEnum]:
+            ds = create_warm_dataset(
+                dataset=dataset,
+                dir_index=dir_index,
+                dir_cache=dir_cache,
+            )
+            if ds._has_compatible_index() is False:
+                print(f"{dataset}: not indexed")
+                continue
+            print(format_field_sizes(dataset, ds.get_field_sizes()))
+            ds.close_searcher()
+
+    def profile_startup(self, top: int = 20):
+        """
+        Report the time to the first screen and the slowest imported modules,
+        exit with non-zero code if it is over the budget.
+
+        Example: ``fr --profile-startup``, ``fr profile_startup --top 50``
+        """
+        from .startup import profile_startup, report
+
+        profile = profile_startup()
+        print(report(profile, n=top))
+        if not profile.is_within_budget:
+            sys.exit(1)
 
-from .ui import main as ui_main
 
 def main():
-    fire.Fire(ui_main)
+    if len(sys.argv) == 1:
+        from .ui import main as ui_main
+
+        ui_main()
+    elif sys.argv[1] == "--profile-startup":
+        Command().profile_startup()
+    else:
+        import fire
+
+        fire.Fire(Command)
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+"""
+Constants that the UI needs before any search engine module is loaded.
+
+This module must only import the standard library, ``fr`` imports it to
+paint the first screen.
+"""
+
+import enum
+
+
+class DataSetEnum(str, enum.Enum):
+    airflow = "airflow"  # Airflow
+    aws_cloudformation = "aws_cloudformation"  # AWS CloudFormation
+    boto3 = "boto3"  # AWS Python SDK - boto3
+    cdk_python = "cdk_python"  # AWS CDK Python
+    cdk_ts = "cdk_ts"  # AWS CDK TypeScript
+    pyspark = "pyspark"  # PySpark
+    pandas = "pandas"  # Pandas
+    tf = "tf"  # Terraform
@@ -0,0 +1,548 @@
+# -*- coding: utf-8 -*-
+
+"""
+Optional long-running findref daemon.
+
+``fr daemon`` keeps the warm dataset objects of :data:`findref.registry.registry`
+(open whoosh searchers, in-memory indexes, typo dictionaries) in one process
+and serves queries over a Unix domain socket. The TUI, scripts and editor
+integrations connect as thin clients with :class:`DaemonClient`, a query no
+longer pays for the process startup and the cold index.
+
+The protocol is newline delimited JSON, a client may send many requests on
+one connection::
+
+    -> {"id": 1, "method": "search", "params": {"dataset": "boto3", "query": "s3 put"}}
+    <- {"id": 1, "result": {"docs": [...], "items": [...], "indexing": false, ...}}
+    <- {"id": 2, "error": "unknown method 'foo'"}
+
+Methods:
+
+- ``ping``: the daemon status.
+- ``search``: search one dataset, build the index in background if needed.
+- ``federated``: search all indexed datasets at once.
+- ``refresh``: rebuild the index of a dataset in background.
+- ``shutdown``: stop the daemon.
+
+The ``items`` of the ``search`` and ``federated`` results are the display
+fields of the documents, ``uid``, ``title``, ``subtitle``, ``arg`` and
+``autocomplete``, rendered by the daemon. The client side only imports the
+standard library, the server side imports the search engine modules when it
+starts.
+"""
+
+import typing as T
+import os
+import json
+import time
+import socket
+import threading
+import dataclasses
+import socketserver
+from pathlib import Path
+
+from .paths import path_daemon_socket
+from .query import preprocess_query
+
+if T.TYPE_CHECKING:  # pragma: no cover
+    from .registry import DataSetRegistry
+    from .builder import BackgroundIndexBuilder
+    from .models import BaseDocument
+
+
+DAEMON_PROTOCOL_VERSION = 2
+
+
+class DaemonError(Exception):
+    """
+    The daemon returned an error.
+    """
+
+
+class DaemonNotRunningError(DaemonError):
+    """
+    No daemon is listening on the socket.
+    """
+
+
+class DaemonTimeoutError(DaemonError):
+    """
+    The daemon didn't respond within the client timeout, the request is not
+    sent again because it may still be running, for example ``refresh``.
+    """
+
+
+def encode_message(message: T.Dict[str, T.Any]) -> bytes:
+    return (json.dumps(message, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+def decode_message(line: bytes) -> T.Dict[str, T.Any]:
+    return json.loads(line.decode("utf-8"))
+
+
+def is_supported() -> bool:
+    """
+    Unix domain socket is not available on all platforms.
+    """
+    return hasattr(socket, "AF_UNIX")
+
+
+# ------------------------------------------------------------------------------
+# Server
+# ------------------------------------------------------------------------------
+def render_item(dataset: str, doc: "BaseDocument") -> T.Dict[str, str]:
+    """
+    The display fields of a document, the client creates the UI item from
+    them without importing the document classes.
+    """
+    return {
+        "uid": doc.uid,
+        "title": doc.title,
+        "subtitle": doc.subtitle,
+        "arg": doc.arg,
+        "autocomplete": f"{dataset} {doc.autocomplete}",
+    }
+
+
+def render_federated_item(dataset: str, doc: "BaseDocument") -> T.Dict[str, str]:
+    """
+    Same as :func:`render_item`, the uid and the subtitle are tagged with the
+    source dataset of the federated search result.
+    """
+    item = render_item(dataset, doc)
+    item["uid"] = f"{dataset}-{item['uid']}"
+    item["subtitle"] = f"[{dataset}] {item['subtitle']}"
+    return item
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        daemon: "DaemonServer" = self.server.daemon
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = decode_message(line)
+            except ValueError as e:
+                response = {"id": None, "error": f"invalid request: {e}"}
+            else:
+                response = daemon.handle(request)
+            try:
+                self.wfile.write(encode_message(response))
+                self.wfile.flush()
+            except OSError:  # pragma: no cover
+                return
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+@dataclasses.dataclass
+class DaemonServer:
+    """
+    Serve the queries of the warm datasets over a Unix domain socket.
+
+    :param path: the socket file.
+    :param registry: where to get the warm dataset objects, default is the
+        process-wide one.
+    :param builder: the background index builder of the registry, default is
+        the process-wide one.
+    :param n_requests: number of requests handled.
+    """
+
+    path: Path = dataclasses.field(default=path_daemon_socket)
+    registry: T.Optional["DataSetRegistry"] = dataclasses.field(default=None)
+    builder: T.Optional["BackgroundIndexBuilder"] = dataclasses.field(default=None)
+    n_requests: int = dataclasses.field(default=0)
+
+    _server: T.Optional[_UnixServer] = dataclasses.field(
+        default=None, init=False, repr=False
+    )
+    _started_at: float = dataclasses.field(default_factory=time.time, init=False)
+    _lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    def __post_init__(self):
+        if self.registry is None:
+            from .registry import registry
+
+            self.registry = registry
+        if self.builder is None:
+            from .builder import builder, BackgroundIndexBuilder
+
+            if builder.registry is self.registry:
+                self.builder = builder
+            else:
+                self.builder = BackgroundIndexBuilder(registry=self.registry)
+        self._methods = {
+            "ping": self.ping,
+            "search": self.search,
+            "federated": self.federated,
+            "refresh": self.refresh,
+            "shutdown": self.shutdown,
+        }
+
+    def handle(self, request: T.Dict[str, T.Any]) -> T.Dict[str, T.Any]:
+        """
+        Run one request, any exception is returned as the error message.
+        """
+        # each connection is handled in its own thread
+        with self._lock:
+            self.n_requests += 1
+        request_id = request.get("id")
+        method = self._methods.get(request.get("method"))
+        if method is None:
+            return {
+                "id": request_id,
+                "error": f"unknown method {request.get('method')!r}",
+            }
+        try:
+            result = method(**request.get("params", {}))
+        except Exception as e:
+            return {"id": request_id, "error": f"{e.__class__.__name__}: {e}"}
+        return {"id": request_id, "result": result}
+
+    def ping(self) -> T.Dict[str, T.Any]:
+        return {
+            "version": DAEMON_PROTOCOL_VERSION,
+            "pid": os.getpid(),
+            "uptime": time.time() - self._started_at,
+            "n_requests": self.n_requests,
+        }
+
+    def search(
+        self,
+        dataset: str,
+        query: str,
+        limit: int = 50,
+        preprocess: bool = True,
+    ) -> T.Dict[str, T.Any]:
+        """
+        Search one dataset, same as the TUI: the index is built in background
+        if it is missing or expired, the old index keeps serving queries
+        until the new one is ready.
+
+        :param preprocess: add the fuzzy term to the query words like the TUI
+            does, set False if the query is already a whoosh query.
+        """
+        from .models import DataSetEnum, get_doc_class
+
+        start = time.perf_counter()
+        dataset = DataSetEnum(dataset).value
+        if preprocess:
+            query = preprocess_query(query)
+        ds = self.registry.get(dataset)
+        build = self.builder.get(dataset)
+        if (ds.is_fresh() is False) and ((build is None) or build.is_succeeded):
+            build = self.builder.start(dataset)
+        indexing = (build is not None) and build.is_running
+        error = None
+        if (build is not None) and build.is_failed:
+            error = repr(build.error)
+        if (indexing is False) and (error is None):
+            docs = ds.incremental.search(query=query, limit=limit)
+        elif ds.has_index():
+            docs = ds.search_index(query=query, limit=limit)
+        else:
+            docs = []
+        doc_class = get_doc_class(dataset)
+        return {
+            "docs": docs,
+            "items": [render_item(dataset, doc_class.from_dict(dct)) for dct in docs],
+            "indexing": indexing,
+            "progress": build.progress if indexing else None,
+            "error": error,
+            "took": time.perf_counter() - start,
+        }
+
+    def federated(
+        self,
+        query: str,
+        limit: int = 50,
+        timeout: float = 0.5,
+        preprocess: bool = True,
+    ) -> T.Dict[str, T.Any]:
+        """
+        Search all indexed datasets at once, see
+        :func:`findref.federated.federated_search`.
+        """
+        from .models import get_doc_class
+        from .federated import federated_search
+
+        if preprocess:
+            query = preprocess_query(query)
+        result = federated_search(
+            query=query,
+            limit=limit,
+            timeout=timeout,
+            registry=self.registry,
+        )
+        items = [
+            render_federated_item(
+                hit.dataset, get_doc_class(hit.dataset).from_dict(hit.doc)
+            )
+            for hit in result.hits
+        ]
+        return {
+            "hits": [dataclasses.asdict(hit) for hit in result.hits],
+            "items": items,
+            "not_indexed": result.not_indexed,
+            "timed_out": result.timed_out,
+            "failed": {dataset: repr(e) for dataset, e in result.failed.items()},
+            "took": result.took,
+        }
+
+    def refresh(self, dataset: str) -> T.Dict[str, T.Any]:
+        """
+        Rebuild the index of the dataset in background.
+        """
+        from .models import DataSetEnum
+
+        build = self.builder.start(DataSetEnum(dataset).value)
+        return {"progress": build.progress}
+
+    def warm(self, datasets: T.Optional[T.Iterable[str]] = None) -> T.List[str]:
+        """
+        Open the searcher of each dataset that already has an index, so the
+        first query doesn't open it.
+
+        :return: the warmed datasets.
+        """
+        from .models import DataSetEnum
+
+        if datasets is None:
+            datasets = [dataset.value for dataset in DataSetEnum]
+        warmed = list()
+        for dataset in datasets:
+            ds = self.registry.get(dataset)
+            if ds.has_index():
+                ds.search_index(query="*", limit=1)
+                warmed.append(dataset)
+        return warmed
+
+    def _remove_stale_socket(self):
+        if not self.path.exists():
+            return
+        try:
+            DaemonClient(path=self.path, timeout=0.5).ping()
+        except DaemonNotRunningError:
+            self.path.unlink()
+        else:
+            raise DaemonError(f"findref daemon is already running on {self.path}")
+
+    def start(self) -> "DaemonServer":
+        """
+        Bind the socket and serve in a background thread.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._remove_stale_socket()
+        server = _UnixServer(str(self.path), _RequestHandler, bind_and_activate=False)
+        # bind() creates the socket file, only the owner may connect to it
+        # from the start
+        umask = os.umask(0o077)
+        try:
+            server.server_bind()
+        except BaseException:
+            server.server_close()
+            raise
+        finally:
+            os.umask(umask)
+        server.server_activate()
+        server.daemon = self
+        self._server = server
+        thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="findref-daemon",
+            daemon=True,
+        )
+        thread.start()
+        return self
+
+    def shutdown(self) -> T.Dict[str, T.Any]:
+        """
+        Stop serving and remove the socket file.
+        """
+        server, self._server = self._server, None
+        if server is not None:
+            # shutdown() blocks until serve_forever() returns, it can't be
+            # called from the request handler thread directly
+            def stop():
+                server.shutdown()
+                server.server_close()
+
+            threading.Thread(target=stop, daemon=True).start()
+            self.path.unlink(missing_ok=True)
+        return {}
+
+    def is_serving(self) -> bool:
+        return self._server is not None
+
+    def serve_forever(self, poll_interval: float = 0.5):  # pragma: no cover
+        """
+        Start the daemon if it is not started yet, block until it is shut down.
+        """
+        if self.is_serving() is False:
+            self.start()
+        try:
+            while self.is_serving():
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            self.shutdown()
+
+
+# ------------------------------------------------------------------------------
+# Client
+# ------------------------------------------------------------------------------
+@dataclasses.dataclass
+class DaemonClient:
+    """
+    Thin client of the findref daemon, it keeps one connection open and
+    reconnects once if the connection is broken.
+
+    :param path: the socket file.
+    :param timeout: the socket timeout in seconds.
+    """
+
+    path: Path = dataclasses.field(default=path_daemon_socket)
+    timeout: float = dataclasses.field(default=5.0)
+
+    _sock: T.Optional[socket.socket] = dataclasses.field(
+        default=None, init=False, repr=False
+    )
+    _file: T.Optional[T.BinaryIO] = dataclasses.field(
+        default=None, init=False, repr=False
+    )
+    _next_id: int = dataclasses.field(default=0, init=False, repr=False)
+    _lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    def connect(self):
+        if self._sock is not None:
+            return
+        if not is_supported():  # pragma: no cover
+            raise DaemonNotRunningError("Unix domain socket is not supported")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(str(self.path))
+        except OSError as e:
+            sock.close()
+            raise DaemonNotRunningError(f"can't connect to {self.path}: {e}")
+        self._sock = sock
+        self._file = sock.makefile("rb")
+
+    def close(self):
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+        self._sock = None
+        self._file = None
+
+    def _send(self, request: T.Dict[str, T.Any]) -> T.Dict[str, T.Any]:
+        self.connect()
+        self._sock.sendall(encode_message(request))
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("the daemon closed the connection")
+        return decode_message(line)
+
+    def _send_once(self, request: T.Dict[str, T.Any]) -> T.Dict[str, T.Any]:
+        try:
+            return self._send(request)
+        except socket.timeout as e:
+            # the late response would be read as the response of the next
+            # request, drop the connection
+            self.close()
+            raise DaemonTimeoutError(f"no response in {self.timeout} seconds: {e}")
+
+    def request(self, method: str, **params) -> T.Any:
+        """
+        Send one request and wait for the response.
+
+        :raises DaemonNotRunningError: if the daemon is not running.
+        :raises DaemonTimeoutError: if the daemon didn't respond in time.
+        :raises DaemonError: if the daemon returned an error.
+        """
+        with self._lock:
+            self._next_id += 1
+            request = {"id": self._next_id, "method": method, "params": params}
+            try:
+                response = self._send_once(request)
+            except (DaemonNotRunningError, DaemonTimeoutError):
+                raise
+            except OSError:
+                # the daemon may have been restarted, reconnect once
+                self.close()
+                try:
+                    response = self._send_once(request)
+                except (DaemonNotRunningError, DaemonTimeoutError):
+                    raise
+                except OSError as e:
+                    self.close()
+                    raise DaemonNotRunningError(str(e))
+        if "error" in response:
+            raise DaemonError(response["error"])
+        return response["result"]
+
+    def ping(self) -> T.Dict[str, T.Any]:
+        return self.request("ping")
+
+    def search(
+        self,
+        dataset: str,
+        query: str,
+        limit: int = 50,
+        preprocess: bool = True,
+    ) -> T.Dict[str, T.Any]:
+        return self.request(
+            "search",
+            dataset=dataset,
+            query=query,
+            limit=limit,
+            preprocess=preprocess,
+        )
+
+    def federated(
+        self,
+        query: str,
+        limit: int = 50,
+        timeout: float = 0.5,
+        preprocess: bool = True,
+    ) -> T.Dict[str, T.Any]:
+        return self.request(
+            "federated",
+            query=query,
+            limit=limit,
+            timeout=timeout,
+            preprocess=preprocess,
+        )
+
+    def refresh(self, dataset: str) -> T.Dict[str, T.Any]:
+        return self.request("refresh", dataset=dataset)
+
+    def shutdown(self):
+        self.request("shutdown")
+        self.close()
+
+
+def get_client(path: Path = path_daemon_socket) -> T.Optional[DaemonClient]:
+    """
+    Return a connected client if the daemon is running and speaks the same
+    protocol version, otherwise None.
+    """
+    if (is_supported() is False) or (path.exists() is False):
+        return None
+    client = DaemonClient(path=path)
+    try:
+        version = client.ping()["version"]
+    except DaemonError:
+        client.close()
+        return None
+    # a daemon started before findref was upgraded
+    if version != DAEMON_PROTOCOL_VERSION:
+        client.close()
+        return None
+    return client
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+"""
+Run the searches off the input loop.
+
+The UI handler runs on every keystroke, a search that takes 50ms blocks the
+next keystroke for 50ms, fast typing queues up searches whose results are
+never seen. :class:`Dispatcher` runs them in one worker thread instead:
+
+- coalescing: the worker waits until no new query comes in for
+  ``coalesce_window`` seconds, the queries typed within the window are
+  replaced by the newest one and never searched.
+- cancellation: a query is superseded once a newer one is submitted. The
+  search calls :meth:`Dispatcher.check` between its stages to stop early,
+  and the result of a superseded query is dropped anyway.
+- only the result of the newest query is handed back, :meth:`Dispatcher.take`
+  returns it once, then ``on_done`` is called to repaint the UI.
+
+This module only imports the standard library.
+"""
+
+import typing as T
+import time
+import threading
+import dataclasses
+
+from .trace import tracer
+
+
+T_DONE = T.Tuple[T.Hashable, T.Optional[Exception], T.Any]
+
+
+class Cancelled(Exception):
+    """
+    The query is superseded by a newer one.
+    """
+
+
+@dataclasses.dataclass
+class _Job:
+    key: T.Hashable
+    func: T.Callable[[], T.Any]
+    on_done: T.Optional[T.Callable[[], T.Any]]
+    generation: int
+    submitted_at: float
+
+
+class Dispatcher:
+    """
+    Run the newest query in a worker thread.
+
+    :param coalesce_window: wait for this many seconds without a new query
+        before searching.
+    """
+
+    def __init__(self, coalesce_window: float = 0.03):
+        self.coalesce_window = coalesce_window
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._pending: T.Optional[_Job] = None
+        # (key, error, value) of the newest finished query, until it is taken
+        self._done: T.Optional[T_DONE] = None
+        self._last: T.Any = None
+        self._thread: T.Optional[threading.Thread] = None
+        self._local = threading.local()
+
+    @property
+    def generation(self) -> int:
+        """
+        Increased by every :meth:`submit` and :meth:`cancel`.
+        """
+        return self._generation
+
+    @property
+    def last(self) -> T.Any:
+        """
+        The result of the newest finished query, the UI keeps showing it
+        while the next query is running.
+        """
+        return self._last
+
+    def submit(
+        self,
+        key: T.Hashable,
+        func: T.Callable[[], T.Any],
+        on_done: T.Optional[T.Callable[[], T.Any]] = None,
+    ) -> int:
+        """
+        Run ``func`` in the worker thread, it supersedes all previous queries.
+
+        :param key: identify the query, for example ``(dataset, query)``.
+        :param on_done: called in the worker thread after ``func`` finished,
+            if no newer query is submitted by then.
+
+        :return: the generation of the query.
+        """
+        with self._cond:
+            self._generation += 1
+            if self._pending is not None:
+                tracer.incr("dispatch.coalesced")
+            self._pending = _Job(
+                key=key,
+                func=func,
+                on_done=on_done,
+                generation=self._generation,
+                submitted_at=time.perf_counter(),
+            )
+            self._done = None
+            if (self._thread is None) or (self._thread.is_alive() is False):
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return self._generation
+
+    def take(self, key: T.Hashable) -> T.Tuple[bool, T.Any]:
+        """
+        Pop the result of the newest query if it is finished and it is for
+        the given key. The exception raised by the query is re-raised here.
+
+        :return: a tuple of (found, result).
+        """
+        with self._cond:
+            done = self._done
+            if (done is None) or (done[0] != key):
+                return False, None
+            self._done = None
+        _, error, value = done
+        if error is not None:
+            raise error
+        return True, value
+
+    def cancel(self):
+        """
+        Supersede the pending and running query without a new one, and
+        forget the last result.
+        """
+        with self._cond:
+            self._generation += 1
+            self._pending = None
+            self._done = None
+            self._last = None
+
+    def check(self):
+        """
+        Raise :class:`Cancelled` if the query running in this thread is
+        superseded. Do nothing outside the worker thread.
+        """
+        generation = getattr(self._local, "generation", None)
+        if (generation is not None) and (generation != self._generation):
+            raise Cancelled
+
+    def _next_job(self) -> _Job:
+        with self._cond:
+            while 1:
+                while self._pending is None:
+                    self._cond.wait()
+                job = self._pending
+                remaining = job.submitted_at + self.coalesce_window
+                remaining -= time.perf_counter()
+                if remaining <= 0:
+                    self._pending = None
+                    return job
+                self._cond.wait(remaining)
+
+    def _run_job(self, job: _Job):
+        value, error = None, None
+        self._local.generation = job.generation
+        try:
+            value = job.func()
+        except Cancelled:
+            tracer.incr("dispatch.cancelled")
+            return
+        except Exception as e:
+            error = e
+        finally:
+            self._local.generation = None
+        with self._cond:
+            if job.generation != self._generation:
+                tracer.incr("dispatch.cancelled")
+                return
+            self._done = (job.key, error, value)
+            if error is None:
+                self._last = value
+        tracer.incr("dispatch.completed")
+        if job.on_done is not None:
+            job.on_done()
+
+    def _run(self):  # pragma: no cover
+        while 1:
+            self._run_job(self._next_job())
+
+
+dispatcher = Dispatcher()
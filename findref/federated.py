@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+"""
+Search many datasets at once and merge the results into one ranked list.
+
+Each dataset is searched in a thread pool against whatever index is on disk
+(see :meth:`findref.searcher.WarmDataSet.search_index`), datasets without an
+index are skipped instead of being downloaded. BM25 scores from different
+indexes are not comparable, so the scores of each dataset are divided by the
+best score of that dataset before merging. Each dataset has a time budget,
+results that are not ready in time are left out. The searches that haven't
+started yet are cancelled, the running ones keep running in background and
+their result lands in the query cache for the next keystroke. A dataset whose
+previous search is still running is not searched again until it is done, so
+the stale searches never pile up in the shared thread pool.
+"""
+
+import typing as T
+import time
+import threading
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+
+from . import models
+from .registry import DataSetRegistry, registry
+
+
+@dataclasses.dataclass
+class FederatedHit:
+    """
+    One document in the merged result.
+
+    :param dataset: the dataset the document comes from.
+    :param score: the raw score from the dataset index.
+    :param norm_score: the score normalized to ``(0, 1]`` within the dataset.
+    :param doc: the stored fields of the document.
+    """
+
+    dataset: str
+    score: float
+    norm_score: float
+    doc: T.Dict[str, T.Any]
+
+
+@dataclasses.dataclass
+class FederatedResult:
+    """
+    The merged result of a federated search.
+
+    :param hits: the merged top-N hits, best first.
+    :param not_indexed: datasets skipped because they don't have an index yet.
+    :param timed_out: datasets that didn't finish within the time budget.
+    :param failed: datasets that raised an error, mapped to the error.
+    :param took: how many seconds the federated search took.
+    """
+
+    hits: T.List[FederatedHit] = dataclasses.field(default_factory=list)
+    not_indexed: T.List[str] = dataclasses.field(default_factory=list)
+    timed_out: T.List[str] = dataclasses.field(default_factory=list)
+    failed: T.Dict[str, Exception] = dataclasses.field(default_factory=dict)
+    took: float = 0.0
+
+
+def normalize_hits(
+    dataset: str,
+    hits: T.List[T.Dict[str, T.Any]],
+) -> T.List[FederatedHit]:
+    """
+    Convert the ``hits`` of a ``simple_response=False`` search result into
+    :class:`FederatedHit`, divide the scores by the best one.
+    """
+    if len(hits) == 0:
+        return []
+    max_score = max(hit["_score"] for hit in hits)
+    return [
+        FederatedHit(
+            dataset=dataset,
+            score=hit["_score"],
+            norm_score=(hit["_score"] / max_score) if max_score > 0 else 1.0,
+            doc=hit["_source"],
+        )
+        for hit in hits
+    ]
+
+
+def merge_hits(
+    hits_list: T.Iterable[T.List[FederatedHit]],
+    limit: int,
+) -> T.List[FederatedHit]:
+    """
+    Merge the normalized hits of many datasets into one top-N list. Hits with
+    the same normalized score keep their rank within the dataset, so the top
+    result of each dataset comes before the second result of any dataset.
+    """
+    ranked = [
+        (-hit.norm_score, rank, hit)
+        for hits in hits_list
+        for rank, hit in enumerate(hits)
+    ]
+    ranked.sort(key=lambda x: (x[0], x[1]))
+    return [hit for _, _, hit in ranked[:limit]]
+
+
+_executor: T.Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# dataset name -> its search that timed out but is still running
+_running: T.Dict[str, Future] = dict()
+_running_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    The shared thread pool, one thread per dataset, created on first use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=len(models.DataSetEnum),
+                thread_name_prefix="findref-federated",
+            )
+        return _executor
+
+
+def federated_search(
+    query: str,
+    datasets: T.Optional[T.Iterable[str]] = None,
+    limit: int = 50,
+    per_dataset_limit: T.Optional[int] = None,
+    timeout: float = 0.5,
+    registry: DataSetRegistry = registry,
+    executor: T.Optional[ThreadPoolExecutor] = None,
+) -> FederatedResult:
+    """
+    Search the given datasets concurrently and merge the results.
+
+    :param query: the whoosh query string, it should already be preprocessed.
+    :param datasets: list of dataset names, all datasets if not given.
+    :param limit: the max number of hits in the merged result.
+    :param per_dataset_limit: the max number of hits from each dataset,
+        default is ``limit``.
+    :param timeout: the time budget in seconds for each dataset, all datasets
+        are searched in parallel so it is also the budget of the whole search.
+        The datasets that are still busy with a previous search are reported
+        as timed out.
+    :param registry: where to get the warm dataset objects.
+    :param executor: the thread pool, default is the shared one.
+    """
+    start = time.time()
+    if datasets is None:
+        datasets = [dataset.value for dataset in models.DataSetEnum]
+    else:
+        datasets = [models.DataSetEnum(dataset).value for dataset in datasets]
+    if per_dataset_limit is None:
+        per_dataset_limit = limit
+    if executor is None:
+        executor = get_executor()
+
+    result = FederatedResult()
+    futures: T.Dict[Future, str] = dict()
+    for dataset in datasets:
+        ds = registry.get(dataset)
+        if ds.has_index() is False:
+            result.not_indexed.append(dataset)
+            continue
+        with _running_lock:
+            running = _running.get(dataset)
+            if running is not None:
+                if running.done() is False:
+                    result.timed_out.append(dataset)
+                    continue
+                del _running[dataset]
+        future = executor.submit(
+            ds.search_index,
+            query=query,
+            limit=per_dataset_limit,
+            simple_response=False,
+        )
+        futures[future] = dataset
+
+    done, _ = wait(futures, timeout=timeout)
+    hits_list = list()
+    for future, dataset in futures.items():
+        if future not in done:
+            result.timed_out.append(dataset)
+            # drop it if it hasn't started yet, otherwise wait for it before
+            # searching this dataset again
+            if future.cancel() is False:
+                with _running_lock:
+                    _running[dataset] = future
+            continue
+        try:
+            res = future.result()
+        except Exception as e:
+            result.failed[dataset] = e
+            continue
+        hits_list.append(normalize_hits(dataset, res["hits"]))
+    result.hits = merge_hits(hits_list, limit=limit)
+    result.took = time.time() - start
+    return result
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+"""
+Prefix-incremental search.
+
+While the user types ``s3 put obj``, the UI searches ``s3~1 put~1`` and then
+``s3~1 put~1 obj~1``. The query parser joins the terms with AND, so the docs
+that match the longer query are a subset of the docs that matched the
+shorter one. :class:`IncrementalSearch` remembers the query and the matched
+doc ids of the previous search, if the new query only appends terms to it,
+it scores the previous candidates only, by skipping the new query matcher to
+each candidate, instead of running the new query over the whole index.
+Otherwise, it falls back to a full search.
+"""
+
+import typing as T
+import heapq
+import threading
+import dataclasses
+
+import whoosh.query
+import whoosh.searching
+
+from .memindex import SearchBackendEnum
+
+if T.TYPE_CHECKING:  # pragma: no cover
+    from .searcher import WarmDataSet
+    from .records import RecordStore
+
+
+def get_clauses(q: whoosh.query.Query) -> T.List[whoosh.query.Query]:
+    """
+    Get the AND clauses of the parsed query.
+    """
+    if isinstance(q, whoosh.query.And):
+        return list(q.subqueries)
+    return [q]
+
+
+def is_refinement(old_q: whoosh.query.Query, new_q: whoosh.query.Query) -> bool:
+    """
+    Return True if ``new_q`` is ``old_q`` AND more clauses, so it can only
+    match a subset of the docs that ``old_q`` matches.
+    """
+    if isinstance(old_q, whoosh.query.Every):
+        return False
+    old_clauses = get_clauses(old_q)
+    new_clauses = get_clauses(new_q)
+    return (len(new_clauses) > len(old_clauses)) and (
+        new_clauses[: len(old_clauses)] == old_clauses
+    )
+
+
+def score_candidates(
+    searcher: whoosh.searching.Searcher,
+    q: whoosh.query.Query,
+    candidates: T.Iterable[int],
+) -> T.List[T.Tuple[float, int]]:
+    """
+    Score the given doc ids with the query, skip the doc ids that don't match.
+
+    :return: list of ``(score, docnum)`` of the matched doc ids.
+    """
+    matcher = q.matcher(searcher, searcher.context())
+    scored = list()
+    for docnum in sorted(candidates):
+        if not matcher.is_active():
+            break
+        if matcher.id() < docnum:
+            matcher.skip_to(docnum)
+            if not matcher.is_active():
+                break
+        if matcher.id() == docnum:
+            scored.append((matcher.score(), docnum))
+    return scored
+
+
+@dataclasses.dataclass
+class _Snapshot:
+    """
+    The previous search.
+
+    :param q: the parsed query.
+    :param searcher: the searcher used, the doc ids are only valid for it.
+    :param results: the whoosh results of a full search, the matched doc ids
+        are computed from it on demand.
+    :param docset: the matched doc ids.
+    """
+
+    q: whoosh.query.Query
+    searcher: whoosh.searching.Searcher
+    results: T.Optional[whoosh.searching.Results] = None
+    docset: T.Optional[T.Set[int]] = None
+
+    def get_docset(self) -> T.Set[int]:
+        if self.docset is None:
+            self.docset = set(self.results.docs())
+            self.results = None
+        return self.docset
+
+
+@dataclasses.dataclass
+class IncrementalSearch:
+    """
+    Search one dataset, narrow the previous result if the query is refined.
+
+    :param ds: the dataset to search.
+    :param max_candidates: fall back to a full search if the previous query
+        matched more docs than this, scoring them one by one is slower than
+        a full search.
+    :param n_full: number of full searches.
+    :param n_incremental: number of incremental searches.
+    """
+
+    ds: "WarmDataSet"
+    max_candidates: int = 5000
+    n_full: int = 0
+    n_incremental: int = 0
+
+    _last: T.Optional[_Snapshot] = dataclasses.field(
+        default=None, init=False, repr=False
+    )
+    _lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    def _search_docnums(
+        self,
+        searcher: whoosh.searching.Searcher,
+        query: str,
+        limit: int,
+    ) -> T.List[int]:
+        new_q = self.ds._parse_query(query)
+        last = self._last
+        if (
+            (last is not None)
+            and (last.searcher is searcher)
+            and is_refinement(last.q, new_q)
+            and (len(last.get_docset()) <= self.max_candidates)
+        ):
+            scored = score_candidates(searcher, new_q, last.get_docset())
+            top = heapq.nsmallest(limit, scored, key=lambda x: (-x[0], x[1]))
+            self._last = _Snapshot(
+                q=new_q,
+                searcher=searcher,
+                docset={docnum for _, docnum in scored},
+            )
+            self.n_incremental += 1
+            return [docnum for _, docnum in top]
+
+        results = searcher.search(new_q, limit=limit)
+        self._last = _Snapshot(q=new_q, searcher=searcher, results=results)
+        self.n_full += 1
+        return [hit.docnum for hit in results]
+
+    def _is_supported(self) -> bool:
+        # the scores don't decide the order if there are sortable fields,
+        # the in-memory backend is fast enough without it
+        return (len(self.ds._sortable_fields) == 0) and (
+            self.ds.backend == SearchBackendEnum.whoosh.value
+        )
+
+    def search(self, query: str, limit: int = 20) -> T.List[T.Dict[str, T.Any]]:
+        """
+        Search the index on disk, returns the stored fields of the top docs,
+        same as ``WarmDataSet.search_index(query, limit, simple_response=True)``.
+        """
+        if self._is_supported() is False:
+            return self.ds.search_index(query=query, limit=limit)
+        with self._lock, self.ds._searcher_lock:
+            searcher = self.ds.get_searcher()
+            docnums = self._search_docnums(searcher, query, limit)
+            return [searcher.stored_fields(docnum) for docnum in docnums]
+
+    def search_ids(
+        self,
+        query: str,
+        limit: int = 20,
+    ) -> T.Tuple["RecordStore", T.List[int]]:
+        """
+        Same as :meth:`search`, but returns the record store and the doc ids
+        of the top docs, same as ``WarmDataSet.search_ids(query, limit)``.
+        """
+        if self._is_supported() is False:
+            return self.ds.search_ids(query=query, limit=limit)
+        with self._lock, self.ds._searcher_lock:
+            searcher = self.ds.get_searcher()
+            store = self.ds._get_record_store_for(searcher)
+            return store, self._search_docnums(searcher, query, limit)
+
+    def reset(self):
+        """
+        Forget the previous search.
+        """
+        with self._lock:
+            self._last = None
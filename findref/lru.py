@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""
+A small thread-safe in-process LRU cache.
+
+The UI uses it to keep the finished item lists of recent queries, so typing
+and backspacing over the same query strings doesn't search the index and
+build the items again.
+"""
+
+import typing as T
+import threading
+import dataclasses
+from collections import OrderedDict
+
+
+@dataclasses.dataclass
+class LRUCache:
+    """
+    Bounded LRU cache, the keys are tuples whose first element is the dataset
+    name, so all entries of one dataset can be invalidated at once.
+
+    :param maxsize: the max number of entries, the least recently used entry
+        is evicted when it is full.
+    :param hits: number of cache hits.
+    :param misses: number of cache misses.
+    """
+
+    maxsize: int = 256
+    hits: int = 0
+    misses: int = 0
+
+    _data: T.OrderedDict[tuple, T.Any] = dataclasses.field(
+        default_factory=OrderedDict, init=False, repr=False
+    )
+    _lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._data
+
+    def get(self, key: tuple, default: T.Any = None) -> T.Any:
+        """
+        Get the value of the key and mark it as the most recently used.
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: tuple, value: T.Any):
+        """
+        Set the value of the key, evict the least recently used entries if
+        the cache is full.
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, dataset: T.Optional[str] = None):
+        """
+        Remove all entries of the given dataset. If ``dataset`` is None,
+        remove all entries.
+        """
+        with self._lock:
+            if dataset is None:
+                self._data.clear()
+            else:
+                for key in [key for key in self._data if key[0] == dataset]:
+                    del self._data[key]
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return (self.hits / total) if total else 0.0
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compact in-memory n-gram inverted index, an alternative search backend to
+whoosh for the small findref documents.
+
+It is built from the same ``sayt`` field definitions as the whoosh index:
+
+- ``TextField``: lower case word tokens.
+- ``KeywordField``: lower case whitespace separated tokens.
+- ``NgramWordsField``: all ``minsize`` to ``maxsize`` long n-grams of each
+  lower case word token.
+- other fields are only stored.
+
+The fields that are not stored, like the tokenified ``TextField`` of
+:mod:`findref.schema`, are derived from the stored document by the
+``to_index_doc`` function, only the stored fields are kept in the index.
+
+Doc ids are the position of the document, posting lists are sorted
+``array("I")`` of doc ids, the posting lists of the query terms are
+intersected by galloping search, starting from the shortest one.
+
+The query language is much simpler than whoosh: the query is split by
+whitespace, the ``~N`` fuzzy suffix and the ``*`` / ``?`` wildcards are
+ignored, a document matches if every term is a token of a text / keyword
+field or a substring of a word in an n-gram field. ``*`` alone matches
+all documents.
+"""
+
+import typing as T
+import re
+import enum
+import dataclasses
+from array import array
+from bisect import bisect_left
+
+import sayt.api as sayt
+
+
+T_POSTINGS = T.Dict[str, array]
+T_HIT = T.Tuple[int, float]  # (doc id, score)
+T_TO_INDEX_DOC = T.Callable[[T.Dict[str, T.Any]], T.Dict[str, T.Any]]
+
+
+class SearchBackendEnum(str, enum.Enum):
+    whoosh = "whoosh"
+    memory = "memory"
+
+
+_word_pattern = re.compile(r"\w+", re.UNICODE)
+_fuzzy_pattern = re.compile(r"~\d*$")
+_exact_match_weight = 2.0
+
+
+def tokenize_text(value: str) -> T.List[str]:
+    return _word_pattern.findall(value.lower())
+
+
+def tokenize_keyword(value: str) -> T.List[str]:
+    return value.lower().split()
+
+
+def iter_ngrams(word: str, minsize: int, maxsize: int) -> T.Iterable[str]:
+    n = len(word)
+    for size in range(minsize, min(maxsize, n) + 1):
+        for i in range(n - size + 1):
+            yield word[i : i + size]
+
+
+def parse_query(query: str) -> T.Optional[T.List[str]]:
+    """
+    Convert the query string into a list of lower case terms. Return None if
+    the query matches all documents.
+    """
+    terms = list()
+    for word in query.lower().split():
+        word = _fuzzy_pattern.sub("", word).replace("*", "").replace("?", "")
+        terms.extend(_word_pattern.findall(word))
+    if len(terms) == 0:
+        return None
+    return terms
+
+
+def gallop_to(arr: array, x: int, lo: int) -> int:
+    """
+    Return the smallest index ``i >= lo`` that ``arr[i] >= x``, by doubling
+    the step until it passes ``x``, then binary search the last step.
+    """
+    n = len(arr)
+    step = 1
+    hi = lo
+    while (hi < n) and (arr[hi] < x):
+        lo = hi + 1
+        hi = lo + step
+        step <<= 1
+    return bisect_left(arr, x, lo, min(hi, n))
+
+
+def intersect(a: array, b: array) -> array:
+    """
+    Intersect two sorted posting lists, gallop in the longer one.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    out = array("I")
+    n = len(b)
+    i = 0
+    for x in a:
+        i = gallop_to(b, x, i)
+        if i >= n:
+            break
+        if b[i] == x:
+            out.append(x)
+            i += 1
+    return out
+
+
+def union(posting_lists: T.List[array]) -> array:
+    if len(posting_lists) == 1:
+        return posting_lists[0]
+    return array("I", sorted(set().union(*posting_lists)))
+
+
+def contains(arr: array, x: int) -> bool:
+    i = bisect_left(arr, x)
+    return (i < len(arr)) and (arr[i] == x)
+
+
+@dataclasses.dataclass
+class _IndexedField:
+    """
+    The posting lists of one searchable field.
+
+    :param name: the field name.
+    :param kind: one of ``"text"``, ``"keyword"``, ``"ngram"``.
+    :param boost: the field boost.
+    :param minsize: the min n-gram size.
+    :param maxsize: the max n-gram size.
+    :param postings: term -> sorted doc ids.
+    :param lengths: doc id -> the length of the field value, used to prefer
+        short values when a term is a substring of them.
+    """
+
+    name: str
+    kind: str
+    boost: float = 1.0
+    minsize: int = 2
+    maxsize: int = 6
+    postings: T_POSTINGS = dataclasses.field(default_factory=dict)
+    lengths: array = dataclasses.field(default_factory=lambda: array("H"))
+
+    def tokenize(self, value: str) -> T.Iterable[str]:
+        if self.kind == "text":
+            return set(tokenize_text(value))
+        elif self.kind == "keyword":
+            return set(tokenize_keyword(value))
+        else:
+            return {
+                gram
+                for word in tokenize_text(value)
+                for gram in iter_ngrams(word, self.minsize, self.maxsize)
+            }
+
+    def add(self, doc_id: int, value: T.Optional[str]):
+        if value:
+            value = str(value)
+            for term in self.tokenize(value):
+                try:
+                    self.postings[term].append(doc_id)
+                except KeyError:
+                    self.postings[term] = array("I", [doc_id])
+            self.lengths.append(min(len(value), 65535))
+        else:
+            self.lengths.append(0)
+
+    def match(
+        self,
+        term: str,
+        docs: T.List[T.Dict[str, T.Any]],
+    ) -> T.Optional[array]:
+        """
+        Return the doc ids that match the term in this field, None if the
+        term can't match this field.
+        """
+        if self.kind != "ngram":
+            return self.postings.get(term)
+        if len(term) < self.minsize:
+            return None
+        if len(term) <= self.maxsize:
+            return self.postings.get(term)
+        # longer than the max n-gram, all of its max size n-grams must match,
+        # then verify the candidates against the stored value
+        grams = sorted(
+            set(iter_ngrams(term, self.maxsize, self.maxsize)),
+            key=lambda gram: len(self.postings.get(gram, ())),
+        )
+        candidates = None
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                return None
+            candidates = (
+                posting if candidates is None else intersect(candidates, posting)
+            )
+            if len(candidates) == 0:
+                return None
+        return array(
+            "I",
+            [
+                doc_id
+                for doc_id in candidates
+                if term in str(docs[doc_id].get(self.name) or "").lower()
+            ],
+        )
+
+    def score(self, doc_id: int, term: str) -> float:
+        if self.kind == "ngram":
+            length = self.lengths[doc_id] or 1
+            return self.boost * (1.0 + min(len(term) / length, 1.0))
+        return self.boost * _exact_match_weight
+
+
+_field_kinds = {
+    sayt.TextField: "text",
+    sayt.KeywordField: "keyword",
+    sayt.NgramWordsField: "ngram",
+}
+
+
+@dataclasses.dataclass
+class MemoryIndex:
+    """
+    In-memory n-gram inverted index.
+
+    :param fields: the searchable fields.
+    :param docs: doc id -> the stored fields of the document.
+    """
+
+    fields: T.List[_IndexedField] = dataclasses.field(default_factory=list)
+    docs: T.List[T.Dict[str, T.Any]] = dataclasses.field(default_factory=list)
+
+    @classmethod
+    def from_fields(cls, fields: T.List[sayt.T_Field]) -> "MemoryIndex":
+        """
+        Create an empty index for the given ``sayt`` field definitions.
+        """
+        indexed_fields = list()
+        for field in fields:
+            kind = _field_kinds.get(type(field))
+            if kind is None:
+                continue
+            indexed_field = _IndexedField(
+                name=field.name,
+                kind=kind,
+                boost=float(field.field_boost),
+            )
+            if kind == "ngram":
+                indexed_field.minsize = field.minsize
+                indexed_field.maxsize = field.maxsize
+            indexed_fields.append(indexed_field)
+        return cls(fields=indexed_fields)
+
+    @classmethod
+    def build(
+        cls,
+        fields: T.List[sayt.T_Field],
+        docs: T.Iterable[T.Dict[str, T.Any]],
+        to_index_doc: T.Optional[T_TO_INDEX_DOC] = None,
+    ) -> "MemoryIndex":
+        """
+        Build the index from the given field definitions and documents.
+
+        :param to_index_doc: derive the values of the fields that are not
+            stored from the document, see
+            :meth:`findref.schema.CompiledSchema.to_index_doc`.
+        """
+        index = cls.from_fields(fields)
+        for doc in docs:
+            index.add(doc, None if to_index_doc is None else to_index_doc(doc))
+        return index
+
+    def add(
+        self,
+        doc: T.Dict[str, T.Any],
+        index_doc: T.Optional[T.Dict[str, T.Any]] = None,
+    ) -> int:
+        """
+        Add a document, returns its doc id.
+
+        :param doc: the stored fields of the document.
+        :param index_doc: the values of the searchable fields, default to
+            ``doc``.
+        """
+        doc_id = len(self.docs)
+        self.docs.append(doc)
+        if index_doc is None:
+            index_doc = doc
+        for field in self.fields:
+            field.add(doc_id, index_doc.get(field.name))
+        return doc_id
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def _match_term(self, term: str) -> array:
+        posting_lists = list()
+        for field in self.fields:
+            posting = field.match(term, self.docs)
+            if posting:
+                posting_lists.append(posting)
+        if len(posting_lists) == 0:
+            return array("I")
+        return union(posting_lists)
+
+    def _score(self, doc_id: int, terms: T.List[str]) -> float:
+        score = 0.0
+        for term in terms:
+            for field in self.fields:
+                if field.kind == "ngram" and len(term) > field.maxsize:
+                    value = str(self.docs[doc_id].get(field.name) or "").lower()
+                    if term in value:
+                        score += field.score(doc_id, term)
+                else:
+                    posting = field.postings.get(term)
+                    if (posting is not None) and contains(posting, doc_id):
+                        score += field.score(doc_id, term)
+        return score
+
+    def search(self, query: str, limit: int = 20) -> T.List[T_HIT]:
+        """
+        Search the index, returns the ``(doc id, score)`` of the top documents,
+        best first. Documents with the same score keep the index order.
+        """
+        terms = parse_query(query)
+        if terms is None:
+            return [(doc_id, 1.0) for doc_id in range(min(limit, len(self.docs)))]
+        posting_lists = sorted(
+            (self._match_term(term) for term in dict.fromkeys(terms)),
+            key=len,
+        )
+        doc_ids = posting_lists[0]
+        for posting in posting_lists[1:]:
+            if len(doc_ids) == 0:
+                break
+            doc_ids = intersect(doc_ids, posting)
+        hits = [(doc_id, self._score(doc_id, terms)) for doc_id in doc_ids]
+        hits.sort(key=lambda hit: (-hit[1], hit[0]))
+        return hits[:limit]
@@ -7,27 +7,53 @@ Version: 0.2.1
 """
 
 import typing as T
+import os
+import io
 import enum
 import json
+import zlib
+import codecs
+import hashlib
 import dataclasses
 from pathlib import Path
 from urllib import request
 
 import sayt.api as sayt
+from diskcache import Cache
+
+from .constants import DataSetEnum
+from .sources import (
+    AssetNotFoundError,
+    ReleaseSource,
+    GitHubReleaseSource,
+    get_release_source,
+)
+from .memindex import SearchBackendEnum
+from .schema import (
+    CompiledSchema,
+    attr,
+    text,
+    ngram,
+    keyword,
+    tokenify,
+    compile_schema,
+    get_schema_fingerprint,
+)
 
 
 T_DATA = T.Dict[str, T.Any]
 
 
-class DataSetEnum(str, enum.Enum):
-    airflow = "airflow"  # Airflow
-    aws_cloudformation = "aws_cloudformation"  # AWS CloudFormation
-    boto3 = "boto3"  # AWS Python SDK - boto3
-    cdk_python = "cdk_python"  # AWS CDK Python
-    cdk_ts = "cdk_ts"  # AWS CDK TypeScript
-    pyspark = "pyspark"  # PySpark
-    pandas = "pandas"  # Pandas
-    tf = "tf"  # Terraform
+_field_names: T.Dict[T.Type, T.FrozenSet[str]] = dict()
+
+
+def _get_field_names(klass: T.Type) -> T.FrozenSet[str]:
+    try:
+        return _field_names[klass]
+    except KeyError:
+        names = frozenset(field.name for field in dataclasses.fields(klass))
+        _field_names[klass] = names
+        return names
 
 
 @dataclasses.dataclass
@@ -37,7 +63,13 @@ class BaseModel:
 
     @classmethod
     def from_dict(cls, dct: T.Dict[str, T.Any]):
-        return cls(**dct)
+        """
+        Create the object from a dict, the keys that are not its fields are
+        ignored, for example the stored fields of an index built with an
+        older schema.
+        """
+        names = _get_field_names(cls)
+        return cls(**{key: value for key, value in dct.items() if key in names})
 
 
 @dataclasses.dataclass
@@ -45,6 +77,139 @@ class Metadata(BaseModel):
     dataset_name: str = dataclasses.field()
 
 
+# ------------------------------------------------------------------------------
+# Compressed release format
+#
+# The binary layout is a 6 bytes header followed by the compressed body:
+#
+# - 4 bytes magic ``b"FRRL"``
+# - 1 byte format version
+# - 1 byte compression codec id, see ``_compression_to_id``
+#
+# The decompressed body is UTF-8 JSON lines, the first line is
+# ``{"metadata": {...}, "fields": [...]}``, each of the following lines is
+# one document as a JSON array of values in the order of ``fields``.
+# ------------------------------------------------------------------------------
+RELEASE_MAGIC = b"FRRL"
+RELEASE_FORMAT_VERSION = 1
+
+
+class CompressionEnum(str, enum.Enum):
+    gzip = "gzip"  # stdlib, always available
+    zstd = "zstd"  # requires the optional ``zstandard`` package
+
+
+_compression_to_id = {
+    CompressionEnum.gzip.value: 1,
+    CompressionEnum.zstd.value: 2,
+}
+_id_to_compression = {v: k for k, v in _compression_to_id.items()}
+
+
+class UnsupportedReleaseFormatError(ValueError):
+    """
+    Raised when the release binary is not the compressed release format, or
+    it requires a newer format version or an unavailable codec.
+    """
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == CompressionEnum.gzip.value:
+        obj = zlib.compressobj(level=9, wbits=31)
+        return obj.compress(data) + obj.flush()
+    elif compression == CompressionEnum.zstd.value:
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=19).compress(data)
+    else:  # pragma: no cover
+        raise ValueError(f"unknown compression {compression!r}")
+
+
+def _iter_decompressed(
+    stream: T.BinaryIO,
+    compression: str,
+    chunk_size: int,
+) -> T.Iterator[bytes]:
+    if compression == CompressionEnum.gzip.value:
+        obj = zlib.decompressobj(wbits=31)
+        while 1:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            yield obj.decompress(chunk)
+        yield obj.flush()
+    elif compression == CompressionEnum.zstd.value:
+        import zstandard
+
+        reader = zstandard.ZstdDecompressor().stream_reader(stream)
+        while 1:
+            chunk = reader.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    else:  # pragma: no cover
+        raise ValueError(f"unknown compression {compression!r}")
+
+
+def read_release_header(stream: T.BinaryIO) -> str:
+    """
+    Read the compressed release header from the stream and return the
+    compression codec name.
+
+    :raises UnsupportedReleaseFormatError: if this client cannot decode it.
+    """
+    header = stream.read(len(RELEASE_MAGIC) + 2)
+    if header[: len(RELEASE_MAGIC)] != RELEASE_MAGIC:
+        raise UnsupportedReleaseFormatError("not a compressed findref release")
+    version, codec_id = header[len(RELEASE_MAGIC) :]
+    if version > RELEASE_FORMAT_VERSION:
+        raise UnsupportedReleaseFormatError(
+            f"release format version {version} is not supported, "
+            f"please upgrade findref"
+        )
+    try:
+        compression = _id_to_compression[codec_id]
+    except KeyError:
+        raise UnsupportedReleaseFormatError(f"unknown codec id {codec_id}")
+    if compression == CompressionEnum.zstd.value:
+        try:
+            import zstandard
+        except ImportError:
+            raise UnsupportedReleaseFormatError(
+                "zstd compressed release requires the 'zstandard' package"
+            )
+    return compression
+
+
+def iter_compressed_release(
+    stream: T.BinaryIO,
+    chunk_size: int = 64 * 1024,
+) -> T.Iterator[T.Dict[str, T.Any]]:
+    """
+    Incrementally decode a compressed release from a binary stream. The first
+    yielded item is the header dict ``{"metadata": ..., "fields": ...}``, the
+    following items are documents.
+    """
+    compression = read_release_header(stream)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    fields = None
+    buf = ""
+    for chunk in _iter_decompressed(stream, compression, chunk_size):
+        buf += decoder.decode(chunk)
+        lines = buf.split("\n")
+        buf = lines.pop()
+        for line in lines:
+            if fields is None:
+                header = json.loads(line)
+                fields = header["fields"]
+                yield header
+            else:
+                yield dict(zip(fields, json.loads(line)))
+    buf += decoder.decode(b"", final=True)
+    if buf.strip():
+        raise ValueError("incomplete compressed release")
+
+
 @dataclasses.dataclass
 class Release(BaseModel):
     """
@@ -62,6 +227,112 @@ class Release(BaseModel):
         }
         return json.dumps(dct, sort_keys=True, ensure_ascii=False).encode("utf-8")
 
+    def to_compressed_binary(
+        self,
+        compression: str = CompressionEnum.gzip.value,
+    ) -> bytes:
+        """
+        Serialize to the compressed release format. Field names are stored
+        once in the header instead of in every document.
+
+        :param compression: one of :class:`CompressionEnum`.
+        """
+        fields = dict()
+        for doc in self.docs:
+            for key in doc:
+                fields.setdefault(key, None)
+        fields = list(fields)
+        header = {"metadata": self.metadata.to_dict(), "fields": fields}
+        lines = [json.dumps(header, ensure_ascii=False)]
+        for doc in self.docs:
+            row = [doc.get(field) for field in fields]
+            lines.append(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+        lines.append("")
+        body = "\n".join(lines).encode("utf-8")
+        compression = CompressionEnum(compression).value
+        prefix = RELEASE_MAGIC + bytes(
+            [RELEASE_FORMAT_VERSION, _compression_to_id[compression]]
+        )
+        return prefix + _compress(body, compression)
+
+    @classmethod
+    def from_binary(cls, binary: bytes):
+        """
+        Deserialize from either the JSON or the compressed release format.
+        """
+        if binary.startswith(RELEASE_MAGIC):
+            items = iter_compressed_release(io.BytesIO(binary))
+            header = next(items)
+            return cls(
+                metadata=Metadata.from_dict(header["metadata"]),
+                docs=list(items),
+            )
+        data = json.loads(binary.decode("utf-8"))
+        data["metadata"] = Metadata.from_dict(data["metadata"])
+        return cls(**data)
+
+
+def get_doc_hash(doc: T.Dict[str, T.Any]) -> str:
+    """
+    Get the content hash of a document.
+    """
+    binary = json.dumps(doc, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha1(binary).hexdigest()[:16]
+
+
+@dataclasses.dataclass
+class ReleaseDelta(BaseModel):
+    """
+    The document level difference between two releases of the same dataset.
+    Documents are identified by the ``url`` field, which is the
+    :attr:`CommonDocument.uid`.
+
+    :param metadata: metadata object.
+    :param from_tag: the release tag name of the old release.
+    :param to_tag: the release tag name of the new release.
+    :param upserts: list of new or changed documents.
+    :param deletes: list of uid of the removed documents.
+    """
+
+    metadata: Metadata
+    from_tag: str
+    to_tag: str
+    upserts: T.List[T.Dict[str, T.Any]]
+    deletes: T.List[str]
+
+    @classmethod
+    def from_releases(
+        cls,
+        old: Release,
+        new: Release,
+        from_tag: str,
+        to_tag: str,
+        uid_key: str = "url",
+    ):
+        """
+        Compare two releases and create the delta.
+        """
+        old_hashes = {doc[uid_key]: get_doc_hash(doc) for doc in old.docs}
+        upserts = list()
+        new_uids = set()
+        for doc in new.docs:
+            uid = doc[uid_key]
+            new_uids.add(uid)
+            if old_hashes.get(uid) != get_doc_hash(doc):
+                upserts.append(doc)
+        deletes = sorted([uid for uid in old_hashes if uid not in new_uids])
+        return cls(
+            metadata=new.metadata,
+            from_tag=from_tag,
+            to_tag=to_tag,
+            upserts=upserts,
+            deletes=deletes,
+        )
+
+    def to_binary(self) -> bytes:
+        dct = self.to_dict()
+        return json.dumps(dct, sort_keys=True, ensure_ascii=False).encode("utf-8")
+
     @classmethod
     def from_binary(cls, binary: bytes):
         data = json.loads(binary.decode("utf-8"))
@@ -73,16 +344,23 @@ class Release(BaseModel):
 # List of dataset models
 #
 # For each dataset, it has to have the following variables:
-# 1. ``class ${DataSetName}Record``
-# 2. ``class ${DataSetName}Document``
-# 3. ``${DataSetName}_fields``
+# 1. ``class ${DataSetName}Record``, the attributes are annotated with
+#    :func:`findref.schema.attr`
+# 2. ``${DataSetName}_schema``, compiled from the record class, it generates
+#    ``${DataSetName}Document`` and ``${DataSetName}_fields``
 # ------------------------------------------------------------------------------
 @dataclasses.dataclass
 class BaseRecord(BaseModel):
+    # set by :func:`findref.schema.compile_schema`
+    schema: T.ClassVar[CompiledSchema]
+
     @property
     def sort_key(self) -> str:
         raise NotImplementedError
 
+    def to_doc(self) -> "BaseDocument":
+        return self.schema.to_doc(self)
+
     @classmethod
     def sort_by_sort_keys(cls, records) -> T.Iterable:
         return sorted(
@@ -93,6 +371,22 @@ class BaseRecord(BaseModel):
 
 @dataclasses.dataclass
 class BaseDocument(BaseModel):
+    """
+    The base class of the search documents.
+
+    :attr:`render_fields` are the display properties that are costly enough
+    to compute them once per index generation instead of once per hit, see
+    :meth:`render` and :class:`findref.records.RecordStore`.
+    """
+
+    render_fields: T.ClassVar[T.Tuple[str, ...]] = ()
+
+    def render(self) -> T.Dict[str, str]:
+        """
+        The precomputed values of the :attr:`render_fields`.
+        """
+        return {name: getattr(self, name) for name in self.render_fields}
+
     @property
     def uid(self) -> str:
         raise NotImplementedError
@@ -119,6 +413,10 @@ _title_to_autocomplete_delimiters = "_-.|@+"
 
 @dataclasses.dataclass
 class CommonDocument(BaseDocument):
+    # uid, subtitle and arg are the url or a short f-string of it, storing
+    # them costs more memory than computing them for the displayed hits
+    render_fields: T.ClassVar[T.Tuple[str, ...]] = ("title", "autocomplete")
+
     @property
     def uid(self) -> str:
         return self.url
@@ -143,16 +441,6 @@ class CommonDocument(BaseDocument):
         return " ".join([word.strip() for word in s.split() if word.strip()])
 
 
-def tokenify(s: str) -> str:
-    """
-    Sometimes the default tokenizer analyzer is not good enough, we need to
-    preprocess the TextField before indexing it.
-    """
-    for char in "._-":
-        s = s.replace(char, " ")
-    return s
-
-
 # ------------------------------------------------------------------------------
 # Airflow
 # ------------------------------------------------------------------------------
@@ -170,77 +458,29 @@ class AirflowRecord(BaseRecord):
     :param title: the header title in the *.rst file, in this example, it is ``"Amazon S3 Operators"``.
     """
 
-    url: str
-    sub_doc: str
-    title: str
+    url: str = attr("url")
+    sub_doc: str = attr("sub_doc", text(boost=5.0, tokenify=True), ngram(boost=5.0))
+    title: str = attr("header", text(tokenify=True), ngram())
 
     @property
     def sort_key(self) -> str:
         return self.url
 
-    def to_doc(self) -> "AirflowDocument":
-        return AirflowDocument(
-            url=self.url,
-            sub_doc=tokenify(self.sub_doc),
-            sub_doc_ng=self.sub_doc,
-            header=tokenify(self.title),
-            header_ng=self.title,
-        )
-
-
-@dataclasses.dataclass
-class AirflowDocument(CommonDocument):
-    """
-    Example:
-
-    - doc url: https://airflow.apache.org/docs/apache-airflow-providers-amazon/stable/operators/s3/index.html
-    - doc source: https://github.com/apache/airflow/blob/main/docs/apache-airflow-providers-amazon/operators/s3/index.rst
-
-    :param url: same as :attr:`AirflowRecord.url`
-    :param sub_doc: same as :attr:`AirflowRecord.sub_doc`
-    :param sub_doc_ng: same as :attr:`AirflowRecord.sub_doc`
-    :param header: same as :attr:`AirflowRecord.title`
-    :param header_ng: same as :attr:`AirflowRecord.title`
-    """
-
-    url: str
-    sub_doc: str
-    sub_doc_ng: str
-    header: str
-    header_ng: str
 
-    @property
-    def title(self) -> str:
-        return f"{self.sub_doc_ng} | {self.header_ng}"
+def _airflow_title(doc: "AirflowDocument") -> str:
+    return f"{doc.sub_doc_ng} | {doc.header_ng}"
 
 
-airflow_fields = [
-    sayt.StoredField(
-        name="url",
-    ),
-    sayt.TextField(
-        name="sub_doc",
-        stored=True,
-        field_boost=5.0,
-    ),
-    sayt.NgramWordsField(
-        name="sub_doc_ng",
-        stored=True,
-        field_boost=5.0,
-        minsize=2,
-        maxsize=6,
-    ),
-    sayt.TextField(
-        name="header",
-        stored=True,
-    ),
-    sayt.NgramWordsField(
-        name="header_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-    ),
-]
+airflow_schema = compile_schema(
+    dataset=DataSetEnum.airflow.value,
+    record_class=AirflowRecord,
+    doc_name="AirflowDocument",
+    doc_base=CommonDocument,
+    title=_airflow_title,
+    backend=SearchBackendEnum.whoosh.value,
+)
+AirflowDocument = airflow_schema.doc_class
+airflow_fields = airflow_schema.fields
 
 
 # ------------------------------------------------------------------------------
@@ -262,117 +502,36 @@ class AwsCloudFormationRecord(BaseRecord):
         In this example, it is ``"BucketEncryption"``
     """
 
-    url: str
-    type: str
-    service: str
-    resource: str
-    prop: T.Optional[str] = dataclasses.field(default=None)
+    url: str = attr("url")
+    type: str = attr("type", text(boost=10.0), ngram(boost=10.0))
+    service: str = attr("srv", text(boost=5.0), ngram(boost=5.0))
+    resource: str = attr("res", text(boost=10.0), ngram(boost=10.0))
+    prop: T.Optional[str] = attr(
+        "prop", text(boost=10.0), ngram(boost=10.0), default=None
+    )
 
     @property
     def sort_key(self) -> str:
         return " ".join([self.type, self.service, self.resource, str(self.prop)])
 
-    def to_doc(self) -> "AwsCloudFormationDocument":
-        return AwsCloudFormationDocument(
-            url=self.url,
-            type=self.type,
-            type_ng=self.type,
-            srv=self.service,
-            srv_ng=self.service,
-            res=self.resource,
-            res_ng=self.resource,
-            prop=self.prop,
-            prop_ng=self.prop,
-        )
-
-
-@dataclasses.dataclass
-class AwsCloudFormationDocument(CommonDocument):
-    """
-    Example: https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/aws-resource-s3-bucket.html
 
-    :param url: same as :attr:`AwsCloudFormationRecord.url``
-    :param type: same as :attr:`AwsCloudFormationRecord.type``
-    :param type_ng: same as :attr:`AwsCloudFormationRecord.type``
-    :param srv: same as :attr:`AwsCloudFormationRecord.service``
-    :param srv_ng: same as :attr:`AwsCloudFormationRecord.service``
-    :param res: same as :attr:`AwsCloudFormationRecord.resource``
-    :param res_ng: same as :attr:`AwsCloudFormationRecord.resource``
-    :param prop: same as :attr:`AwsCloudFormationRecord.prop``
-    :param prop_ng: same as :attr:`AwsCloudFormationRecord.prop``
-    """
+def _aws_cloudformation_title(doc: "AwsCloudFormationDocument") -> str:
+    if doc.prop_ng:
+        return f"{doc.type_ng}: {doc.srv_ng} | {doc.res_ng} - {doc.prop_ng}"
+    else:
+        return f"{doc.type_ng}: {doc.srv_ng} | {doc.res_ng}"
 
-    url: str
-    type: str
-    type_ng: str
-    srv: str
-    srv_ng: str
-    res: str
-    res_ng: str
-    prop: T.Optional[str] = dataclasses.field(default=None)
-    prop_ng: T.Optional[str] = dataclasses.field(default=None)
 
-    @property
-    def title(self) -> str:
-        if self.prop_ng:
-            return f"{self.type_ng}: {self.srv_ng} | {self.res_ng} - {self.prop_ng}"
-        else:
-            return f"{self.type_ng}: {self.srv_ng} | {self.res_ng}"
-
-
-aws_cloudformation_fields = [
-    sayt.StoredField(
-        name="url",
-    ),
-    sayt.TextField(
-        name="type",
-        stored=True,
-        field_boost=10.0,
-    ),
-    sayt.NgramWordsField(
-        name="type_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-        field_boost=10.0,
-    ),
-    sayt.TextField(
-        name="srv",
-        stored=True,
-        field_boost=5.0,
-    ),
-    sayt.NgramWordsField(
-        name="srv_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-        field_boost=5.0,
-    ),
-    sayt.TextField(
-        name="res",
-        stored=True,
-        field_boost=10.0,
-    ),
-    sayt.NgramWordsField(
-        name="res_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-        field_boost=10.0,
-    ),
-    sayt.TextField(
-        name="prop",
-        stored=True,
-        field_boost=10.0,
-    ),
-    sayt.NgramWordsField(
-        name="prop_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-        field_boost=10.0,
-    ),
-]
+aws_cloudformation_schema = compile_schema(
+    dataset=DataSetEnum.aws_cloudformation.value,
+    record_class=AwsCloudFormationRecord,
+    doc_name="AwsCloudFormationDocument",
+    doc_base=CommonDocument,
+    title=_aws_cloudformation_title,
+    backend=SearchBackendEnum.whoosh.value,
+)
+AwsCloudFormationDocument = aws_cloudformation_schema.doc_class
+aws_cloudformation_fields = aws_cloudformation_schema.fields
 
 
 # ------------------------------------------------------------------------------
@@ -412,102 +571,31 @@ class Boto3Record(BaseRecord):
         :param method: in this example, it is the method name ``"create_role"``.
     """
 
-    url: str
-    type: str
-    service_id: str
-    service_name: str
-    method: str
+    url: str = attr("url")
+    type: str = attr("type", keyword(boost=10.0))
+    service_id: str = attr("srv_id", text(boost=5.0, tokenify=True), ngram(boost=5.0))
+    service_name: str = attr("srv", text(boost=5.0, tokenify=True), ngram(boost=5.0))
+    method: str = attr("meth", text(tokenify=True), ngram())
 
     @property
     def sort_key(self) -> str:
         return " ".join([self.service_id, self.type, self.method])
 
-    def to_doc(self) -> "Boto3Document":
-        return Boto3Document(
-            url=self.url,
-            type=self.type,
-            srv=tokenify(self.service_name),
-            srv_ng=self.service_name,
-            srv_id=tokenify(self.service_id),
-            srv_id_ng=self.service_id,
-            meth=tokenify(self.method),
-            meth_ng=self.method,
-        )
-
-
-@dataclasses.dataclass
-class Boto3Document(CommonDocument):
-    """
-    Example: https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/iam/client/create_role.html
 
-    :param url: same as :attr:`Boto3Record.url`
-    :param type: same as :attr:`Boto3Record.type`
-    :param srv: same as :attr:`Boto3Record.service_name`
-    :param srv_ng: same as :attr:`Boto3Record.service_name`
-    :param srv_id: same as :attr:`Boto3Record.service_id`
-    :param srv_id_ng: same as :attr:`Boto3Record.service_id`
-    :param meth: same as :attr:`Boto3Record.method`
-    :param meth_ng: same as :attr:`Boto3Record.method`
-    """
+def _boto3_title(doc: "Boto3Document") -> str:
+    return f"{doc.type} | {doc.srv_id_ng.lower()}.{doc.meth_ng}"
 
-    url: str
-    type: str
-    srv: str
-    srv_ng: str
-    srv_id: str
-    srv_id_ng: str
-    meth: str
-    meth_ng: str
 
-    @property
-    def title(self) -> str:
-        return f"{self.type} | {self.srv_id_ng.lower()}.{self.meth_ng}"
-
-
-boto3_fields = [
-    sayt.StoredField(
-        name="url",
-    ),
-    sayt.KeywordField(
-        name="type",
-        stored=True,
-        field_boost=10.0,
-    ),
-    sayt.TextField(
-        name="srv",
-        stored=True,
-        field_boost=5.0,
-    ),
-    sayt.NgramWordsField(
-        name="srv_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-        field_boost=5.0,
-    ),
-    sayt.TextField(
-        name="srv_id",
-        stored=True,
-        field_boost=5.0,
-    ),
-    sayt.NgramWordsField(
-        name="srv_id_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-        field_boost=5.0,
-    ),
-    sayt.TextField(
-        name="meth",
-        stored=True,
-    ),
-    sayt.NgramWordsField(
-        name="meth_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-    ),
-]
+boto3_schema = compile_schema(
+    dataset=DataSetEnum.boto3.value,
+    record_class=Boto3Record,
+    doc_name="Boto3Document",
+    doc_base=CommonDocument,
+    title=_boto3_title,
+    backend=SearchBackendEnum.whoosh.value,
+)
+Boto3Document = boto3_schema.doc_class
+boto3_fields = boto3_schema.fields
 
 
 # ------------------------------------------------------------------------------
@@ -550,74 +638,29 @@ class CdkPythonRecord(BaseRecord):
         In this example, it is ``"Bucket"``.
     """
 
-    url: str
-    service: str
-    object: str
+    url: str = attr("url")
+    service: str = attr("srv", text(boost=5.0, tokenify=True), ngram(boost=5.0))
+    object: str = attr("obj", text(tokenify=True), ngram())
 
     @property
     def sort_key(self) -> str:
         return " ".join([self.service, self.object])
 
-    def to_doc(self) -> "CdkPythonDocument":
-        return CdkPythonDocument(
-            url=self.url,
-            srv=tokenify(self.service),
-            srv_ng=self.service,
-            obj=tokenify(self.object),
-            obj_ng=self.object,
-        )
 
+def _cdk_python_title(doc: "CdkPythonDocument") -> str:
+    return f"{doc.srv_ng} | {doc.obj_ng}"
 
-@dataclasses.dataclass
-class CdkPythonDocument(CommonDocument):
-    """
-    Example: https://docs.aws.amazon.com/cdk/api/v2/python/aws_cdk.aws_s3/Bucket.html
 
-    :param url: same as :attr:`CdkPythonRecord.url``
-    :param srv: same as :attr:`CdkPythonRecord.service``
-    :param srv_ng: same as :attr:`CdkPythonRecord.service``
-    :param obj: same as :attr:`CdkPythonRecord.object``
-    :param obj_ng: same as :attr:`CdkPythonRecord.object``
-    """
-
-    url: str
-    srv: str
-    srv_ng: str
-    obj: str
-    obj_ng: str
-
-    @property
-    def title(self) -> str:
-        return f"{self.srv_ng} | {self.obj_ng}"
-
-
-cdk_python_fields = [
-    sayt.StoredField(
-        name="url",
-    ),
-    sayt.TextField(
-        name="srv",
-        stored=True,
-        field_boost=5.0,
-    ),
-    sayt.NgramWordsField(
-        name="srv_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-        field_boost=5.0,
-    ),
-    sayt.TextField(
-        name="obj",
-        stored=True,
-    ),
-    sayt.NgramWordsField(
-        name="obj_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-    ),
-]
+cdk_python_schema = compile_schema(
+    dataset=DataSetEnum.cdk_python.value,
+    record_class=CdkPythonRecord,
+    doc_name="CdkPythonDocument",
+    doc_base=CommonDocument,
+    title=_cdk_python_title,
+    backend=SearchBackendEnum.whoosh.value,
+)
+CdkPythonDocument = cdk_python_schema.doc_class
+cdk_python_fields = cdk_python_schema.fields
 
 
 # ------------------------------------------------------------------------------
@@ -639,95 +682,34 @@ class CdkTypeScriptRecord(BaseRecord):
             In this example, it is ``"Bucket"``.
     """
 
-    url: str
-    service_name: str
-    resource_type: str
-    resource_name: str
+    url: str = attr("url")
+    service_name: str = attr("srv", text(boost=5.0, tokenify=True), ngram(boost=5.0))
+    resource_type: str = attr(
+        "res_type", text(boost=10.0, tokenify=True), ngram(boost=10.0)
+    )
+    resource_name: str = attr(
+        "res_name", text(boost=5.0, tokenify=True), ngram(boost=5.0)
+    )
 
     @property
     def sort_key(self) -> str:
         return " ".join([self.service_name, self.resource_type, self.resource_name])
 
-    def to_doc(self) -> "CdkTypeScriptDocument":
-        return CdkTypeScriptDocument(
-            url=self.url,
-            srv=tokenify(self.service_name),
-            srv_ng=self.service_name,
-            res_type=tokenify(self.resource_type),
-            res_type_ng=self.resource_type,
-            res_name=tokenify(self.resource_name),
-            res_name_ng=self.resource_name,
-        )
-
-
-@dataclasses.dataclass
-class CdkTypeScriptDocument(CommonDocument):
-    """
-    Example: https://docs.aws.amazon.com/cdk/api/v2/python/aws_cdk.aws_s3/Bucket.html
-
-    :param url: same as :attr:`CdkTypeScriptRecord.url``
-    :param srv: same as :attr:`CdkTypeScriptRecord.service_name``
-    :param srv_ng: same as :attr:`CdkTypeScriptRecord.service_name``
-    :param res_type: same as :attr:`CdkTypeScriptRecord.resource_type``
-    :param res_type_ng: same as :attr:`CdkTypeScriptRecord.resource_type``
-    :param res_name: same as :attr:`CdkTypeScriptRecord.resource_name``
-    :param res_name_ng: same as :attr:`CdkTypeScriptRecord.resource_name``
-    """
 
-    url: str
-    srv: str
-    srv_ng: str
-    res_type: str
-    res_type_ng: str
-    res_name: str
-    res_name_ng: str
-
-    @property
-    def title(self) -> str:
-        return f"{self.srv_ng} | {self.res_type_ng} - {self.res_name_ng}"
+def _cdk_ts_title(doc: "CdkTypeScriptDocument") -> str:
+    return f"{doc.srv_ng} | {doc.res_type_ng} - {doc.res_name_ng}"
 
 
-cdk_ts_fields = [
-    sayt.StoredField(
-        name="url",
-    ),
-    sayt.TextField(
-        name="srv",
-        stored=True,
-        field_boost=5.0,
-    ),
-    sayt.NgramWordsField(
-        name="srv_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-        field_boost=5.0,
-    ),
-    sayt.TextField(
-        name="res_type",
-        stored=True,
-        field_boost=10.0,
-    ),
-    sayt.NgramWordsField(
-        name="res_type_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-        field_boost=10.0,
-    ),
-    sayt.TextField(
-        name="res_name",
-        stored=True,
-        field_boost=5.0,
-    ),
-    sayt.NgramWordsField(
-        name="res_name_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-        field_boost=5.0,
-    ),
-]
+cdk_ts_schema = compile_schema(
+    dataset=DataSetEnum.cdk_ts.value,
+    record_class=CdkTypeScriptRecord,
+    doc_name="CdkTypeScriptDocument",
+    doc_base=CommonDocument,
+    title=_cdk_ts_title,
+    backend=SearchBackendEnum.whoosh.value,
+)
+CdkTypeScriptDocument = cdk_ts_schema.doc_class
+cdk_ts_fields = cdk_ts_schema.fields
 
 
 # ------------------------------------------------------------------------------
@@ -746,98 +728,39 @@ class PySparkRecord(BaseRecord):
         it is ``"sql.SparkSession"``. We strip off the ``"pyspark."`` part.
     """
 
-    url: str
-    header1: str
-    header2: T.Optional[str]
-    header3: T.Optional[str]
+    url: str = attr("url")
+    header1: str = attr("h1", text(), ngram())
+    header2: T.Optional[str] = attr(
+        "h2", text(boost=5.0, tokenify=True), ngram(boost=5.0)
+    )
+    header3: T.Optional[str] = attr(
+        "h3", text(boost=10.0, tokenify=True), ngram(boost=10.0)
+    )
 
     @property
     def sort_key(self) -> str:
         return " ".join([self.header1, str(self.header2), str(self.header3)])
 
-    def to_doc(self) -> "PySparkDocument":
-        return PySparkDocument(
-            h1=self.header1,
-            h1_ng=self.header1,
-            h2=tokenify(self.header2) if self.header2 else None,
-            h2_ng=self.header2,
-            h3=tokenify(self.header3) if self.header3 else None,
-            h3_ng=self.header3,
-            url=self.url,
-        )
 
+def _pyspark_title(doc: "PySparkDocument") -> str:
+    parts = [doc.h1_ng]
+    if doc.h2_ng:
+        parts.append(doc.h2_ng)
+    if doc.h3_ng:
+        parts.append(doc.h3_ng)
+    return " | ".join(parts)
 
-@dataclasses.dataclass
-class PySparkDocument(CommonDocument):
-    """
-    Example: https://spark.apache.org/docs/latest/api/python/reference/pyspark.sql/api/pyspark.sql.SparkSession.html
 
-    :param url: same as :attr:`PySparkRecord.url``
-    :param h1: same as :attr:`PySparkRecord.header1``
-    :param h1_ng: same as :attr:`PySparkRecord.header1``
-    :param h2: same as :attr:`PySparkRecord.header2``
-    :param h2_ng: same as :attr:`PySparkRecord.header2``
-    :param h3: same as :attr:`PySparkRecord.header3``
-    :param h3_ng: same as :attr:`PySparkRecord.header3``
-    """
-
-    url: str
-    h1: str
-    h1_ng: str
-    h2: T.Optional[str] = dataclasses.field(default=None)
-    h2_ng: T.Optional[str] = dataclasses.field(default=None)
-    h3: T.Optional[str] = dataclasses.field(default=None)
-    h3_ng: T.Optional[str] = dataclasses.field(default=None)
-
-    @property
-    def title(self) -> str:
-        parts = [self.h1_ng]
-        if self.h2_ng:
-            parts.append(self.h2_ng)
-        if self.h3_ng:
-            parts.append(self.h3_ng)
-        return " | ".join(parts)
-
-
-pyspark_fields = [
-    sayt.StoredField(
-        name="url",
-    ),
-    sayt.TextField(
-        name="h1",
-        stored=True,
-    ),
-    sayt.NgramWordsField(
-        name="h1_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-    ),
-    sayt.TextField(
-        name="h2",
-        stored=True,
-        field_boost=5.0,
-    ),
-    sayt.NgramWordsField(
-        name="h2_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-        field_boost=5.0,
-    ),
-    sayt.TextField(
-        name="h3",
-        stored=True,
-        field_boost=10.0,
-    ),
-    sayt.NgramWordsField(
-        name="h3_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-        field_boost=10.0,
-    ),
-]
+pyspark_schema = compile_schema(
+    dataset=DataSetEnum.pyspark.value,
+    record_class=PySparkRecord,
+    doc_name="PySparkDocument",
+    doc_base=CommonDocument,
+    title=_pyspark_title,
+    backend=SearchBackendEnum.whoosh.value,
+)
+PySparkDocument = pyspark_schema.doc_class
+pyspark_fields = pyspark_schema.fields
 
 
 # ------------------------------------------------------------------------------
@@ -854,77 +777,34 @@ class PandasRecord(BaseRecord):
         "pandas." prefix removed, in this example, it is ``"read_csv"``.
     """
 
-    url: str
-    header1: str
-    header2: T.Optional[str]
+    url: str = attr("url")
+    header1: str = attr("h1", text(), ngram())
+    header2: T.Optional[str] = attr(
+        "h2", text(boost=5.0, tokenify=True), ngram(boost=5.0)
+    )
 
     @property
     def sort_key(self) -> str:
         return " ".join([self.header1, str(self.header2)])
 
-    def to_doc(self) -> "PandasDocument":
-        return PandasDocument(
-            h1=self.header1,
-            h1_ng=self.header1,
-            h2=tokenify(self.header2) if self.header2 else None,
-            h2_ng=self.header2,
-            url=self.url,
-        )
 
+def _pandas_title(doc: "PandasDocument") -> str:
+    parts = [doc.h1_ng]
+    if doc.h2_ng:
+        parts.append(doc.h2_ng)
+    return " | ".join(parts)
 
-@dataclasses.dataclass
-class PandasDocument(CommonDocument):
-    """
-    Example: https://pandas.pydata.org/docs/reference/api/pandas.read_csv.html
 
-    :param url: same as :attr:`PandasRecord.url``
-    :param h1: same as :attr:`PandasRecord.header1``
-    :param h1_ng: same as :attr:`PandasRecord.header1``
-    :param h2: same as :attr:`PandasRecord.header2``
-    :param h2_ng: same as :attr:`PandasRecord.header2``
-    """
-
-    url: str
-    h1: str
-    h1_ng: str
-    h2: T.Optional[str] = dataclasses.field(default=None)
-    h2_ng: T.Optional[str] = dataclasses.field(default=None)
-
-    @property
-    def title(self) -> str:
-        parts = [self.h1_ng]
-        if self.h2_ng:
-            parts.append(self.h2_ng)
-        return " | ".join(parts)
-
-
-pandas_fields = [
-    sayt.StoredField(
-        name="url",
-    ),
-    sayt.TextField(
-        name="h1",
-        stored=True,
-    ),
-    sayt.NgramWordsField(
-        name="h1_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-    ),
-    sayt.TextField(
-        name="h2",
-        stored=True,
-        field_boost=5.0,
-    ),
-    sayt.NgramWordsField(
-        name="h2_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-        field_boost=5.0,
-    ),
-]
+pandas_schema = compile_schema(
+    dataset=DataSetEnum.pandas.value,
+    record_class=PandasRecord,
+    doc_name="PandasDocument",
+    doc_base=CommonDocument,
+    title=_pandas_title,
+    backend=SearchBackendEnum.whoosh.value,
+)
+PandasDocument = pandas_schema.doc_class
+pandas_fields = pandas_schema.fields
 
 
 # ------------------------------------------------------------------------------
@@ -1033,142 +913,49 @@ class TfRecord(BaseRecord):
             in this example, it is ``"Provides an EC2 instance resource. This allows instances to be created, updated, and deleted. Instances also support provisioning."``.
     """
 
-    url: str
-    provider: str
-    type: str
-    subcategory: str
-    item_name: str
-    description: str
+    url: str = attr("url")
+    provider: str = attr("provider", keyword(boost=10.0, lowercase=True))
+    type: str = attr("type", keyword(boost=5.0, lowercase=True))
+    subcategory: str = attr("cate", text(boost=2.0, tokenify=True), ngram(boost=2.0))
+    item_name: str = attr("item", text(tokenify=True), ngram())
+    description: str = attr("desc")
 
     @property
     def sort_key(self) -> str:
         return " ".join([self.provider, self.type, self.subcategory, self.item_name])
 
-    def to_doc(self) -> "TfDocument":
-        return TfDocument(
-            url=self.url,
-            provider=self.provider,
-            type=self.type,
-            cate=tokenify(self.subcategory),
-            cate_ng=self.subcategory,
-            item=tokenify(self.item_name),
-            item_ng=self.item_name,
-            desc=self.description,
-        )
 
+def _tf_title(doc: "TfDocument") -> str:
+    return f"{doc.provider} {doc.type}: {doc.cate_ng} | {doc.item_ng}"
 
-@dataclasses.dataclass
-class TfDocument(CommonDocument):
-    """
-    Example:
 
-    - webpage: https://registry.terraform.io/providers/hashicorp/aws/latest/docs/resources/instance
-    - source doc: https://github.com/hashicorp/terraform-provider-aws/blob/main/website/docs/r/instance.html.markdown
-
-    :param url: same as :attr:`TfRecord.url``
-    :param provider: same as :attr:`TfRecord.provider``
-    :param type: same as :attr:`TfRecord.type``
-    :param cate: same as :attr:`TfRecord.subcategory``
-    :param cate_ng: same as :attr:`TfRecord.subcategory``
-    :param item: same as :attr:`TfRecord.item_name``
-    :param item_ng: same as :attr:`TfRecord.item_name``
-    :param desc: same as :attr:`TfRecord.description``
-    """
-
-    url: str
-    provider: str
-    type: str
-    cate: str
-    cate_ng: str
-    item: str
-    item_ng: str
-    desc: str
-
-    @property
-    def title(self) -> str:
-        return f"{self.provider} {self.type}: {self.cate_ng} | {self.item_ng}"
-
-
-tf_fields = [
-    sayt.StoredField(
-        name="url",
-    ),
-    sayt.KeywordField(
-        name="provider",
-        stored=True,
-        lowercase=True,
-        field_boost=10.0,
-    ),
-    sayt.KeywordField(
-        name="type",
-        stored=True,
-        lowercase=True,
-        field_boost=5.0,
-    ),
-    sayt.TextField(
-        name="cate",
-        stored=True,
-        field_boost=2.0,
-    ),
-    sayt.NgramWordsField(
-        name="cate_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-        field_boost=2.0,
-    ),
-    sayt.TextField(
-        name="item",
-        stored=True,
-    ),
-    sayt.NgramWordsField(
-        name="item_ng",
-        stored=True,
-        minsize=2,
-        maxsize=6,
-    ),
-    sayt.StoredField(
-        name="desc",
-    ),
-]
+tf_schema = compile_schema(
+    dataset=DataSetEnum.tf.value,
+    record_class=TfRecord,
+    doc_name="TfDocument",
+    doc_base=CommonDocument,
+    title=_tf_title,
+    backend=SearchBackendEnum.whoosh.value,
+)
+TfDocument = tf_schema.doc_class
+tf_fields = tf_schema.fields
 
 # ==============================================================================
 # Download data
 # ==============================================================================
 # NOTE: don't forget to update this mapper when you add a new dataset
 _dataset_mapper = {
-    DataSetEnum.airflow.value: {
-        "doc_class": AirflowDocument,
-        "fields": airflow_fields,
-    },
-    DataSetEnum.aws_cloudformation.value: {
-        "doc_class": AwsCloudFormationDocument,
-        "fields": aws_cloudformation_fields,
-    },
-    DataSetEnum.boto3.value: {
-        "doc_class": Boto3Document,
-        "fields": boto3_fields,
-    },
-    DataSetEnum.cdk_python.value: {
-        "doc_class": CdkPythonDocument,
-        "fields": cdk_python_fields,
-    },
-    DataSetEnum.cdk_ts.value: {
-        "doc_class": CdkTypeScriptDocument,
-        "fields": cdk_ts_fields,
-    },
-    DataSetEnum.pyspark.value: {
-        "doc_class": PySparkDocument,
-        "fields": pyspark_fields,
-    },
-    DataSetEnum.pandas.value: {
-        "doc_class": PandasDocument,
-        "fields": pandas_fields,
-    },
-    DataSetEnum.tf.value: {
-        "doc_class": TfDocument,
-        "fields": tf_fields,
-    },
+    schema.dataset: schema.mapper_entry
+    for schema in [
+        airflow_schema,
+        aws_cloudformation_schema,
+        boto3_schema,
+        cdk_python_schema,
+        cdk_ts_schema,
+        pyspark_schema,
+        pandas_schema,
+        tf_schema,
+    ]
 }
 
 
@@ -1190,6 +977,13 @@ def get_doc_class(
     return _dataset_mapper[dataset]["doc_class"]
 
 
+def get_schema(dataset: str) -> CompiledSchema:
+    """
+    Get the compiled schema of the given dataset.
+    """
+    return _dataset_mapper[dataset]["schema"]
+
+
 def get_fields(dataset: str) -> T.List[sayt.T_Field]:
     """
     Get the list of ``sayt.Field`` object for the given dataset.
@@ -1197,6 +991,19 @@ def get_fields(dataset: str) -> T.List[sayt.T_Field]:
     return _dataset_mapper[dataset]["fields"]
 
 
+def get_search_backend(dataset: str) -> str:
+    """
+    Get the search backend of the given dataset, see
+    :class:`~findref.memindex.SearchBackendEnum`. The
+    ``FINDREF_MEMORY_BACKEND`` environment variable, a comma separated list
+    of dataset names, switches these datasets to the in-memory backend.
+    """
+    names = os.environ.get("FINDREF_MEMORY_BACKEND", "")
+    if dataset in {name.strip() for name in names.split(",")}:
+        return SearchBackendEnum.memory.value
+    return _dataset_mapper[dataset]["backend"]
+
+
 def http_get(url) -> str:
     """
     Similar to ``requests.get``.
@@ -1205,36 +1012,268 @@ def http_get(url) -> str:
         return response.read().decode("utf-8").strip()
 
 
+class _JsonStreamReader:
+    """
+    Decode JSON values one by one from a binary stream, only keep the
+    unconsumed part of the stream in memory.
+    """
+
+    def __init__(self, stream: T.BinaryIO, chunk_size: int):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _read_more(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if chunk:
+            # drop the consumed part before growing the buffer
+            self.buf = self.buf[self.pos :] + self.decoder.decode(chunk)
+        else:
+            self.buf = self.buf[self.pos :] + self.decoder.decode(b"", final=True)
+            self.eof = True
+        self.pos = 0
+        return True
+
+    def next_char(self) -> str:
+        """
+        Skip whitespaces, consume and return the next character.
+        """
+        while 1:
+            while self.pos < len(self.buf):
+                char = self.buf[self.pos]
+                self.pos += 1
+                if char not in " \t\n\r":
+                    return char
+            if self._read_more() is False:
+                raise ValueError("unexpected end of JSON stream")
+
+    def peek_char(self) -> str:
+        char = self.next_char()
+        self.pos -= 1
+        return char
+
+    def next_value(self) -> T.Any:
+        """
+        Skip whitespaces, consume and return the next JSON value.
+        """
+        self.peek_char()
+        while 1:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buf, self.pos)
+                # a number at the end of the buffer may be truncated
+                if (end < len(self.buf)) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read_more()
+
+
+def iter_json_array(
+    stream: T.BinaryIO,
+    key: str,
+    chunk_size: int = 64 * 1024,
+) -> T.Iterator[T.Any]:
+    """
+    Incrementally parse a JSON object from a binary stream and yield the items
+    in its top-level ``key`` array one by one. Peak memory is about one
+    ``chunk_size`` plus one item, no matter how large the JSON is.
+
+    :param stream: a binary file-like object that has a ``read(n)`` method,
+        for example, the HTTP response of ``urllib.request.urlopen``.
+    :param key: the key of the array in the top-level JSON object.
+    :param chunk_size: how many bytes to read from the stream at a time.
+    """
+    reader = _JsonStreamReader(stream=stream, chunk_size=chunk_size)
+    if reader.next_char() != "{":
+        raise ValueError("the JSON stream is not an object")
+    if reader.peek_char() == "}":
+        return
+    while 1:
+        name = reader.next_value()
+        if reader.next_char() != ":":
+            raise ValueError("expect ':' after the key in JSON stream")
+        if name == key:
+            if reader.next_char() != "[":
+                raise ValueError(f"the value of {key!r} is not an array")
+            if reader.peek_char() == "]":
+                return
+            while 1:
+                yield reader.next_value()
+                char = reader.next_char()
+                if char == "]":
+                    return
+                if char != ",":
+                    raise ValueError("expect ',' or ']' in JSON array")
+        else:
+            reader.next_value()
+        char = reader.next_char()
+        if char == "}":
+            return
+        if char != ",":
+            raise ValueError("expect ',' or '}' in JSON object")
+
+
+def get_latest_tag() -> str:
+    """
+    Get the latest dataset release tag name from the release source, GitHub
+    by default, see :mod:`findref.sources`.
+    """
+    return get_release_source().get_latest_tag()
+
+
+def get_release_json_filename(dataset: str) -> str:
+    return f"{dataset}-LATEST.json"
+
+
+def get_release_binary_filename(dataset: str) -> str:
+    return f"{dataset}-LATEST.frr"
+
+
+def get_release_index_filename(dataset: str) -> str:
+    return f"{dataset}-LATEST.fri"
+
+
+def get_release_delta_filename(dataset: str, from_tag: str) -> str:
+    return f"{dataset}-DELTA-FROM-{from_tag}.json"
+
+
+def get_release_asset_url(tag_name: str, filename: str) -> str:
+    return GitHubReleaseSource().get_asset_url(tag_name, filename)
+
+
+def iter_dataset_data(
+    dataset: str,
+    tag_name: T.Optional[str] = None,
+    source: T.Optional[ReleaseSource] = None,
+) -> T.Iterator[sayt.T_DOCUMENT]:
+    """
+    Stream the dataset data from the release, yield documents one
+    by one while downloading, so the index writer can consume them without
+    loading the whole release into memory.
+
+    It prefers the compressed release asset, and falls back to the JSON
+    asset if the release doesn't have it or this client cannot decode it.
+
+    :param tag_name: the release tag name, use the latest one if not given.
+    :param source: where to download the release, default is the configured
+        source, see :func:`findref.sources.get_release_source`.
+    """
+    if source is None:
+        source = get_release_source()
+    if tag_name is None:
+        tag_name = source.get_latest_tag()
+    try:
+        response = source.open(tag_name, get_release_binary_filename(dataset))
+    except AssetNotFoundError:
+        response = None
+    if response is not None:
+        with response:
+            items = iter_compressed_release(response)
+            try:
+                next(items)  # the header
+            except UnsupportedReleaseFormatError:
+                pass
+            else:
+                yield from items
+                return
+
+    with source.open(tag_name, get_release_json_filename(dataset)) as response:
+        yield from iter_json_array(response, key="docs")
+
+
 def get_dataset_data(dataset: str) -> T.List[sayt.T_DOCUMENT]:
     """
     Download the latest dataset data from GitHub release.
     """
-    gh_api_url = (
-        "https://api.github.com/repos/MacHu-GWU/findref-project/releases/latest"
+    return list(iter_dataset_data(dataset))
+
+
+@dataclasses.dataclass
+class DataSetUpdate:
+    """
+    What the client needs to bring its index to the latest release.
+
+    :param tag: the latest release tag name.
+    :param docs: all documents of the latest release, only set when a full
+        rebuild is needed.
+    :param delta: the delta from the client's release, only set when an
+        incremental update is possible.
+
+    If both ``docs`` and ``delta`` are None, the index is already up to date.
+    """
+
+    tag: str
+    docs: T.Optional[T.Iterable[sayt.T_DOCUMENT]] = None
+    delta: T.Optional[ReleaseDelta] = None
+
+    @property
+    def is_up_to_date(self) -> bool:
+        return (self.docs is None) and (self.delta is None)
+
+
+def get_dataset_update(
+    dataset: str,
+    current_tag: T.Optional[str] = None,
+) -> DataSetUpdate:
+    """
+    Find out how to update the local index of the given dataset.
+
+    :param current_tag: the release tag name of the local index, None if
+        there is no local index or it is unknown.
+    """
+    source = get_release_source()
+    tag_name = source.get_latest_tag()
+    if current_tag == tag_name:
+        return DataSetUpdate(tag=tag_name)
+    if current_tag is not None:
+        filename = get_release_delta_filename(dataset, current_tag)
+        try:
+            with source.open(tag_name, filename) as response:
+                delta = ReleaseDelta.from_binary(response.read())
+            return DataSetUpdate(tag=tag_name, delta=delta)
+        except AssetNotFoundError:
+            pass
+    return DataSetUpdate(
+        tag=tag_name,
+        docs=iter_dataset_data(dataset, tag_name=tag_name, source=source),
     )
-    tag_name = json.loads(http_get(gh_api_url))["tag_name"]
-    url = f"https://github.com/MacHu-GWU/findref-project/releases/download/{tag_name}/{dataset}-LATEST.json"
-    return json.loads(http_get(url))["docs"]
 
 
 def create_sayt_dataset(
     dataset: str,
     dir_index: Path,
     dir_cache: Path,
+    cache: T.Optional[Cache] = None,
+    dataset_class: T.Type[sayt.DataSet] = sayt.DataSet,
 ) -> sayt.DataSet:
     """
     Create a ``sayt.DataSet`` object for the given dataset.
+
+    :param cache: an optional ``diskcache.Cache`` object to share across
+        multiple datasets. If not given, ``sayt`` creates one from ``dir_cache``.
+    :param dataset_class: the ``sayt.DataSet`` class or its subclass to use.
     """
 
     def downloader():
-        return get_dataset_data(dataset)
+        return iter_dataset_data(dataset)
 
-    return sayt.DataSet(
+    fields = get_fields(dataset)
+    return dataset_class(
         dir_index=dir_index,
         index_name=f"findref-{dataset}",
-        fields=get_fields(dataset),
+        fields=fields,
         dir_cache=dir_cache,
-        cache_key=f"findref-{dataset}",
+        cache=cache,
+        # the index built with other field definitions is never fresh
+        cache_key=f"findref-{dataset}-{get_schema_fingerprint(fields)}",
         cache_tag=f"findref-{dataset}",
         cache_expire=30 * 24 * 60 * 60,
         downloader=downloader,
@@ -28,3 +28,4 @@ dir_home = Path.home()
 dir_findref_home = dir_home / ".findref"
 dir_index = dir_findref_home / ".index"
 dir_cache = dir_findref_home / ".cache"
+path_daemon_socket = dir_findref_home / "daemon.sock"
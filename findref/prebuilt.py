@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+
+"""
+Prebuilt index artifact.
+
+The release pipeline serializes the :class:`~findref.memindex.MemoryIndex` of
+each dataset into ``{dataset}-LATEST.fri`` next to the release data. The
+client downloads it into ``paths.dir_index`` and opens it with ``mmap``,
+the posting lists and the documents are read from the mapped file on demand,
+so there is no local indexing step.
+
+The binary layout, all integers are little endian:
+
+- 4 bytes magic ``b"FRIX"``
+- 1 byte format version
+- 3 bytes padding
+- 4 bytes unsigned int, the length of the JSON header
+- the UTF-8 JSON header, padded to 4 bytes, see :func:`dump_prebuilt_index`
+- the data sections, each one starts at a 4 bytes aligned offset relative to
+  the end of the header, the header records ``[offset, length]`` of them.
+
+The sections of the documents:
+
+- ``docs``: the compact JSON of all documents, concatenated.
+- ``doc_offsets``: ``n_docs + 1`` uint32, the byte offset of each document.
+
+The sections of each searchable field:
+
+- ``terms``: all terms in the UTF-8 byte order, concatenated.
+- ``term_offsets``: ``n_terms + 1`` uint32, the byte offset of each term.
+- ``posting_offsets``: ``n_terms + 1`` uint32, the index of the first doc id
+  of each term in ``postings``.
+- ``postings``: uint32 doc ids.
+- ``lengths``: ``n_docs`` uint16, the length of the field value.
+"""
+
+import typing as T
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from pathlib import Path
+
+import sayt.api as sayt
+
+from . import models
+from .sources import AssetNotFoundError, get_release_source
+from .memindex import T_TO_INDEX_DOC, MemoryIndex, _IndexedField
+from .schema import get_schema_fingerprint
+
+
+PREBUILT_MAGIC = b"FRIX"
+PREBUILT_FORMAT_VERSION = 1
+_prefix = struct.Struct("<4sB3xI")
+
+
+def _to_little_endian(arr: array) -> bytes:
+    if sys.byteorder != "little":  # pragma: no cover
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+class _SectionWriter:
+    def __init__(self):
+        self.chunks: T.List[bytes] = list()
+        self.size = 0
+
+    def add(self, data: bytes) -> T.List[int]:
+        offset = self.size
+        padding = (-len(data)) % 4
+        self.chunks.append(data + b"\x00" * padding)
+        self.size += len(data) + padding
+        return [offset, len(data)]
+
+
+def dump_prebuilt_index(
+    index: MemoryIndex,
+    fields: T.List[sayt.T_Field],
+    metadata: T.Optional[T.Dict[str, T.Any]] = None,
+) -> bytes:
+    """
+    Serialize the in-memory index into the prebuilt index format.
+
+    :param fields: the field definitions the index is built from.
+    :param metadata: extra data to put in the header, for example the
+        dataset name and the release tag name.
+    """
+    writer = _SectionWriter()
+
+    docs = [
+        json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        for doc in index.docs
+    ]
+    doc_offsets = array("I", [0])
+    for doc in docs:
+        doc_offsets.append(doc_offsets[-1] + len(doc))
+    header = {
+        "metadata": metadata or {},
+        "schema": get_schema_fingerprint(fields),
+        "n_docs": len(index.docs),
+        "docs": writer.add(b"".join(docs)),
+        "doc_offsets": writer.add(_to_little_endian(doc_offsets)),
+        "fields": [],
+    }
+
+    for field in index.fields:
+        items = sorted(
+            (term.encode("utf-8"), posting) for term, posting in field.postings.items()
+        )
+        term_offsets = array("I", [0])
+        posting_offsets = array("I", [0])
+        postings = array("I")
+        for term, posting in items:
+            term_offsets.append(term_offsets[-1] + len(term))
+            postings.extend(posting)
+            posting_offsets.append(len(postings))
+        header["fields"].append(
+            {
+                "name": field.name,
+                "kind": field.kind,
+                "boost": field.boost,
+                "minsize": field.minsize,
+                "maxsize": field.maxsize,
+                "n_terms": len(items),
+                "terms": writer.add(b"".join(term for term, _ in items)),
+                "term_offsets": writer.add(_to_little_endian(term_offsets)),
+                "posting_offsets": writer.add(_to_little_endian(posting_offsets)),
+                "postings": writer.add(_to_little_endian(postings)),
+                "lengths": writer.add(_to_little_endian(field.lengths)),
+            }
+        )
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    header_bytes += b" " * ((-len(header_bytes)) % 4)
+    prefix = _prefix.pack(PREBUILT_MAGIC, PREBUILT_FORMAT_VERSION, len(header_bytes))
+    return prefix + header_bytes + b"".join(writer.chunks)
+
+
+def build_prebuilt_index(
+    fields: T.List[sayt.T_Field],
+    docs: T.Iterable[T.Dict[str, T.Any]],
+    metadata: T.Optional[T.Dict[str, T.Any]] = None,
+    to_index_doc: T.Optional[T_TO_INDEX_DOC] = None,
+) -> bytes:
+    """
+    Build the prebuilt index artifact from the documents, it is used by the
+    release pipeline.
+
+    :param to_index_doc: see :meth:`findref.memindex.MemoryIndex.build`.
+    """
+    index = MemoryIndex.build(fields=fields, docs=docs, to_index_doc=to_index_doc)
+    return dump_prebuilt_index(index, fields=fields, metadata=metadata)
+
+
+def read_prebuilt_header(buffer: T.Union[bytes, mmap.mmap]) -> T.Dict[str, T.Any]:
+    """
+    Read and validate the header of a prebuilt index.
+
+    :raises UnsupportedReleaseFormatError: if it is not a prebuilt index or
+        it requires a newer format version.
+    """
+    if len(buffer) < _prefix.size:
+        raise models.UnsupportedReleaseFormatError("not a prebuilt index")
+    magic, version, header_length = _prefix.unpack_from(buffer, 0)
+    if magic != PREBUILT_MAGIC:
+        raise models.UnsupportedReleaseFormatError("not a prebuilt index")
+    if version > PREBUILT_FORMAT_VERSION:
+        raise models.UnsupportedReleaseFormatError(
+            f"prebuilt index format version {version} is not supported, "
+            f"please upgrade findref"
+        )
+    start = _prefix.size
+    header = json.loads(bytes(buffer[start : start + header_length]).decode("utf-8"))
+    header["_data_offset"] = start + header_length
+    return header
+
+
+class _MappedTerms:
+    """
+    Read only term -> posting list mapping on top of the mapped sections,
+    terms are looked up by binary search.
+    """
+
+    def __init__(
+        self,
+        terms: memoryview,
+        term_offsets: memoryview,
+        posting_offsets: memoryview,
+        postings: memoryview,
+    ):
+        self._terms = terms
+        self._term_offsets = term_offsets
+        self._posting_offsets = posting_offsets
+        self._postings = postings
+
+    def __len__(self) -> int:
+        return len(self._term_offsets) - 1
+
+    def _term(self, i: int) -> bytes:
+        return bytes(self._terms[self._term_offsets[i] : self._term_offsets[i + 1]])
+
+    def get(self, term: str, default: T.Any = None) -> T.Any:
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if (lo < len(self)) and (self._term(lo) == key):
+            return self._postings[
+                self._posting_offsets[lo] : self._posting_offsets[lo + 1]
+            ]
+        return default
+
+    def items(self) -> T.Iterable[T.Tuple[str, memoryview]]:
+        for i in range(len(self)):
+            yield self._term(i).decode("utf-8"), self._postings[
+                self._posting_offsets[i] : self._posting_offsets[i + 1]
+            ]
+
+
+class _MappedDocs:
+    """
+    Read only list of documents, each document is decoded on access.
+    """
+
+    def __init__(self, data: memoryview, offsets: memoryview):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, doc_id: int) -> T.Dict[str, T.Any]:
+        start, end = self._offsets[doc_id], self._offsets[doc_id + 1]
+        return json.loads(bytes(self._data[start:end]).decode("utf-8"))
+
+    def __iter__(self):
+        for doc_id in range(len(self)):
+            yield self[doc_id]
+
+
+def open_prebuilt_index(
+    path: Path,
+    fields: T.List[sayt.T_Field],
+) -> MemoryIndex:
+    """
+    Open the prebuilt index file with mmap, the returned
+    :class:`~findref.memindex.MemoryIndex` reads from the mapped file.
+
+    :raises UnsupportedReleaseFormatError: if the file is not a supported
+        prebuilt index, or it is built with different field definitions.
+    """
+    if sys.byteorder != "little":  # pragma: no cover
+        raise models.UnsupportedReleaseFormatError(
+            "prebuilt index is not supported on big endian machines"
+        )
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header = read_prebuilt_header(buffer)
+    if header["schema"] != get_schema_fingerprint(fields):
+        raise models.UnsupportedReleaseFormatError(
+            "prebuilt index is built with different field definitions"
+        )
+    view = memoryview(buffer)
+    data_offset = header["_data_offset"]
+
+    def section(offset_length: T.List[int], typecode: T.Optional[str] = None):
+        offset, length = offset_length
+        start = data_offset + offset
+        mv = view[start : start + length]
+        return mv if typecode is None else mv.cast(typecode)
+
+    index = MemoryIndex(
+        docs=_MappedDocs(
+            data=section(header["docs"]),
+            offsets=section(header["doc_offsets"], "I"),
+        )
+    )
+    for dct in header["fields"]:
+        index.fields.append(
+            _IndexedField(
+                name=dct["name"],
+                kind=dct["kind"],
+                boost=dct["boost"],
+                minsize=dct["minsize"],
+                maxsize=dct["maxsize"],
+                postings=_MappedTerms(
+                    terms=section(dct["terms"]),
+                    term_offsets=section(dct["term_offsets"], "I"),
+                    posting_offsets=section(dct["posting_offsets"], "I"),
+                    postings=section(dct["postings"], "I"),
+                ),
+                lengths=section(dct["lengths"], "H"),
+            )
+        )
+    return index
+
+
+def read_prebuilt_header_from_file(path: Path) -> T.Dict[str, T.Any]:
+    """
+    Read and validate the header of a prebuilt index file without reading
+    the data sections.
+    """
+    with open(path, "rb") as f:
+        prefix = f.read(_prefix.size)
+        if len(prefix) < _prefix.size:
+            raise models.UnsupportedReleaseFormatError("not a prebuilt index")
+        _, _, header_length = _prefix.unpack(prefix)
+        return read_prebuilt_header(prefix + f.read(header_length))
+
+
+def read_prebuilt_tag(
+    path: Path,
+    fields: T.List[sayt.T_Field],
+) -> T.Optional[str]:
+    """
+    Return the release tag name of the local prebuilt index, None if it
+    doesn't exist or can't be used with the given field definitions.
+    """
+    try:
+        header = read_prebuilt_header_from_file(path)
+    except (FileNotFoundError, ValueError):
+        return None
+    if header["schema"] != get_schema_fingerprint(fields):
+        return None
+    return header["metadata"].get("tag")
+
+
+def download_prebuilt_index(
+    dataset: str,
+    path: Path,
+    fields: T.List[sayt.T_Field],
+    current_tag: T.Optional[str] = None,
+    chunk_size: int = 1024 * 1024,
+) -> T.Optional[str]:
+    """
+    Download the prebuilt index of the latest release to ``path``. The file
+    is downloaded next to it first, then moved into place, so an opened
+    index is never half written.
+
+    :param fields: the field definitions of the dataset, the downloaded
+        index is discarded if it was built with different ones.
+    :param current_tag: the release tag name of the local prebuilt index,
+        nothing is downloaded if it is the latest one.
+
+    :return: the release tag name of the prebuilt index at ``path``, or None
+        if the release doesn't publish one or it can't be used with the
+        given field definitions.
+    """
+    source = get_release_source()
+    tag_name = source.get_latest_tag()
+    if (current_tag == tag_name) and path.exists():
+        return tag_name
+    filename = models.get_release_index_filename(dataset)
+    try:
+        response = source.open(tag_name, filename)
+    except AssetNotFoundError:
+        return None
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path_tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with response, open(path_tmp, "wb") as f:
+            while 1:
+                chunk = response.read(chunk_size)
+                if not chunk:
+                    break
+                f.write(chunk)
+        header = read_prebuilt_header_from_file(path_tmp)
+        if header["schema"] != get_schema_fingerprint(fields):
+            # published before the schema changed, build the index locally
+            return None
+        os.replace(path_tmp, path)
+    finally:
+        if path_tmp.exists():
+            path_tmp.unlink()
+    return tag_name
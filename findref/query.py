@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+"""
+Turn what the user typed into a search engine query.
+
+This module only imports the standard library, so the daemon, the batch
+search and the benchmark workers can use it without importing the terminal
+UI.
+"""
+
+import typing as T
+
+
+def preprocess_query(query: T.Optional[str]) -> str:
+    """
+    Preprocess query, automatically add fuzzy search term if applicable.
+    """
+    delimiter = ".-_@+"
+    if query:
+        for char in delimiter:
+            query = query.replace(char, " ")
+        words = list()
+        for word in query.split():
+            if word.strip():
+                word = word.strip()
+                if len(word) == 1:
+                    if word == "*":
+                        words.append(word)
+                else:
+                    try:
+                        if word[-2] != "~":
+                            word = f"{word}~1"
+                    except IndexError:
+                        word = f"{word}~1"
+                    words.append(word)
+        if words:
+            return " ".join(words)
+        else:
+            return "*"
+    else:
+        return "*"
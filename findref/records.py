@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compact in-memory store of the stored fields of one index.
+
+Reading the stored fields of a whoosh hit decodes a dict per hit, and the UI
+then creates a document dataclass per hit from it. :class:`RecordStore`
+loads the stored fields of all documents once per index generation instead,
+and the search only returns the integer doc ids:
+
+- struct of arrays: one list per field, indexed by the doc id, no dict per
+  document.
+- the repeated values, like service names, providers and sub categories,
+  are interned, all documents share one string object.
+- :meth:`RecordStore.rows` creates a ``__slots__`` row object for each doc id
+  that is actually displayed. The row class is a subclass of the dataset's
+  document class, the fields are read from the columns, so ``title``,
+  ``subtitle`` and the other properties work as usual.
+- the :attr:`~findref.models.BaseDocument.render_fields` of the document
+  class, like ``title`` and ``autocomplete``, are rendered once when the
+  store is built, the row objects read them instead of formatting them on
+  every keystroke.
+"""
+
+import typing as T
+import dataclasses
+
+from .models import BaseDocument
+
+
+T_DOC_CLASS = T.Type[BaseDocument]
+
+
+def _column_property(name: str) -> property:
+    def fget(self):
+        return self._store.columns[name][self._doc_id]
+
+    return property(fget)
+
+
+def _render_property(name: str, fallback: property) -> property:
+    def fget(self):
+        column = self._store.rendered.get(name)
+        if column is not None:
+            value = column[self._doc_id]
+            # None while the store is rendering this document
+            if value is not None:
+                return value
+        return fallback.fget(self)
+
+    return property(fget)
+
+
+def _row_init(self, store: "RecordStore", doc_id: int):
+    self._store = store
+    self._doc_id = doc_id
+
+
+_row_classes: T.Dict[T_DOC_CLASS, T_DOC_CLASS] = dict()
+
+
+def get_row_class(doc_class: T_DOC_CLASS) -> T_DOC_CLASS:
+    """
+    Get the row class of the document class, its instances only hold the
+    store and the doc id.
+    """
+    try:
+        return _row_classes[doc_class]
+    except KeyError:
+        pass
+    namespace = {
+        "__slots__": ("_store", "_doc_id"),
+        "__init__": _row_init,
+    }
+    for field in dataclasses.fields(doc_class):
+        namespace[field.name] = _column_property(field.name)
+    for name in doc_class.render_fields:
+        namespace[name] = _render_property(name, getattr(doc_class, name))
+    row_class = type(f"{doc_class.__name__}Row", (doc_class,), namespace)
+    _row_classes[doc_class] = row_class
+    return row_class
+
+
+class RecordStore:
+    """
+    The stored fields of all documents of one index, one list per field.
+
+    :param field_names: the stored field names.
+    :param doc_class: render the ``render_fields`` of this document class
+        for each document if given.
+    """
+
+    __slots__ = ("field_names", "columns", "doc_class", "rendered", "n_docs", "_pools")
+
+    def __init__(
+        self,
+        field_names: T.Iterable[str],
+        doc_class: T.Optional[T_DOC_CLASS] = None,
+    ):
+        self.field_names: T.List[str] = list(field_names)
+        self.columns: T.Dict[str, T.List[T.Any]] = {
+            name: list() for name in self.field_names
+        }
+        self.doc_class = doc_class
+        # render field name -> the rendered value of each document
+        self.rendered: T.Dict[str, T.List[T.Optional[str]]] = dict()
+        if doc_class is not None:
+            self.rendered = {name: list() for name in doc_class.render_fields}
+        self.n_docs: int = 0
+        # value -> the shared value object of each field, only used while
+        # adding documents
+        self._pools: T.Optional[T.Dict[str, T.Dict[T.Any, T.Any]]] = {
+            name: dict() for name in self.field_names
+        }
+
+    @classmethod
+    def build(
+        cls,
+        field_names: T.Iterable[str],
+        docs: T.Iterable[T.Tuple[int, T.Dict[str, T.Any]]],
+        doc_class: T.Optional[T_DOC_CLASS] = None,
+    ) -> "RecordStore":
+        """
+        Build the store from the ``(doc id, stored fields)`` pairs, for example
+        ``searcher.reader().iter_docs()``. The doc ids may have gaps, for the
+        deleted documents.
+        """
+        store = cls(field_names, doc_class=doc_class)
+        for doc_id, doc in docs:
+            store.add(doc_id, doc)
+        store.freeze()
+        return store
+
+    def add(self, doc_id: int, doc: T.Dict[str, T.Any]):
+        if doc_id >= self.n_docs:
+            padding = [None] * (doc_id + 1 - self.n_docs)
+            for column in self.columns.values():
+                column.extend(padding)
+            for column in self.rendered.values():
+                column.extend(padding)
+            self.n_docs = doc_id + 1
+        for name, column in self.columns.items():
+            value = doc.get(name)
+            if (self._pools is not None) and isinstance(value, str):
+                value = self._pools[name].setdefault(value, value)
+            column[doc_id] = value
+        if self.rendered:
+            row = get_row_class(self.doc_class)(self, doc_id)
+            for name, column in self.rendered.items():
+                column[doc_id] = getattr(self.doc_class, name).fget(row)
+
+    def freeze(self):
+        """
+        Release the interning pools after all documents are added.
+        """
+        self._pools = None
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def get(self, doc_id: int, name: str) -> T.Any:
+        return self.columns[name][doc_id]
+
+    def to_dict(self, doc_id: int) -> T.Dict[str, T.Any]:
+        return {name: column[doc_id] for name, column in self.columns.items()}
+
+    def rows(
+        self,
+        doc_class: T_DOC_CLASS,
+        doc_ids: T.Iterable[int],
+    ) -> T.List[BaseDocument]:
+        """
+        Create the row objects of the given doc ids, they behave like the
+        instances of ``doc_class``.
+        """
+        row_class = get_row_class(doc_class)
+        return [row_class(self, doc_id) for doc_id in doc_ids]
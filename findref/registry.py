@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""
+Process-wide registry of warm ``sayt.DataSet`` objects.
+
+Creating a ``sayt.DataSet`` builds the field lists, the whoosh schema and opens
+the ``diskcache.Cache``. The UI calls the search handler on every keystroke,
+so we create the dataset object once per dataset name and reuse it until it
+is explicitly invalidated (for example, when user forces a refresh with ``!~``).
+Each dataset object is a :class:`~findref.searcher.WarmDataSet`, which also
+keeps its whoosh searcher open across queries.
+"""
+
+import typing as T
+import threading
+import dataclasses
+from pathlib import Path
+
+from diskcache import Cache
+
+from .searcher import WarmDataSet, create_warm_dataset
+from .paths import dir_index, dir_cache
+
+
+@dataclasses.dataclass
+class DataSetRegistry:
+    """
+    Keep one :class:`~findref.searcher.WarmDataSet` object per dataset name.
+
+    All datasets in the same registry share one ``diskcache.Cache`` object.
+
+    :param dir_index: the directory to store the whoosh index.
+    :param dir_cache: the directory to store the diskcache.
+    """
+
+    dir_index: Path
+    dir_cache: Path
+
+    _cache: T.Optional[Cache] = dataclasses.field(default=None, init=False, repr=False)
+    _datasets: T.Dict[str, WarmDataSet] = dataclasses.field(
+        default_factory=dict, init=False, repr=False
+    )
+    _lock: threading.RLock = dataclasses.field(
+        default_factory=threading.RLock, init=False, repr=False
+    )
+
+    @property
+    def cache(self) -> Cache:
+        """
+        The shared ``diskcache.Cache`` object, created on first access.
+        """
+        with self._lock:
+            if self._cache is None:
+                self._cache = Cache(str(self.dir_cache), disk_pickle_protocol=4)
+            return self._cache
+
+    def get(self, dataset: str) -> WarmDataSet:
+        """
+        Get the :class:`~findref.searcher.WarmDataSet` object for the given
+        dataset, create one if it is not in the registry yet.
+        """
+        try:
+            return self._datasets[dataset]
+        except KeyError:
+            pass
+        with self._lock:
+            if dataset not in self._datasets:
+                self._datasets[dataset] = create_warm_dataset(
+                    dataset=dataset,
+                    dir_index=self.dir_index,
+                    dir_cache=self.dir_cache,
+                    cache=self.cache,
+                )
+            return self._datasets[dataset]
+
+    def is_warm(self, dataset: str) -> bool:
+        """
+        Return True if the given dataset already has a warm object.
+        """
+        return dataset in self._datasets
+
+    def invalidate(self, dataset: T.Optional[str] = None):
+        """
+        Drop the warm object of the given dataset, the next :meth:`get` call
+        will create a new one. If ``dataset`` is None, drop all of them.
+        """
+        with self._lock:
+            if dataset is None:
+                datasets = list(self._datasets)
+            else:
+                datasets = [dataset]
+            for dataset in datasets:
+                ds = self._datasets.pop(dataset, None)
+                if ds is not None:
+                    ds.close_searcher()
+
+
+registry = DataSetRegistry(dir_index=dir_index, dir_cache=dir_cache)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""
+Route a free-form query to a dataset.
+
+The dataset names and their aliases are turned into trigram signatures once
+at import time. Ranking the datasets for a partial name is a few set
+intersections, and a dataset name or an unambiguous alias anywhere in the
+query selects the dataset, so ``boto3 s3`` and ``s3 boto3`` both search
+``boto3`` for ``s3``.
+
+Unlike ``fuzzywuzzy``, it only needs the standard library and the dataset
+enum, so it adds nothing to the startup time.
+"""
+
+import typing as T
+import dataclasses
+
+from .constants import DataSetEnum
+
+
+dataset_list = [ds.value for ds in DataSetEnum]
+
+# alias -> datasets, an alias that maps to many datasets doesn't select any
+# of them, it only ranks them first
+ALIASES: T.Dict[str, T.List[str]] = {
+    "cfn": [DataSetEnum.aws_cloudformation.value],
+    "cloudformation": [DataSetEnum.aws_cloudformation.value],
+    "terraform": [DataSetEnum.tf.value],
+    "cdk": [DataSetEnum.cdk_python.value, DataSetEnum.cdk_ts.value],
+    "cdkpy": [DataSetEnum.cdk_python.value],
+    "cdkts": [DataSetEnum.cdk_ts.value],
+    "spark": [DataSetEnum.pyspark.value],
+    "pd": [DataSetEnum.pandas.value],
+}
+
+
+def get_trigrams(text: str) -> T.FrozenSet[str]:
+    """
+    Trigrams of the lower case text padded with spaces, so short texts and
+    the first characters count.
+    """
+    text = f"  {text.lower()} "
+    return frozenset(text[i : i + 3] for i in range(len(text) - 2))
+
+
+@dataclasses.dataclass(frozen=True)
+class _Name:
+    """
+    A name of a dataset, the dataset name itself or an alias.
+    """
+
+    name: str
+    datasets: T.Tuple[str, ...]
+    trigrams: T.FrozenSet[str]
+
+
+_names: T.List[_Name] = [
+    _Name(name=dataset, datasets=(dataset,), trigrams=get_trigrams(dataset))
+    for dataset in dataset_list
+] + [
+    _Name(name=alias, datasets=tuple(datasets), trigrams=get_trigrams(alias))
+    for alias, datasets in ALIASES.items()
+]
+_exact: T.Dict[str, T.Tuple[str, ...]] = {name.name: name.datasets for name in _names}
+
+
+def _score(query: str, query_trigrams: T.FrozenSet[str], name: _Name) -> float:
+    if query == name.name:
+        return 3.0
+    score = 0.0
+    if name.name.startswith(query):
+        score += 1.0
+    common = len(query_trigrams & name.trigrams)
+    score += 2.0 * common / (len(query_trigrams) + len(name.trigrams))
+    return score
+
+
+def rank_datasets(query: str) -> T.List[str]:
+    """
+    Return all datasets, the best match of the partial dataset name or alias
+    first. Datasets with the same score keep the :class:`DataSetEnum` order.
+    """
+    query = query.strip().lower()
+    if not query:
+        return list(dataset_list)
+    query_trigrams = get_trigrams(query)
+    scores = dict.fromkeys(dataset_list, 0.0)
+    for name in _names:
+        score = _score(query, query_trigrams, name)
+        for dataset in name.datasets:
+            if score > scores[dataset]:
+                scores[dataset] = score
+    order = {dataset: i for i, dataset in enumerate(dataset_list)}
+    return sorted(dataset_list, key=lambda dataset: (-scores[dataset], order[dataset]))
+
+
+def resolve(word: str) -> T.Optional[str]:
+    """
+    Return the dataset if the word is a dataset name or an unambiguous alias.
+    """
+    datasets = _exact.get(word.lower())
+    if (datasets is not None) and (len(datasets) == 1):
+        return datasets[0]
+    return None
+
+
+def detect_dataset(words: T.List[str]) -> T.Optional[T.Tuple[str, T.List[str]]]:
+    """
+    Find the first word that selects a dataset, return the dataset and the
+    other words, or None if no word selects a dataset.
+    """
+    for i, word in enumerate(words):
+        dataset = resolve(word)
+        if dataset is not None:
+            return dataset, words[:i] + words[i + 1 :]
+    return None
@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+
+"""
+Declarative dataset schema.
+
+Each dataset is defined by one ``Record`` dataclass whose attributes are
+annotated with :func:`attr`, for example::
+
+    @dataclasses.dataclass
+    class Boto3Record(BaseRecord):
+        url: str = attr("url")
+        type: str = attr("type", keyword(boost=10.0))
+        method: str = attr("meth", text(tokenify=True), ngram())
+
+:func:`compile_schema` derives from it:
+
+- the ``sayt`` fields of the index. Each value is stored once, and analysed
+  into as many indexed fields as it declares. The n-gram field stores the
+  raw value if there is one, otherwise the first field that analyses the raw
+  value does, otherwise a ``StoredField``. The other fields are not stored,
+  their values are derived from the stored one at index time, see
+  :meth:`CompiledSchema.to_index_doc`.
+- the ``Document`` dataclass, its attributes are the stored fields.
+- the ``_dataset_mapper`` entry of :mod:`findref.models`.
+
+The stored field names are the same as the old hand written schema, so the
+releases that store the value of every field can still be indexed, the
+derived fields in them are ignored and recomputed.
+
+:func:`get_field_sizes` reports the number of terms, postings and stored
+bytes of each field of an index.
+"""
+
+import typing as T
+import json
+import hashlib
+import dataclasses
+
+import sayt.api as sayt
+
+if T.TYPE_CHECKING:  # pragma: no cover
+    import whoosh.reading
+
+
+def tokenify(s: str) -> str:
+    """
+    Sometimes the default tokenizer analyzer is not good enough, we need to
+    preprocess the TextField before indexing it.
+    """
+    for char in "._-":
+        s = s.replace(char, " ")
+    return s
+
+
+class IndexKindEnum:
+    text = "text"
+    ngram = "ngram"
+    keyword = "keyword"
+
+
+@dataclasses.dataclass(frozen=True)
+class Index:
+    """
+    One indexed representation of a record attribute.
+
+    :param kind: one of :class:`IndexKindEnum`.
+    :param boost: the field boost.
+    :param tokenify: analyse ``tokenify(value)`` instead of the raw value.
+    :param lowercase: lower case keyword.
+    :param minsize: the min n-gram size.
+    :param maxsize: the max n-gram size.
+    """
+
+    kind: str
+    boost: float = 1.0
+    tokenify: bool = False
+    lowercase: bool = False
+    minsize: int = 2
+    maxsize: int = 6
+
+    @property
+    def is_raw(self) -> bool:
+        return self.tokenify is False
+
+
+def text(boost: float = 1.0, tokenify: bool = False) -> Index:
+    return Index(kind=IndexKindEnum.text, boost=boost, tokenify=tokenify)
+
+
+def ngram(boost: float = 1.0, minsize: int = 2, maxsize: int = 6) -> Index:
+    return Index(
+        kind=IndexKindEnum.ngram, boost=boost, minsize=minsize, maxsize=maxsize
+    )
+
+
+def keyword(boost: float = 1.0, lowercase: bool = False) -> Index:
+    return Index(kind=IndexKindEnum.keyword, boost=boost, lowercase=lowercase)
+
+
+@dataclasses.dataclass(frozen=True)
+class Attr:
+    """
+    The schema of one record attribute.
+
+    :param name: the short name in the index, for example ``"meth"`` for
+        ``Boto3Record.method``.
+    :param indexes: the indexed representations, not indexed if empty.
+    """
+
+    name: str
+    indexes: T.Tuple[Index, ...] = ()
+
+    def get_field_name(self, index: Index) -> str:
+        if index.kind == IndexKindEnum.ngram:
+            return f"{self.name}_ng"
+        return self.name
+
+    @property
+    def stored_index(self) -> T.Optional[Index]:
+        """
+        The indexed representation that stores the raw value, None if the
+        value is stored by a ``StoredField``.
+        """
+        for index in self.indexes:
+            if index.kind == IndexKindEnum.ngram:
+                return index
+        for index in self.indexes:
+            if index.is_raw:
+                return index
+        return None
+
+    @property
+    def stored_name(self) -> str:
+        index = self.stored_index
+        return self.name if index is None else self.get_field_name(index)
+
+
+_MISSING = dataclasses.MISSING
+
+
+def attr(name: str, *indexes: Index, default: T.Any = _MISSING) -> T.Any:
+    """
+    Annotate a ``Record`` attribute, see the module docstring.
+    """
+    return dataclasses.field(
+        default=default,
+        metadata={"schema": Attr(name=name, indexes=tuple(indexes))},
+    )
+
+
+def _to_sayt_field(name: str, index: Index, stored: bool) -> sayt.T_Field:
+    if index.kind == IndexKindEnum.text:
+        return sayt.TextField(name=name, stored=stored, field_boost=index.boost)
+    if index.kind == IndexKindEnum.ngram:
+        return sayt.NgramWordsField(
+            name=name,
+            stored=stored,
+            minsize=index.minsize,
+            maxsize=index.maxsize,
+            field_boost=index.boost,
+        )
+    if index.kind == IndexKindEnum.keyword:
+        return sayt.KeywordField(
+            name=name,
+            stored=stored,
+            lowercase=index.lowercase,
+            field_boost=index.boost,
+        )
+    raise ValueError(f"unknown index kind {index.kind!r}")  # pragma: no cover
+
+
+@dataclasses.dataclass
+class CompiledSchema:
+    """
+    Everything derived from one ``Record`` class, see :func:`compile_schema`.
+
+    :param dataset: the dataset name.
+    :param record_class: the ``Record`` class.
+    :param doc_class: the generated ``Document`` class.
+    :param attrs: record attribute name -> its schema.
+    :param fields: the ``sayt`` fields of the index.
+    :param backend: the default search backend.
+    """
+
+    dataset: str
+    record_class: T.Type
+    doc_class: T.Type
+    attrs: T.Dict[str, Attr]
+    fields: T.List[sayt.T_Field]
+    backend: str
+
+    # (field name, stored name, index) of the fields that are not stored
+    _derived: T.List[T.Tuple[str, str, Index]] = dataclasses.field(
+        default_factory=list, init=False, repr=False
+    )
+
+    def __post_init__(self):
+        for attr_ in self.attrs.values():
+            stored_index = attr_.stored_index
+            for index in attr_.indexes:
+                if index is not stored_index:
+                    self._derived.append(
+                        (attr_.get_field_name(index), attr_.stored_name, index)
+                    )
+
+    @property
+    def stored_names(self) -> T.List[str]:
+        return [attr_.stored_name for attr_ in self.attrs.values()]
+
+    @property
+    def mapper_entry(self) -> T.Dict[str, T.Any]:
+        return {
+            "doc_class": self.doc_class,
+            "fields": self.fields,
+            "backend": self.backend,
+            "schema": self,
+        }
+
+    def to_doc(self, record) -> T.Any:
+        """
+        Convert a record into its document.
+        """
+        return self.doc_class(
+            **{
+                attr_.stored_name: getattr(record, name)
+                for name, attr_ in self.attrs.items()
+            }
+        )
+
+    def to_index_doc(self, doc: T.Dict[str, T.Any]) -> T.Dict[str, T.Any]:
+        """
+        Add the values of the derived fields to the stored values of the
+        document, the other keys are dropped.
+        """
+        index_doc = {name: doc.get(name) for name in self.stored_names}
+        for field_name, stored_name, index in self._derived:
+            value = index_doc[stored_name]
+            if value and index.tokenify:
+                value = tokenify(value)
+            index_doc[field_name] = value
+        return index_doc
+
+
+def get_schema_fingerprint(fields: T.List[sayt.T_Field]) -> str:
+    """
+    A short hash of the field definitions. An index can only be used if it is
+    built with the same field definitions, it is part of the prebuilt index
+    header and of the freshness cache key of the local index.
+    """
+    data = [field.to_dict() for field in fields]
+    binary = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(binary).hexdigest()[:16]
+
+
+def _is_optional(type_: T.Any) -> bool:
+    return (T.get_origin(type_) is T.Union) and (type(None) in T.get_args(type_))
+
+
+def _make_doc_docstring(
+    record_class: T.Type,
+    attrs: T.Dict[str, Attr],
+) -> str:
+    lines = [
+        "",
+        f"The document of :class:`{record_class.__name__}`, generated by",
+        ":func:`findref.schema.compile_schema`.",
+        "",
+    ]
+    for name, attr_ in attrs.items():
+        lines.append(
+            f":param {attr_.stored_name}: same as "
+            f":attr:`{record_class.__name__}.{name}`"
+        )
+    return "\n    ".join(lines) + "\n    "
+
+
+def compile_schema(
+    dataset: str,
+    record_class: T.Type,
+    doc_name: str,
+    doc_base: T.Type,
+    title: T.Callable[[T.Any], str],
+    backend: str,
+) -> CompiledSchema:
+    """
+    Generate the index fields, the document class and the dataset mapper
+    entry from the annotated ``Record`` class.
+
+    :param doc_name: the class name of the generated document class.
+    :param doc_base: the base class of the generated document class.
+    :param title: the ``title`` property of the document.
+    :param backend: the default search backend.
+    """
+    attrs = dict()
+    doc_fields = list()
+    hints = T.get_type_hints(record_class)
+    for field in dataclasses.fields(record_class):
+        attr_ = field.metadata.get("schema")
+        if attr_ is None:
+            raise TypeError(
+                f"{record_class.__name__}.{field.name} is not annotated with attr()"
+            )
+        attrs[field.name] = attr_
+        type_ = hints[field.name]
+        if _is_optional(type_):
+            doc_fields.append(
+                (attr_.stored_name, type_, dataclasses.field(default=None))
+            )
+        else:
+            doc_fields.append((attr_.stored_name, type_))
+
+    sayt_fields = list()
+    for attr_ in attrs.values():
+        stored_index = attr_.stored_index
+        if stored_index is None:
+            sayt_fields.append(sayt.StoredField(name=attr_.stored_name))
+        for index in attr_.indexes:
+            sayt_fields.append(
+                _to_sayt_field(
+                    name=attr_.get_field_name(index),
+                    index=index,
+                    stored=index is stored_index,
+                )
+            )
+
+    field_names = [field.name for field in sayt_fields]
+    for name in field_names:
+        if field_names.count(name) > 1:
+            raise ValueError(
+                f"{record_class.__name__} has more than one field named {name!r}, "
+                "an attribute that is only analysed by text(tokenify=True) "
+                "also needs a raw index to store its value"
+            )
+
+    doc_class = dataclasses.make_dataclass(
+        doc_name,
+        doc_fields,
+        bases=(doc_base,),
+        namespace={"title": property(title)},
+    )
+    doc_class.__module__ = record_class.__module__
+    doc_class.__doc__ = _make_doc_docstring(record_class, attrs)
+    schema = CompiledSchema(
+        dataset=dataset,
+        record_class=record_class,
+        doc_class=doc_class,
+        attrs=attrs,
+        fields=sayt_fields,
+        backend=backend,
+    )
+    record_class.schema = schema
+    return schema
+
+
+@dataclasses.dataclass
+class FieldSize:
+    """
+    The size of one field in an index.
+
+    :param name: the field name.
+    :param kind: the ``sayt`` field class name.
+    :param stored: whether the value is stored.
+    :param n_terms: number of distinct terms.
+    :param n_postings: number of (term, document) pairs.
+    :param stored_bytes: the UTF-8 size of the stored values.
+    """
+
+    name: str
+    kind: str
+    stored: bool
+    n_terms: int = 0
+    n_postings: int = 0
+    stored_bytes: int = 0
+
+
+def _is_stored(field: sayt.T_Field) -> bool:
+    return isinstance(field, sayt.StoredField) or getattr(field, "stored", False)
+
+
+def get_field_sizes(
+    reader: "whoosh.reading.IndexReader",
+    fields: T.List[sayt.T_Field],
+) -> T.List[FieldSize]:
+    """
+    Count the terms, postings and stored bytes of each field of the index.
+    """
+    sizes = {
+        field.name: FieldSize(
+            name=field.name,
+            kind=type(field).__name__,
+            stored=_is_stored(field),
+        )
+        for field in fields
+    }
+    for size in sizes.values():
+        if size.kind == sayt.StoredField.__name__:
+            continue
+        for _, term_info in reader.iter_field(size.name):
+            size.n_terms += 1
+            size.n_postings += term_info.doc_frequency()
+    for _, stored in reader.iter_docs():
+        for name, value in stored.items():
+            if name in sizes:
+                size = sizes[name]
+                size.stored_bytes += len(json.dumps(value, ensure_ascii=False))
+    return list(sizes.values())
+
+
+def format_field_sizes(dataset: str, sizes: T.List[FieldSize]) -> str:
+    lines = [
+        f"{dataset}:",
+        f"  {'field':<14} {'kind':<16} {'stored':>6} {'terms':>9} "
+        f"{'postings':>10} {'stored bytes':>13}",
+    ]
+    for size in sizes:
+        lines.append(
+            f"  {size.name:<14} {size.kind:<16} {'yes' if size.stored else 'no':>6} "
+            f"{size.n_terms:>9} {size.n_postings:>10} {size.stored_bytes:>13}"
+        )
+    total = sum(size.stored_bytes for size in sizes)
+    lines.append(f"  total stored bytes: {total}")
+    return "\n".join(lines)
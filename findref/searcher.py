@@ -0,0 +1,813 @@
+# -*- coding: utf-8 -*-
+
+"""
+Long-lived whoosh searcher on top of ``sayt.DataSet``.
+
+``sayt.DataSet.search`` opens the index and creates a new whoosh searcher for
+every query, so each keystroke pays the segment open and file read cost.
+:class:`WarmDataSet` keeps one searcher open and only reopens it when the
+index generation on disk changes.
+
+The processes sharing the index directory build each index one at a time,
+see :mod:`findref.buildlock`.
+"""
+
+import typing as T
+import os
+import json
+import time
+import threading
+import dataclasses
+from pathlib import Path
+
+import whoosh.query
+import whoosh.sorting
+import whoosh.searching
+from whoosh.index import TOC
+from whoosh.writing import CLEAR
+from whoosh.filedb.filestore import FileStorage
+import sayt.api as sayt
+from sayt.tracker import TrackerIsLockedError
+from diskcache import Cache
+
+from . import models
+from . import prebuilt
+from .buildlock import FileLock, read_generation, bump_generation, write_atomic
+from .incremental import IncrementalSearch
+from .memindex import SearchBackendEnum, MemoryIndex
+from .records import RecordStore
+from .schema import CompiledSchema, FieldSize, get_field_sizes
+from .typo import TypoDictionary
+from .trace import tracer
+
+
+T_SIGNATURE = T.Optional[T.Tuple[int, int]]
+T_PROGRESS_CALLBACK = T.Callable[[int, T.Optional[int]], T.Any]
+T_UPDATER = T.Callable[[T.Optional[str]], models.DataSetUpdate]
+T_PREBUILT_DOWNLOADER = T.Callable[[Path, T.Optional[str]], T.Optional[str]]
+T_WAIT_CALLBACK = T.Callable[[T.Optional[int]], T.Any]
+
+
+@dataclasses.dataclass
+class WarmDataSet(sayt.DataSet):
+    """
+    A ``sayt.DataSet`` that holds one long-lived whoosh searcher.
+
+    The searcher is opened lazily on the first query. Before each query we
+    compare the index signature (latest generation number and the modify time
+    of its TOC file) with the one we opened, and reopen the searcher only if
+    it changed, for example, the index is rebuilt by this or another process.
+
+    Rebuilding the index replaces all old documents in one commit, so the
+    previous index keeps serving queries until the new one is ready.
+
+    :param updater: an optional callable function that takes the release tag
+        name of the local index and returns a :class:`~findref.models.DataSetUpdate`.
+        If set, :meth:`refresh_index` only applies the changed documents
+        when the release publishes a delta, instead of a full rebuild.
+    :param backend: the search backend, see
+        :class:`~findref.memindex.SearchBackendEnum`. The whoosh index is
+        always built, the ``"memory"`` backend loads the documents from it
+        into a :class:`~findref.memindex.MemoryIndex` and searches that.
+    :param prebuilt_downloader: an optional callable function that takes the
+        path of the prebuilt index and its current release tag name, downloads
+        the latest prebuilt index to the path if it is out of date, and
+        returns its release tag name, or None if the release doesn't publish
+        one. It is only used by the ``"memory"`` backend, if it returns a tag
+        name, the prebuilt index is opened with mmap and the whoosh index is
+        not built at all.
+    :param doc_class: the document class of the dataset, if given, the
+        record store renders its ``render_fields`` once per index generation.
+    :param record_schema: the compiled schema of the dataset, if given, the
+        fields that are not stored are derived from the stored ones when
+        indexing, see :meth:`~findref.schema.CompiledSchema.to_index_doc`.
+    """
+
+    updater: T.Optional[T_UPDATER] = dataclasses.field(default=None)
+    backend: str = dataclasses.field(default=SearchBackendEnum.whoosh.value)
+    prebuilt_downloader: T.Optional[T_PREBUILT_DOWNLOADER] = dataclasses.field(
+        default=None
+    )
+    doc_class: T.Optional[T.Type[models.BaseDocument]] = dataclasses.field(default=None)
+    record_schema: T.Optional[CompiledSchema] = dataclasses.field(default=None)
+
+    def __post_init__(self):
+        super().__post_init__()
+        self._searcher: T.Optional[whoosh.searching.Searcher] = None
+        self._searcher_signature: T_SIGNATURE = None
+        self._searcher_lock = threading.RLock()
+        self._memory_index: T.Optional[MemoryIndex] = None
+        self._memory_index_signature: T_SIGNATURE = None
+        self._typo_dictionary: T.Optional[TypoDictionary] = None
+        self._typo_dictionary_signature: T_SIGNATURE = None
+        self._record_store: T.Optional[RecordStore] = None
+        # the searcher or the memory index the record store is loaded from
+        self._record_store_source: T.Any = None
+        self.incremental = IncrementalSearch(ds=self)
+
+    def _index_signature(self) -> T_SIGNATURE:
+        """
+        Return the ``(generation, toc_mtime_ns)`` of the latest index
+        generation on disk, or None if the index doesn't exist.
+        """
+        try:
+            storage = FileStorage(str(self.dir_index))
+            gen = TOC._latest_generation(storage, self.index_name)
+        except FileNotFoundError:  # pragma: no cover
+            return None
+        if gen < 0:
+            return None
+        path_toc = Path(self.dir_index) / TOC._filename(self.index_name, gen)
+        try:
+            return gen, path_toc.stat().st_mtime_ns
+        except FileNotFoundError:  # pragma: no cover
+            return None
+
+    def get_searcher(self) -> whoosh.searching.Searcher:
+        """
+        Get the warm whoosh searcher, reopen it if the index on disk changed.
+        """
+        with self._searcher_lock:
+            signature = self._index_signature()
+            if (self._searcher is None) or (signature != self._searcher_signature):
+                self.close_searcher()
+                self._searcher = self._get_index().searcher()
+                self._searcher_signature = signature
+            return self._searcher
+
+    def close_searcher(self):
+        """
+        Close the warm searcher if it is open.
+        """
+        with self._searcher_lock:
+            if self._searcher is not None:
+                self._searcher.close()
+                self._searcher = None
+                self._searcher_signature = None
+
+    @property
+    def _path_prebuilt(self) -> Path:
+        return Path(self.dir_index) / f"{self.index_name}.fri"
+
+    def _prebuilt_signature(self) -> T.Optional[T.Tuple[int, int, int]]:
+        """
+        Return the ``(inode, size, mtime_ns)`` of the prebuilt index file, or
+        None if it doesn't exist or it is not used by this backend.
+        """
+        if self.backend != SearchBackendEnum.memory.value:
+            return None
+        try:
+            stat = self._path_prebuilt.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def get_memory_index(self) -> MemoryIndex:
+        """
+        Get the in-memory n-gram index. It is the mmap opened prebuilt index
+        if there is one, otherwise it is loaded from the stored fields of the
+        whoosh index. It is reopened when the file on disk changes.
+        """
+        with self._searcher_lock:
+            signature = self._prebuilt_signature()
+            if signature is not None:
+                if self._memory_index_signature != signature:
+                    try:
+                        self._memory_index = prebuilt.open_prebuilt_index(
+                            self._path_prebuilt, fields=self.fields
+                        )
+                        self._memory_index_signature = signature
+                        return self._memory_index
+                    except ValueError:
+                        self._path_prebuilt.unlink(missing_ok=True)
+                else:
+                    return self._memory_index
+
+            searcher = self.get_searcher()
+            if (self._memory_index is None) or (
+                self._memory_index_signature != self._searcher_signature
+            ):
+                self._memory_index = MemoryIndex.build(
+                    fields=self.fields,
+                    docs=(fields for _, fields in searcher.reader().iter_docs()),
+                    to_index_doc=self._to_index_doc,
+                )
+                self._memory_index_signature = self._searcher_signature
+            return self._memory_index
+
+    def get_record_store(self) -> RecordStore:
+        """
+        Get the stored fields and the rendered fields of all documents, the
+        doc ids are the whoosh doc numbers of the warm searcher, or the doc
+        ids of the in-memory index if :attr:`backend` is ``"memory"``. It is
+        reloaded when the searcher or the in-memory index is reopened.
+        """
+        with self._searcher_lock:
+            if self.backend == SearchBackendEnum.memory.value:
+                return self._get_record_store_for(self.get_memory_index())
+            return self._get_record_store_for(self.get_searcher())
+
+    def _get_record_store_for(
+        self,
+        source: T.Union[whoosh.searching.Searcher, MemoryIndex],
+    ) -> RecordStore:
+        """
+        Get the record store of exactly this searcher or in-memory index, the
+        doc ids it returns can be looked up in it even if a newer index
+        generation is committed meanwhile.
+        """
+        with self._searcher_lock:
+            if self._record_store_source is not source:
+                if isinstance(source, MemoryIndex):
+                    docs = enumerate(source.docs)
+                else:
+                    docs = source.reader().iter_docs()
+                self._record_store = RecordStore.build(
+                    self._stored_field_names, docs, doc_class=self.doc_class
+                )
+                self._record_store_source = source
+            return self._record_store
+
+    def search_ids(
+        self,
+        query: str,
+        limit: int = 20,
+    ) -> T.Tuple[RecordStore, T.List[int]]:
+        """
+        Search whatever index is on disk right now, same as
+        :meth:`search_index`, but return the doc ids of the top documents
+        instead of their stored fields, and the record store they belong to.
+        """
+        with self._searcher_lock:
+            if self.backend == SearchBackendEnum.memory.value:
+                index = self.get_memory_index()
+                store = self._get_record_store_for(index)
+                with tracer.span("engine"):
+                    matches = index.search(query, limit=limit)
+                return store, [doc_id for doc_id, _ in matches]
+            # the store and the doc ids must come from the same searcher, the
+            # background build may commit a new generation at any time
+            searcher = self.get_searcher()
+            store = self._get_record_store_for(searcher)
+            with tracer.span("parse_query"):
+                q = self._parse_query(query)
+            with tracer.span("engine"):
+                res = searcher.search(q, limit=limit)
+            return store, [hit.docnum for hit in res]
+
+    def get_field_sizes(self) -> T.List[FieldSize]:
+        """
+        Get the number of terms, postings and stored bytes of each field of
+        the whoosh index.
+        """
+        with self._searcher_lock:
+            return get_field_sizes(self.get_searcher().reader(), self.fields)
+
+    @property
+    def _path_typo(self) -> Path:
+        return Path(self.dir_index) / f"{self.index_name}.typo.json"
+
+    def _write_typo_dictionary(self):
+        """
+        Build the typo dictionary from the latest index generation and store
+        it next to the index.
+        """
+        signature = self._index_signature()
+        dictionary = TypoDictionary.from_index(self._get_index(), self.fields)
+        dictionary.dump(self._path_typo, metadata={"signature": list(signature)})
+
+    def get_typo_dictionary(self) -> T.Optional[TypoDictionary]:
+        """
+        Get the typo dictionary of the index on disk, it is reloaded when the
+        index generation on disk changes. Return None if there isn't one for
+        the current generation, fuzzy terms are then expanded by whoosh.
+        """
+        with self._searcher_lock:
+            signature = self._index_signature()
+            if signature is None:
+                return None
+            if self._typo_dictionary_signature != signature:
+                try:
+                    dictionary, metadata = TypoDictionary.load(self._path_typo)
+                except (FileNotFoundError, ValueError, KeyError):
+                    dictionary, metadata = None, {}
+                if metadata.get("signature") != list(signature):
+                    dictionary = None
+                self._typo_dictionary = dictionary
+                self._typo_dictionary_signature = signature
+            return self._typo_dictionary
+
+    def _parse_query(self, query_str: str) -> whoosh.query.Query:
+        """
+        Same as ``sayt.DataSet._parse_query``, but ``word~1`` is expanded
+        with the typo dictionary if there is one.
+        """
+        dictionary = self.get_typo_dictionary()
+        if dictionary is not None:
+            query_str = dictionary.expand_query(query_str)
+        return super()._parse_query(query_str)
+
+    def is_fresh(self) -> bool:
+        """
+        Return True if the index is built and not expired yet. The cache key
+        contains the schema fingerprint, an index built with other field
+        definitions is not fresh, :meth:`refresh_index` rebuilds it.
+        """
+        return self.cache_key in self.cache
+
+    def has_index(self) -> bool:
+        """
+        Return True if there is an index on disk, it may be expired.
+        """
+        if self._prebuilt_signature() is not None:
+            return True
+        return self._index_signature() is not None
+
+    def _has_compatible_index(self) -> bool:
+        """
+        Return True if there is an index on disk and its schema is the same
+        as the current field definitions.
+        """
+        if self.has_index() is False:
+            return False
+        return self._get_index().schema == self.schema
+
+    @property
+    def _path_state(self) -> Path:
+        return Path(self.dir_index) / f"{self.index_name}.state.json"
+
+    def read_state(self) -> T.Dict[str, T.Any]:
+        """
+        Read the state of the local index, for example, the release tag name
+        it was built from. Return an empty dict if it is unknown.
+        """
+        try:
+            return json.loads(self._path_state.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_state(self, **kwargs):
+        write_atomic(self._path_state, json.dumps(kwargs))
+
+    @property
+    def _path_lock(self) -> Path:
+        return Path(self.dir_index) / f"{self.index_name}.lock"
+
+    @property
+    def _path_generation(self) -> Path:
+        return Path(self.dir_index) / f"{self.index_name}.generation.json"
+
+    def read_build_generation(self) -> int:
+        """
+        Read the number of successful index builds of this dataset by any
+        process, see :mod:`findref.buildlock`.
+        """
+        return read_generation(self._path_generation)
+
+    def _acquire_build_lock(
+        self,
+        raise_lock_error: bool = False,
+        on_wait: T.Optional[T_WAIT_CALLBACK] = None,
+        lock_timeout: T.Optional[float] = None,
+    ) -> T.Optional[FileLock]:
+        """
+        Acquire the cross-process build lock of this dataset, wait for it if
+        another thread or process holds it.
+
+        :return: the acquired lock, None if it timed out.
+        """
+        lock = FileLock(self._path_lock)
+        if lock.acquire(blocking=False):
+            return lock
+        owner = lock.get_owner()
+        if raise_lock_error:
+            raise TrackerIsLockedError(
+                f"the {self.index_name!r} index is being built by process {owner}"
+            )
+        tracer.incr("build.waited")
+        if on_wait is not None:
+            on_wait(owner)
+        if lock.acquire(timeout=lock_timeout):
+            return lock
+        return None
+
+    def build_index(
+        self,
+        data: T.Iterable[sayt.T_DOCUMENT],
+        memory_limit: int = 512,
+        multi_thread: bool = True,
+        rebuild: bool = True,
+        raise_lock_error: bool = False,
+    ) -> bool:
+        """
+        Same as ``sayt.DataSet.build_index``, but hold the cross-process build
+        lock instead of the ``sayt`` tracker file, and wait for the lock
+        unless ``raise_lock_error`` is True.
+        """
+        lock = self._acquire_build_lock(raise_lock_error=raise_lock_error)
+        try:
+            self._build_index(
+                data=data,
+                memory_limit=memory_limit,
+                multi_thread=multi_thread,
+                rebuild=rebuild,
+            )
+            bump_generation(self._path_generation)
+        finally:
+            lock.release()
+        return True
+
+    def _mark_fresh(self):
+        """
+        Update the cache to indicate that the index is up to date.
+        """
+        self.cache.set(
+            self.cache_key,
+            self.index_name,
+            expire=self.cache_expire,
+            tag=self.cache_tag,
+        )
+
+    @property
+    def _stored_field_names(self) -> T.List[str]:
+        if self.record_schema is None:
+            return self._field_names
+        return self.record_schema.stored_names
+
+    def _to_index_doc(self, row: sayt.T_DOCUMENT) -> T.Dict[str, T.Any]:
+        """
+        Get the values of all fields of the document, the fields that are
+        not stored are derived from the stored ones if there is a schema.
+        """
+        if self.record_schema is None:
+            return {field_name: row.get(field_name) for field_name in self._field_names}
+        return self.record_schema.to_index_doc(row)
+
+    def _build_index(
+        self,
+        data: T.Iterable[sayt.T_DOCUMENT],
+        memory_limit: int = 512,
+        multi_thread: bool = True,
+        rebuild: bool = True,
+    ):
+        """
+        Same as ``sayt.DataSet._build_index``, but when ``rebuild`` is True,
+        the new documents replace the old ones in the same commit instead of
+        removing the index first. The old index is only removed if its schema
+        is not compatible with the current field definitions.
+        """
+        if rebuild and (self._has_compatible_index() is False):
+            # release the segment files before they are removed
+            self.close_searcher()
+            self.remove_index()
+        # we don't know which release the data comes from
+        self._path_state.unlink(missing_ok=True)
+
+        idx = self._get_index()
+        if multi_thread:  # pragma: no cover
+            writer = idx.writer(
+                limitmb=memory_limit, procs=os.cpu_count(), multisegment=True
+            )
+        else:
+            writer = idx.writer(limitmb=memory_limit)
+
+        # the data is streamed from the download while the writer is open,
+        # release the whoosh write lock if anything fails, the old index is
+        # kept as is
+        try:
+            for row in data:
+                writer.add_document(**self._to_index_doc(row))
+            if rebuild:
+                writer.commit(mergetype=CLEAR)
+            else:  # pragma: no cover
+                writer.commit()
+        except BaseException:
+            writer.cancel()
+            raise
+        if rebuild:
+            # the query cache belongs to the old index
+            self.remove_cache()
+        self._write_typo_dictionary()
+        self._mark_fresh()
+
+    def _apply_delta(
+        self,
+        delta: models.ReleaseDelta,
+        on_progress: T.Optional[T_PROGRESS_CALLBACK] = None,
+        uid_key: str = "url",
+    ):
+        """
+        Delete the removed and changed documents and add the new version of
+        the changed documents in a single commit.
+        """
+        idx = self._get_index()
+        writer = idx.writer()
+        n_total = len(delta.upserts)
+        # release the whoosh write lock if anything fails, the index is kept
+        # as is
+        try:
+            uids = set(delta.deletes)
+            uids.update(doc[uid_key] for doc in delta.upserts)
+            reader = writer.reader()
+            for docnum, fields in reader.iter_docs():
+                if fields.get(uid_key) in uids:
+                    writer.delete_document(docnum)
+            for row in delta.upserts:
+                writer.add_document(**self._to_index_doc(row))
+            writer.commit()
+        except BaseException:
+            writer.cancel()
+            raise
+        self.remove_cache()
+        self._write_typo_dictionary()
+        self._mark_fresh()
+        if on_progress:
+            on_progress(n_total, n_total)
+
+    def _rebuild(
+        self,
+        data: T.Iterable[sayt.T_DOCUMENT],
+        on_progress: T.Optional[T_PROGRESS_CALLBACK],
+        progress_every: int,
+        memory_limit: int,
+        multi_thread: bool,
+    ):
+        try:
+            n_total = len(data)
+        except TypeError:
+            n_total = None
+
+        def counted():
+            n_indexed = 0
+            for n_indexed, row in enumerate(data, start=1):
+                yield row
+                if on_progress and (n_indexed % progress_every == 0):
+                    on_progress(n_indexed, n_total)
+            if on_progress:
+                on_progress(n_indexed, n_total)
+
+        self._build_index(
+            data=counted(),
+            memory_limit=memory_limit,
+            multi_thread=multi_thread,
+            rebuild=True,
+        )
+
+    def _refresh_prebuilt_index(
+        self,
+        on_progress: T.Optional[T_PROGRESS_CALLBACK] = None,
+    ) -> bool:
+        """
+        Download the prebuilt index if this dataset uses the ``"memory"``
+        backend and the release publishes one.
+
+        :return: True if the prebuilt index is up to date, False if the index
+            has to be built locally.
+        """
+        if (self.backend != SearchBackendEnum.memory.value) or (
+            self.prebuilt_downloader is None
+        ):
+            return False
+        current_tag = prebuilt.read_prebuilt_tag(self._path_prebuilt, self.fields)
+        tag = self.prebuilt_downloader(self._path_prebuilt, current_tag)
+        if tag is None:
+            # the release doesn't publish it anymore, don't serve a stale one
+            self._path_prebuilt.unlink(missing_ok=True)
+            return False
+        if tag != current_tag:
+            # the query cache belongs to the old index
+            self.remove_cache()
+        self._mark_fresh()
+        if on_progress:
+            n_docs = len(self.get_memory_index())
+            on_progress(n_docs, n_docs)
+        return True
+
+    def refresh_index(
+        self,
+        on_progress: T.Optional[T_PROGRESS_CALLBACK] = None,
+        progress_every: int = 1000,
+        memory_limit: int = 512,
+        multi_thread: bool = True,
+        raise_lock_error: bool = False,
+        on_wait: T.Optional[T_WAIT_CALLBACK] = None,
+        lock_timeout: T.Optional[float] = None,
+    ) -> bool:
+        """
+        Download the dataset and rebuild the index without logging anything,
+        so it is safe to run in a background thread of the terminal UI.
+
+        Only one thread or process refreshes the index of a dataset at a
+        time. If another one is refreshing it, wait until it is done, the
+        index on disk keeps serving queries meanwhile. If it built the index
+        while we were waiting, there is nothing left to download or build.
+
+        If :attr:`updater` is set, it only downloads and applies the changed
+        documents when the release publishes a delta against the release of
+        the local index, and only marks the index fresh if nothing changed.
+
+        If the ``"memory"`` backend is used and :attr:`prebuilt_downloader`
+        is set, it downloads the prebuilt index instead of building one.
+
+        :param on_progress: a callback function ``f(n_indexed, n_total)``,
+            it is called every ``progress_every`` documents and at the end.
+            ``n_total`` is None if the downloader doesn't return a sized object.
+        :param raise_lock_error: if True, raise ``TrackerIsLockedError``
+            when another thread or process is indexing this dataset, instead
+            of waiting for it.
+        :param on_wait: a callback function ``f(pid)`` called before waiting
+            for another process, ``pid`` is None if it is unknown.
+        :param lock_timeout: stop waiting after this many seconds, wait
+            forever if None.
+
+        :return: a boolean value to indicate whether building index happened
+            in this call, False if another process did it or it timed out.
+        """
+        kwargs = dict(
+            on_progress=on_progress,
+            progress_every=progress_every,
+            memory_limit=memory_limit,
+            multi_thread=multi_thread,
+        )
+        generation = self.read_build_generation()
+        lock = self._acquire_build_lock(
+            raise_lock_error=raise_lock_error,
+            on_wait=on_wait,
+            lock_timeout=lock_timeout,
+        )
+        if lock is None:
+            return False
+        try:
+            if self.read_build_generation() != generation:
+                tracer.incr("build.deduplicated")
+                return False
+            self._refresh(rebuild_kwargs=kwargs, on_progress=on_progress)
+            bump_generation(self._path_generation)
+            return True
+        finally:
+            lock.release()
+
+    def _refresh(
+        self,
+        rebuild_kwargs: T.Dict[str, T.Any],
+        on_progress: T.Optional[T_PROGRESS_CALLBACK],
+    ):
+        """
+        The body of :meth:`refresh_index`, it runs while holding the lock.
+        """
+        if self._refresh_prebuilt_index(on_progress=on_progress):
+            return
+        if self.updater is None:
+            self._rebuild(data=self.downloader(), **rebuild_kwargs)
+            return
+
+        if self._has_compatible_index():
+            current_tag = self.read_state().get("tag")
+        else:
+            current_tag = None
+        update = self.updater(current_tag)
+        if update.is_up_to_date:
+            self._mark_fresh()
+        elif update.delta is not None:
+            self._apply_delta(update.delta, on_progress=on_progress)
+        else:
+            self._rebuild(data=update.docs, **rebuild_kwargs)
+        self._write_state(tag=update.tag)
+
+    def search_index(
+        self,
+        query: T.Union[str, whoosh.query.Query],
+        limit: int = 20,
+        simple_response: bool = True,
+    ) -> T.Union[T.List[dict], sayt.T_Result]:
+        """
+        Search whatever index is on disk right now, never download the data
+        or rebuild the index even if it is expired. Use this when a background
+        build is in progress and the old index should keep serving queries.
+        """
+        query_cache_key = (self.cache_key, str(query), limit, simple_response)
+        result = self.cache.get(query_cache_key)
+        if result is not None:
+            return result
+        return self._run_query(
+            fresh=False,
+            query_cache_key=query_cache_key,
+            query=query,
+            limit=limit,
+            simple_response=simple_response,
+        )
+
+    def _run_query(
+        self,
+        fresh: bool,
+        query_cache_key: tuple,
+        query: T.Union[str, whoosh.query.Query],
+        limit: int = 20,
+        simple_response: bool = True,
+    ) -> T.Union[T.List[dict], sayt.T_Result]:
+        """
+        Same as ``sayt.DataSet._run_query``, but use the warm searcher, or the
+        in-memory index if :attr:`backend` is ``"memory"``.
+        """
+        if (self.backend == SearchBackendEnum.memory.value) and isinstance(query, str):
+            st = time.process_time()
+            index = self.get_memory_index()
+            with tracer.span("engine"):
+                matches = index.search(query, limit=limit)
+            hits = [
+                {
+                    "_id": doc_id,
+                    "_score": score,
+                    "_source": index.docs[doc_id],
+                }
+                for doc_id, score in matches
+            ]
+            et = time.process_time()
+        else:
+            if isinstance(query, str):
+                with tracer.span("parse_query"):
+                    q = self._parse_query(query)
+            else:  # pragma: no cover
+                q = query
+
+            search_kwargs = dict(
+                q=q,
+                limit=limit,
+            )
+            if len(self._sortable_fields):  # pragma: no cover
+                multi_facet = whoosh.sorting.MultiFacet()
+                for field_name in self._sortable_fields:
+                    field = self._fields_mapper[field_name]
+                    multi_facet.add_field(field_name, reverse=not field._is_ascending())
+                search_kwargs["sortedby"] = multi_facet
+
+            with self._searcher_lock:
+                searcher = self.get_searcher()
+                st = time.process_time()
+                with tracer.span("engine"):
+                    res = searcher.search(**search_kwargs)
+                hits = [
+                    {
+                        "_id": hit.docnum,
+                        "_score": hit.score,
+                        "_source": hit.fields(),
+                    }
+                    for hit in res
+                ]
+                et = time.process_time()
+
+        if simple_response:
+            result = [hit["_source"] for hit in hits]
+        else:
+            result = {
+                "index": self.index_name,
+                "took": int((et - st) // 0.001),
+                "size": len(hits),
+                "fresh": fresh,
+                "cache": False,
+                "hits": hits,
+            }
+
+        # set cache, query should never expire
+        self.cache.set(
+            query_cache_key,
+            result,
+            tag=self.cache_tag,
+        )
+        return result
+
+
+def create_warm_dataset(
+    dataset: str,
+    dir_index: Path,
+    dir_cache: Path,
+    cache: T.Optional[Cache] = None,
+) -> WarmDataSet:
+    """
+    Create a :class:`WarmDataSet` object for the given dataset.
+    """
+    ds = models.create_sayt_dataset(
+        dataset=dataset,
+        dir_index=dir_index,
+        dir_cache=dir_cache,
+        cache=cache,
+        dataset_class=WarmDataSet,
+    )
+
+    def updater(current_tag: T.Optional[str]) -> models.DataSetUpdate:
+        return models.get_dataset_update(dataset, current_tag=current_tag)
+
+    def prebuilt_downloader(
+        path: Path,
+        current_tag: T.Optional[str],
+    ) -> T.Optional[str]:
+        return prebuilt.download_prebuilt_index(
+            dataset, path, fields=ds.fields, current_tag=current_tag
+        )
+
+    ds.updater = updater
+    ds.backend = models.get_search_backend(dataset)
+    ds.prebuilt_downloader = prebuilt_downloader
+    ds.doc_class = models.get_doc_class(dataset)
+    ds.record_schema = models.get_schema(dataset)
+    return ds
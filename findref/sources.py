@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+
+"""
+Where the dataset releases are downloaded from.
+
+By default, the latest release tag comes from the GitHub API and the
+release assets are downloaded from GitHub. Machines without internet access
+can use a mirror instead, set the ``FINDREF_RELEASE_SOURCE`` environment
+variable to:
+
+- a local directory, e.g. ``/mnt/findref-mirror``,
+- a ``file://`` URL, e.g. ``file:///mnt/findref-mirror``,
+- an HTTP(S) URL, e.g. ``https://artifacts.example.com/findref``.
+
+A mirror has this layout, ``fr mirror`` creates it::
+
+    ${root}/LATEST                      # the latest tag name
+    ${root}/${tag}/SHA256SUMS           # "${sha256}  ${filename}" per line
+    ${root}/${tag}/boto3-LATEST.frr
+    ${root}/${tag}/boto3-LATEST.fri
+    ...
+
+Every asset read from a mirror is verified against ``SHA256SUMS``, the
+:class:`ChecksumMismatchError` is raised when the asset is fully read, so a
+corrupted release never gets committed to the index.
+
+This module only imports the standard library and :mod:`findref.buildlock`.
+"""
+
+import typing as T
+import os
+import json
+import hashlib
+import dataclasses
+from pathlib import Path
+from urllib import request
+from urllib.error import HTTPError
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+from .buildlock import write_atomic
+
+
+SOURCE_ENV_VAR = "FINDREF_RELEASE_SOURCE"
+LATEST_FILENAME = "LATEST"
+CHECKSUM_FILENAME = "SHA256SUMS"
+GITHUB_REPO = "MacHu-GWU/findref-project"
+
+
+class AssetNotFoundError(FileNotFoundError):
+    """
+    The release doesn't have this asset.
+    """
+
+
+class ChecksumMismatchError(ValueError):
+    """
+    The asset doesn't match the checksum in the mirror, or the mirror has no
+    checksum for it.
+    """
+
+
+def parse_checksums(text: str) -> T.Dict[str, str]:
+    """
+    Parse the ``sha256sum`` output format, filename -> hex digest.
+    """
+    checksums = dict()
+    for line in text.splitlines():
+        if line.strip():
+            digest, filename = line.split(maxsplit=1)
+            checksums[filename.strip().lstrip("*")] = digest.lower()
+    return checksums
+
+
+def format_checksums(checksums: T.Dict[str, str]) -> str:
+    return "".join(
+        f"{digest}  {filename}\n" for filename, digest in sorted(checksums.items())
+    )
+
+
+class VerifyingReader:
+    """
+    Wrap a binary stream, compute the sha256 of the bytes read from it and
+    compare it with the expected one at the end of the stream.
+
+    Leaving the ``with`` block without an error reads the rest of the stream
+    and verifies it, the reader of a JSON document may stop before the end
+    of the stream.
+    """
+
+    def __init__(self, stream: T.BinaryIO, expected: str, name: str):
+        self.stream = stream
+        self.expected = expected
+        self.name = name
+        self._hash = hashlib.sha256()
+        self._verified = False
+
+    def read(self, n: int = -1) -> bytes:
+        chunk = self.stream.read(n)
+        if chunk:
+            self._hash.update(chunk)
+        elif n != 0:
+            self.verify()
+        return chunk
+
+    def verify(self):
+        if self._verified:
+            return
+        digest = self._hash.hexdigest()
+        if digest != self.expected:
+            raise ChecksumMismatchError(
+                f"checksum mismatch of {self.name}: "
+                f"expect {self.expected}, got {digest}"
+            )
+        self._verified = True
+
+    def close(self):
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type is None:
+                while self.read(1024 * 1024):
+                    pass
+        finally:
+            self.close()
+        return False
+
+
+class ReleaseSource:
+    """
+    The base class of release sources.
+    """
+
+    def get_latest_tag(self) -> str:  # pragma: no cover
+        raise NotImplementedError
+
+    def get_checksums(self, tag_name: str) -> T.Optional[T.Dict[str, str]]:
+        """
+        The checksums of the assets of the release, None if the source
+        doesn't publish checksums.
+        """
+        return None
+
+    def _open(self, tag_name: str, filename: str) -> T.BinaryIO:  # pragma: no cover
+        raise NotImplementedError
+
+    def open(self, tag_name: str, filename: str) -> T.BinaryIO:
+        """
+        Open a release asset as a binary stream, it is verified against the
+        checksum if the source publishes checksums.
+
+        :raises AssetNotFoundError: if the release doesn't have the asset.
+        """
+        checksums = self.get_checksums(tag_name)
+        stream = self._open(tag_name, filename)
+        if checksums is None:
+            return stream
+        try:
+            expected = checksums[filename]
+        except KeyError:
+            stream.close()
+            raise ChecksumMismatchError(f"no checksum for {filename} in {tag_name}")
+        return VerifyingReader(stream, expected=expected, name=filename)
+
+
+@dataclasses.dataclass
+class GitHubReleaseSource(ReleaseSource):
+    """
+    The GitHub releases of the findref project, the default source.
+    """
+
+    repo: str = dataclasses.field(default=GITHUB_REPO)
+
+    def get_latest_tag(self) -> str:
+        url = f"https://api.github.com/repos/{self.repo}/releases/latest"
+        with request.urlopen(url) as response:
+            return json.loads(response.read().decode("utf-8"))["tag_name"]
+
+    def get_asset_url(self, tag_name: str, filename: str) -> str:
+        return f"https://github.com/{self.repo}/releases/download/{tag_name}/{filename}"
+
+    def _open(self, tag_name: str, filename: str) -> T.BinaryIO:
+        try:
+            return request.urlopen(self.get_asset_url(tag_name, filename))
+        except HTTPError as e:
+            if e.code == 404:
+                raise AssetNotFoundError(filename)
+            raise
+
+
+@dataclasses.dataclass
+class MirrorReleaseSource(ReleaseSource):
+    """
+    A mirror created by ``fr mirror``, on a local directory or an HTTP server.
+
+    :param root: the local directory or the HTTP(S) base URL of the mirror.
+    """
+
+    root: str = dataclasses.field()
+
+    _checksums: T.Dict[str, T.Dict[str, str]] = dataclasses.field(
+        default_factory=dict, init=False, repr=False
+    )
+
+    @property
+    def is_http(self) -> bool:
+        return self.root.startswith(("http://", "https://"))
+
+    def _fetch(self, *parts: str) -> T.BinaryIO:
+        if self.is_http:
+            url = "/".join([self.root.rstrip("/"), *parts])
+            try:
+                return request.urlopen(url)
+            except HTTPError as e:
+                if e.code == 404:
+                    raise AssetNotFoundError(url)
+                raise
+        path = Path(self.root).joinpath(*parts)
+        try:
+            return path.open("rb")
+        except FileNotFoundError:
+            raise AssetNotFoundError(str(path))
+
+    def get_latest_tag(self) -> str:
+        with self._fetch(LATEST_FILENAME) as f:
+            return f.read().decode("utf-8").strip()
+
+    def get_checksums(self, tag_name: str) -> T.Dict[str, str]:
+        if tag_name not in self._checksums:
+            try:
+                with self._fetch(tag_name, CHECKSUM_FILENAME) as f:
+                    text = f.read().decode("utf-8")
+            except AssetNotFoundError:
+                raise ChecksumMismatchError(
+                    f"the mirror has no {CHECKSUM_FILENAME} for {tag_name}"
+                )
+            self._checksums[tag_name] = parse_checksums(text)
+        return self._checksums[tag_name]
+
+    def _open(self, tag_name: str, filename: str) -> T.BinaryIO:
+        return self._fetch(tag_name, filename)
+
+    def open(self, tag_name: str, filename: str) -> T.BinaryIO:
+        if filename not in self.get_checksums(tag_name):
+            raise AssetNotFoundError(filename)
+        return super().open(tag_name, filename)
+
+
+def get_release_source(value: T.Optional[str] = None) -> ReleaseSource:
+    """
+    Create the release source from the given value, default is the
+    ``FINDREF_RELEASE_SOURCE`` environment variable. GitHub is used if it is
+    empty.
+    """
+    if value is None:
+        value = os.environ.get(SOURCE_ENV_VAR, "")
+    value = value.strip()
+    if not value:
+        return GitHubReleaseSource()
+    if value.startswith("file://"):
+        return MirrorReleaseSource(root=url2pathname(urlparse(value).path))
+    return MirrorReleaseSource(root=value)
+
+
+def download_asset(
+    source: ReleaseSource,
+    tag_name: str,
+    filename: str,
+    path: Path,
+    chunk_size: int = 1024 * 1024,
+) -> str:
+    """
+    Download a release asset to ``path``, via a temp file next to it.
+
+    :return: the sha256 hex digest of the downloaded file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path_tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    sha256 = hashlib.sha256()
+    try:
+        with source.open(tag_name, filename) as response, open(path_tmp, "wb") as f:
+            while 1:
+                chunk = response.read(chunk_size)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                f.write(chunk)
+        os.replace(path_tmp, path)
+    finally:
+        if path_tmp.exists():
+            path_tmp.unlink()
+    return sha256.hexdigest()
+
+
+def mirror(
+    dir_root: Path,
+    datasets: T.Optional[T.Iterable[str]] = None,
+    tag_name: T.Optional[str] = None,
+    source: T.Optional[ReleaseSource] = None,
+    echo: T.Callable[[str], T.Any] = print,
+) -> str:
+    """
+    Snapshot the dataset releases into a mirror directory, it is the
+    implementation of the ``fr mirror`` command.
+
+    For each dataset, it downloads the compressed release, or the JSON
+    release if there is no compressed one, and the prebuilt index if there
+    is one. ``LATEST`` is written last, so the clients never see a half
+    written release.
+
+    :param datasets: list of dataset names, all datasets if not given.
+    :param tag_name: the release tag to mirror, the latest one if not given.
+    :param source: where to download from, default is the configured source.
+
+    :return: the mirrored release tag name.
+    """
+    from . import models
+
+    if datasets is None:
+        datasets = [dataset.value for dataset in models.DataSetEnum]
+    else:
+        datasets = [models.DataSetEnum(dataset).value for dataset in datasets]
+    if source is None:
+        source = get_release_source()
+    if tag_name is None:
+        tag_name = source.get_latest_tag()
+    dir_root = Path(dir_root)
+    dir_tag = dir_root / tag_name
+    path_checksums = dir_tag / CHECKSUM_FILENAME
+    checksums = dict()
+    if path_checksums.exists():
+        checksums = parse_checksums(path_checksums.read_text())
+
+    missing = list()
+    for dataset in datasets:
+        filenames = [
+            models.get_release_binary_filename(dataset),
+            models.get_release_json_filename(dataset),
+            models.get_release_index_filename(dataset),
+        ]
+        downloaded = list()
+        for filename in filenames:
+            # the JSON release is only needed if there is no compressed one
+            if (filename == filenames[1]) and (filenames[0] in downloaded):
+                continue
+            try:
+                digest = download_asset(source, tag_name, filename, dir_tag / filename)
+            except AssetNotFoundError:
+                continue
+            checksums[filename] = digest
+            downloaded.append(filename)
+            echo(f"  {tag_name}/{filename}")
+        if (filenames[0] not in downloaded) and (filenames[1] not in downloaded):
+            missing.append(dataset)
+
+    write_atomic(path_checksums, format_checksums(checksums))
+    write_atomic(dir_root / LATEST_FILENAME, f"{tag_name}\n")
+    if missing:
+        echo(f"no release found for: {', '.join(missing)}")
+    return tag_name
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""
+Measure the startup time of ``fr``, run ``fr --profile-startup``.
+
+It starts a fresh interpreter with ``python -X importtime`` that imports
+:mod:`findref.ui` and builds the first screen, then reports the time to the
+first screen and the slowest imported modules. The search engine modules
+(sayt, whoosh, diskcache) must not show up, they are imported on first search.
+"""
+
+import typing as T
+import sys
+import subprocess
+import dataclasses
+
+
+# the time to the first screen, in milliseconds
+STARTUP_BUDGET = 300
+
+# these modules must not be imported before the first screen
+HEAVY_MODULES = [
+    "sayt",
+    "whoosh",
+    "diskcache",
+    "fire",
+    "fuzzywuzzy",
+    "findref.models",
+    "findref.searcher",
+]
+
+_first_screen_script = """
+import time
+start = time.perf_counter()
+import findref.ui
+findref.ui.handler_for_selecting_dataset("", None)
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+@dataclasses.dataclass
+class ImportTime:
+    """
+    One line of the ``python -X importtime`` output.
+
+    :param module: the module name.
+    :param self_us: the time spent in the module itself, in microseconds.
+    :param cumulative_us: the time including its imports, in microseconds.
+    :param depth: 0 for the modules imported by the script directly.
+    """
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(text: str) -> T.List[ImportTime]:
+    """
+    Parse the ``python -X importtime`` output, the lines look like
+    ``import time:       183 |      18502 |   findref.constants``.
+    """
+    records = list()
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:  # the header line
+            continue
+        name = parts[2].rstrip()
+        module = name.lstrip()
+        records.append(
+            ImportTime(
+                module=module,
+                self_us=self_us,
+                cumulative_us=cumulative_us,
+                depth=(len(name) - len(module) - 1) // 2,
+            )
+        )
+    return records
+
+
+def is_heavy(module: str) -> bool:
+    return any(
+        (module == heavy) or module.startswith(f"{heavy}.") for heavy in HEAVY_MODULES
+    )
+
+
+@dataclasses.dataclass
+class StartupProfile:
+    """
+    :param first_screen: the time to import the UI and build the first screen,
+        in milliseconds.
+    :param imports: the imported modules.
+    """
+
+    first_screen: float
+    imports: T.List[ImportTime]
+
+    @property
+    def heavy_modules(self) -> T.List[str]:
+        return [record.module for record in self.imports if is_heavy(record.module)]
+
+    @property
+    def is_within_budget(self) -> bool:
+        return (self.first_screen <= STARTUP_BUDGET) and (len(self.heavy_modules) == 0)
+
+    def top(self, n: int = 20) -> T.List[ImportTime]:
+        """
+        The ``n`` slowest modules by their own import time.
+        """
+        return sorted(self.imports, key=lambda record: -record.self_us)[:n]
+
+
+def profile_startup(python: T.Optional[str] = None) -> StartupProfile:
+    """
+    Run the first screen in a fresh interpreter and collect the import times.
+    """
+    res = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", _first_screen_script],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return StartupProfile(
+        first_screen=float(res.stdout.strip().splitlines()[-1]),
+        imports=parse_importtime(res.stderr),
+    )
+
+
+def report(profile: StartupProfile, n: int = 20) -> str:
+    lines = [
+        f"time to first screen: {profile.first_screen:.1f} ms "
+        f"(budget {STARTUP_BUDGET} ms)",
+        f"{'self (ms)':>10} {'cumulative (ms)':>16}  module",
+    ]
+    for record in profile.top(n):
+        lines.append(
+            f"{record.self_us / 1000:>10.1f} {record.cumulative_us / 1000:>16.1f}  "
+            f"{'  ' * record.depth}{record.module}"
+        )
+    heavy_modules = profile.heavy_modules
+    if heavy_modules:
+        lines.append(
+            f"search engine modules imported before the first screen: "
+            f"{', '.join(heavy_modules)}"
+        )
+    return "\n".join(lines)
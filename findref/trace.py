@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+"""
+Lightweight tracing of the search hot path.
+
+Set the ``FINDREF_TRACE`` environment variable to enable it:
+
+- ``FINDREF_TRACE=1``: collect the timings, the UI shows the stage timings
+  of the last query below the results.
+- ``FINDREF_TRACE=/path/to/trace.json``: also export the collected data to
+  this file when ``fr`` exits.
+
+It collects:
+
+- per stage timers: count, total and max time of each :meth:`Tracer.span`,
+  for example ``preprocess``, ``search``, ``from_dict`` and ``items``.
+- counters: :meth:`Tracer.incr`, for example result cache hits and misses.
+- a ring buffer of the stage timings of the recent queries.
+
+When it is disabled, :meth:`Tracer.span` returns a shared no-op context
+manager and :meth:`Tracer.incr` returns immediately, the cost is one
+attribute lookup. This module only imports the standard library.
+"""
+
+import typing as T
+import os
+import json
+import time
+import threading
+import dataclasses
+from pathlib import Path
+from collections import deque
+
+
+TRACE_ENV_VAR = "FINDREF_TRACE"
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_noop_span = _NoopSpan()
+
+
+@dataclasses.dataclass
+class StageStats:
+    """
+    The timer of one stage.
+
+    :param count: number of times the stage ran.
+    :param total: total seconds spent in the stage.
+    :param max: the slowest run in seconds.
+    """
+
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return (self.total / self.count) if self.count else 0.0
+
+    def add(self, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+
+@dataclasses.dataclass
+class QueryTrace:
+    """
+    The stage timings of one query.
+
+    :param dataset: the dataset name.
+    :param query: the raw query.
+    :param started_at: the start time in epoch seconds.
+    :param stages: stage name -> seconds, the same stage running many times
+        in one query is summed.
+    :param total: the total seconds of the query.
+    """
+
+    dataset: str
+    query: str
+    started_at: float = dataclasses.field(default_factory=time.time)
+    stages: T.Dict[str, float] = dataclasses.field(default_factory=dict)
+    total: float = 0.0
+
+    def summary(self) -> str:
+        parts = [
+            f"{name} {elapsed * 1000:.1f}ms" for name, elapsed in self.stages.items()
+        ]
+        parts.append(f"total {self.total * 1000:.1f}ms")
+        return " | ".join(parts)
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer: "Tracer", name: str):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.tracer._record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _QuerySpan:
+    __slots__ = ("tracer", "trace", "start")
+
+    def __init__(self, tracer: "Tracer", trace: QueryTrace):
+        self.tracer = tracer
+        self.trace = trace
+
+    def __enter__(self) -> QueryTrace:
+        self.tracer._local.trace = self.trace
+        self.start = time.perf_counter()
+        return self.trace
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.trace.total = time.perf_counter() - self.start
+        self.tracer._local.trace = None
+        with self.tracer._lock:
+            self.tracer.recent.append(self.trace)
+        return False
+
+
+class Tracer:
+    """
+    Collect the stage timers, counters and recent query timings.
+
+    :param enabled: collect nothing if False.
+    :param path_export: export the collected data to this JSON file in
+        :meth:`export`, if given.
+    :param ring_size: the number of recent queries to keep.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        path_export: T.Optional[Path] = None,
+        ring_size: int = 100,
+    ):
+        self.enabled = enabled
+        self.path_export = path_export
+        self.stages: T.Dict[str, StageStats] = dict()
+        self.counters: T.Dict[str, int] = dict()
+        self.recent: T.Deque[QueryTrace] = deque(maxlen=ring_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls, environ: T.Mapping[str, str] = os.environ) -> "Tracer":
+        """
+        Create the tracer from the ``FINDREF_TRACE`` environment variable.
+        """
+        value = environ.get(TRACE_ENV_VAR, "").strip()
+        if value.lower() in ("", "0", "false", "no"):
+            return cls(enabled=False)
+        if value.lower() in ("1", "true", "yes"):
+            return cls(enabled=True)
+        return cls(enabled=True, path_export=Path(value))
+
+    def span(self, name: str) -> T.ContextManager:
+        """
+        Time the ``with`` block as the given stage.
+        """
+        if self.enabled is False:
+            return _noop_span
+        return _Span(self, name)
+
+    def query(self, dataset: str, query: str) -> T.ContextManager:
+        """
+        Time the ``with`` block as one query, the stages timed in the block
+        in the same thread are recorded in the :class:`QueryTrace` too.
+        """
+        if self.enabled is False:
+            return _noop_span
+        return _QuerySpan(self, QueryTrace(dataset=dataset, query=query))
+
+    def incr(self, name: str, n: int = 1):
+        if self.enabled is False:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def _record(self, name: str, elapsed: float):
+        with self._lock:
+            try:
+                stats = self.stages[name]
+            except KeyError:
+                stats = self.stages[name] = StageStats()
+            stats.add(elapsed)
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace.stages[name] = trace.stages.get(name, 0.0) + elapsed
+
+    @property
+    def last(self) -> T.Optional[QueryTrace]:
+        """
+        The most recent finished query.
+        """
+        with self._lock:
+            return self.recent[-1] if self.recent else None
+
+    def snapshot(self) -> T.Dict[str, T.Any]:
+        """
+        The collected data as a JSON serializable dict.
+        """
+        with self._lock:
+            return {
+                "stages": {
+                    name: {**dataclasses.asdict(stats), "mean": stats.mean}
+                    for name, stats in self.stages.items()
+                },
+                "counters": dict(self.counters),
+                "recent": [dataclasses.asdict(trace) for trace in self.recent],
+            }
+
+    def export(self, path: T.Optional[Path] = None) -> T.Optional[Path]:
+        """
+        Write :meth:`snapshot` to the JSON file, default is :attr:`path_export`.
+        """
+        path = path or self.path_export
+        if (self.enabled is False) or (path is None):
+            return None
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.snapshot(), indent=4))
+        return path
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+            self.recent.clear()
+
+
+tracer = Tracer.from_env()
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+"""
+Typo tolerance by dictionary lookup.
+
+The UI appends ``~1`` to every query word, whoosh then enumerates all terms
+within edit distance 1 of the word in the term dictionary of every field on
+every keystroke. Instead, we build a symmetric deletion (SymSpell) dictionary
+of the words in the text and keyword fields when the index is built, and
+store it next to the index. A word ``w~1`` in the query is rewritten into
+``(w OR c1 OR c2 ...)``, where ``c1, c2`` are the words in the dictionary
+within edit distance 1 of ``w``, which is a few dict lookups.
+
+Symmetric deletion: two words are within edit distance 1 (insertion, deletion,
+substitution or adjacent transposition) only if they are equal, or one of
+them equals the other with one character deleted, or they are equal after
+deleting one character from each. So we map each word and each of its one
+character deletions to the word, and look up the query word and its one
+character deletions in the same way.
+"""
+
+import typing as T
+import re
+import json
+import dataclasses
+from pathlib import Path
+
+import sayt.api as sayt
+
+
+TYPO_DICTIONARY_FORMAT_VERSION = 1
+
+_fuzzy_word_pattern = re.compile(r"^(\w+)~1$", re.UNICODE)
+
+
+def iter_deletes(word: str) -> T.Iterable[str]:
+    """
+    Yield the word with one character deleted at each position.
+    """
+    for i in range(len(word)):
+        yield word[:i] + word[i + 1 :]
+
+
+def is_within_one_edit(a: str, b: str) -> bool:
+    """
+    Return True if the optimal string alignment distance of two words is at
+    most 1, that is, one insertion, deletion, substitution or transposition
+    of two adjacent characters.
+    """
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    i = 0
+    while (i < la) and (a[i] == b[i]):
+        i += 1
+    if la == lb:
+        # substitution or transposition
+        if a[i + 1 :] == b[i + 1 :]:
+            return True
+        return (
+            (i + 1 < la)
+            and (a[i] == b[i + 1])
+            and (a[i + 1] == b[i])
+            and (a[i + 2 :] == b[i + 2 :])
+        )
+    # insertion
+    return a[i:] == b[i + 1 :]
+
+
+def get_vocabulary_fields(fields: T.List[sayt.T_Field]) -> T.List[str]:
+    """
+    The fields whose terms are whole words, n-gram fields are excluded.
+    """
+    return [
+        field.name
+        for field in fields
+        if isinstance(field, (sayt.TextField, sayt.KeywordField))
+    ]
+
+
+@dataclasses.dataclass
+class TypoDictionary:
+    """
+    Symmetric deletion dictionary.
+
+    :param words: the vocabulary, sorted.
+    :param deletes: the word or its one character deletion -> the indexes of
+        the words in :attr:`words`.
+    :param min_length: shorter words only match themselves, one edit on a
+        two-letter word is a different word, not a typo.
+    :param fields: the fields the vocabulary comes from, the corrected words
+        are only searched in these fields.
+    """
+
+    words: T.List[str] = dataclasses.field(default_factory=list)
+    deletes: T.Dict[str, T.List[int]] = dataclasses.field(default_factory=dict)
+    min_length: int = 3
+    fields: T.List[str] = dataclasses.field(default_factory=list)
+
+    @classmethod
+    def build(
+        cls,
+        words: T.Iterable[str],
+        min_length: int = 3,
+        fields: T.Optional[T.List[str]] = None,
+    ) -> "TypoDictionary":
+        words = sorted({word.lower() for word in words if len(word) >= min_length})
+        deletes = dict()
+        for i, word in enumerate(words):
+            for key in [word, *iter_deletes(word)]:
+                ids = deletes.setdefault(key, [])
+                if (not ids) or (ids[-1] != i):
+                    ids.append(i)
+        return cls(
+            words=words,
+            deletes=deletes,
+            min_length=min_length,
+            fields=list(fields or []),
+        )
+
+    @classmethod
+    def from_index(
+        cls,
+        index,
+        fields: T.List[sayt.T_Field],
+        min_length: int = 3,
+    ) -> "TypoDictionary":
+        """
+        Build the dictionary from the terms of the text and keyword fields of
+        a whoosh index.
+        """
+        field_names = get_vocabulary_fields(fields)
+        field_set = set(field_names)
+        with index.reader() as reader:
+            words = [
+                term.decode("utf-8") if isinstance(term, bytes) else term
+                for fieldname, term in reader.all_terms()
+                if fieldname in field_set
+            ]
+        return cls.build(words, min_length=min_length, fields=field_names)
+
+    def lookup(self, word: str) -> T.List[str]:
+        """
+        Return the words in the dictionary within edit distance 1 of the
+        given word, including itself if it is in the dictionary.
+        """
+        word = word.lower()
+        if len(word) < self.min_length:
+            return []
+        ids = set()
+        for key in [word, *iter_deletes(word)]:
+            ids.update(self.deletes.get(key, ()))
+        return [
+            self.words[i]
+            for i in sorted(ids)
+            if is_within_one_edit(word, self.words[i])
+        ]
+
+    def expand_query(self, query: str) -> str:
+        """
+        Rewrite each ``word~1`` in the query into
+        ``(word OR f1:c1 OR f2:c1 OR f1:c2 ...)``, the word itself is searched
+        in all fields, the corrected words ``c1, c2`` are only searched in the
+        vocabulary fields ``f1, f2``. Words shorter than :attr:`min_length`
+        only match themselves. Other terms, for example ``word~2`` or
+        ``wo*d~1``, are kept as they are.
+        """
+        parts = list()
+        for part in query.split():
+            match = _fuzzy_word_pattern.match(part)
+            if match is None:
+                parts.append(part)
+                continue
+            word = match.group(1).lower()
+            candidates = [c for c in self.lookup(word) if c != word]
+            if candidates and self.fields:
+                terms = [f"{field}:{c}" for c in candidates for field in self.fields]
+                parts.append("(" + " OR ".join([word, *terms]) + ")")
+            else:
+                parts.append(word)
+        return " ".join(parts)
+
+    def dump(self, path: Path, metadata: T.Optional[T.Dict[str, T.Any]] = None):
+        """
+        Write the dictionary to a JSON file.
+        """
+        data = {
+            "version": TYPO_DICTIONARY_FORMAT_VERSION,
+            "metadata": metadata or {},
+            "min_length": self.min_length,
+            "fields": self.fields,
+            "words": self.words,
+            "deletes": self.deletes,
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path_tmp = path.with_name(f"{path.name}.tmp")
+        path_tmp.write_text(json.dumps(data, separators=(",", ":")))
+        path_tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> T.Tuple["TypoDictionary", T.Dict[str, T.Any]]:
+        """
+        Read the dictionary and its metadata from a JSON file.
+
+        :raises ValueError: if the file is not a supported typo dictionary.
+        """
+        data = json.loads(path.read_text())
+        if data.get("version") != TYPO_DICTIONARY_FORMAT_VERSION:
+            raise ValueError(f"unsupported typo dictionary {path}")
+        dictionary = cls(
+            words=data["words"],
+            deletes=data["deletes"],
+            min_length=data["min_length"],
+            fields=data["fields"],
+        )
+        return dictionary, data["metadata"]
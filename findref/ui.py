@@ -5,22 +5,48 @@ This module implements the terminal UI.
 """
 
 import typing as T
-import warnings
+import time
+import queue
+import atexit
+import functools
+import threading
 import dataclasses
 
-import sayt.api as sayt
 import zelfred.api as zf
-
-with warnings.catch_warnings():
-    warnings.simplefilter("ignore")
-    from fuzzywuzzy.process import extract
-
-from . import models
-from .paths import dir_index, dir_cache
-
-
-dataset_list = [ds.value for ds in models.DataSetEnum]
+from zelfred import events
+
+from . import router
+from .constants import DataSetEnum
+from .lru import LRUCache
+from .trace import tracer
+from .dispatch import dispatcher
+from .query import preprocess_query
+from .daemon import (
+    DaemonClient,
+    DaemonError,
+    DaemonNotRunningError,
+    get_client,
+    render_item,
+    render_federated_item,
+)
+
+# the search engine modules (sayt, whoosh, diskcache) are imported on first
+# search, so the dataset list shows up without waiting for them
+if T.TYPE_CHECKING:  # pragma: no cover
+    from .searcher import WarmDataSet
+    from .builder import IndexBuild
+    from .federated import FederatedResult
+    from .models import BaseDocument
+    from .records import RecordStore
+
+
+dataset_list = [ds.value for ds in DataSetEnum]
 dataset_set = set(dataset_list)
+# "all ${query}" searches all datasets at once
+FEDERATED_KEYWORD = "all"
+
+# (dataset, preprocessed query, limit) -> (dataset object, list of items)
+result_cache = LRUCache(maxsize=256)
 
 
 @dataclasses.dataclass
@@ -42,6 +68,16 @@ class DataSetItem(zf.Item):
             for dataset in dataset_list
         ]
 
+    @classmethod
+    def federated(cls):
+        return DataSetItem(
+            uid=FEDERATED_KEYWORD,
+            title=f"🔍 {FEDERATED_KEYWORD!r} datasets",
+            subtitle="Hit 'Tab' to search all indexed datasets at once.",
+            arg=FEDERATED_KEYWORD,
+            autocomplete=f"{FEDERATED_KEYWORD} ",
+        )
+
 
 @dataclasses.dataclass
 class UrlItem(zf.Item):
@@ -69,81 +105,339 @@ def handler_for_selecting_dataset(query: str, ui: zf.UI):
     This handler take the query for selecting the dataset to search.
     """
     if query:
-        result = extract(query, dataset_list, limit=len(dataset_list))
-        return DataSetItem.from_dataset_list([dataset for dataset, _ in result])
+        return DataSetItem.from_dataset_list(router.rank_datasets(query))
     else:
-        return DataSetItem.from_dataset_list(dataset_list)
+        items = DataSetItem.from_dataset_list(dataset_list)
+        items.append(DataSetItem.federated())
+        return items
 
 
 def search(
     dataset: str,
-    ds: sayt.DataSet,
+    ds: "WarmDataSet",
     query: str,
     refresh_data: bool = False,
     limit: int = 50,
 ) -> T.List[UrlItem]:
     """
     Search the given dataset and returns the item objects for UI.
+
+    The items are cached in :data:`result_cache`. The registry swaps in a new
+    dataset object after the index is refreshed, so the items cached with
+    the old dataset object are ignored.
     """
-    dct_list = ds.search(
-        query=query,
-        limit=limit,
-        simple_response=True,
-        refresh_data=refresh_data,
-        verbose=False,
-    )
+    key = (dataset, query, limit)
+    if refresh_data:
+        result_cache.invalidate(dataset)
+    else:
+        cached = result_cache.get(key)
+        if (cached is not None) and (cached[0] is ds):
+            tracer.incr("result_cache.hit")
+            return cached[1]
+    tracer.incr("result_cache.miss")
+    dispatcher.check()
+    with tracer.span("search"):
+        # narrow the previous result while the user keeps typing
+        if (refresh_data is False) and ds.is_fresh():
+            store, doc_ids = ds.incremental.search_ids(query=query, limit=limit)
+            dct_list = None
+        else:
+            dct_list = ds.search(
+                query=query,
+                limit=limit,
+                simple_response=True,
+                refresh_data=refresh_data,
+                verbose=False,
+            )
+    # the user typed on while searching, skip building the items
+    dispatcher.check()
+    if dct_list is None:
+        items = to_url_items_from_records(dataset, store, doc_ids)
+    else:
+        items = to_url_items(dataset, dct_list)
+    result_cache.put(key, (ds, items))
+    return items
+
+
+def to_url_items(
+    dataset: str,
+    dct_list: T.List[T.Dict[str, T.Any]],
+) -> T.List[UrlItem]:
+    """
+    Convert the search result documents into the item objects for UI.
+    """
+    from . import models
+
     doc_class = models.get_doc_class(dataset)
-    doc_list = [doc_class.from_dict(dct) for dct in dct_list]
+    with tracer.span("from_dict"):
+        doc_list = [doc_class.from_dict(dct) for dct in dct_list]
+    return to_url_items_from_docs(dataset, doc_list)
+
+
+def to_url_items_from_records(
+    dataset: str,
+    store: "RecordStore",
+    doc_ids: T.List[int],
+) -> T.List[UrlItem]:
+    """
+    Convert the doc ids of the search result into the item objects for UI,
+    the documents are read from the record store, see :mod:`findref.records`.
+    """
+    from . import models
+
+    doc_class = models.get_doc_class(dataset)
+    with tracer.span("rows"):
+        doc_list = store.rows(doc_class, doc_ids)
+    return to_url_items_from_docs(dataset, doc_list)
+
+
+def to_url_items_from_docs(
+    dataset: str,
+    doc_list: T.List["BaseDocument"],
+) -> T.List[UrlItem]:
+    with tracer.span("items"):
+        return [UrlItem(**render_item(dataset, doc)) for doc in doc_list]
+
+
+def to_url_items_from_fields(fields_list: T.List[T.Dict[str, str]]) -> T.List[UrlItem]:
+    """
+    Convert the display fields rendered by the daemon into the item objects
+    for UI, see :func:`findref.daemon.render_item`.
+    """
+    return [UrlItem(**fields) for fields in fields_list]
+
+
+def to_federated_url_items(result: "FederatedResult") -> T.List[zf.Item]:
+    """
+    Convert the merged result of a federated search into the item objects for
+    UI, the subtitle is tagged with the source dataset.
+    """
+    from . import models
+
+    items = list()
+    for hit in result.hits:
+        doc = models.get_doc_class(hit.dataset).from_dict(hit.doc)
+        items.append(UrlItem(**render_federated_item(hit.dataset, doc)))
+    skipped = result.not_indexed + result.timed_out + list(result.failed)
+    items.extend(federated_skipped_items(skipped))
+    return items
+
+
+def federated_skipped_items(skipped: T.List[str]) -> T.List[zf.Item]:
+    if skipped:
+        return [
+            zf.Item(
+                uid="uid-federated-skipped",
+                title=f"Results from {', '.join(skipped)} are not included",
+                subtitle="not indexed, too slow or failed, run 'fr warmup' first",
+            )
+        ]
+    return []
+
+
+def indexing_items(
+    build: "IndexBuild",
+    has_index: bool,
+) -> T.List[zf.Item]:  # pragma: no cover
+    if has_index:
+        subtitle = "keep typing, results below are from the previous index"
+    else:
+        subtitle = "it may takes 5-30 seconds, results show up when it is ready"
+    if build.is_waiting:
+        title = f"{build.progress.capitalize()} to create the index ..."
+    else:
+        title = f"Creating index in background, {build.progress} indexed ..."
     return [
-        UrlItem(
-            uid=doc.uid,
-            title=doc.title,
-            subtitle=doc.subtitle,
-            arg=doc.arg,
-            autocomplete=f"{dataset} {doc.autocomplete}",
+        zf.Item(
+            uid="uid-indexing",
+            title=title,
+            subtitle=subtitle,
         )
-        for doc in doc_list
     ]
 
 
-def creating_index_items() -> T.List[zf.Item]:  # pragma: no cover
+def index_failed_items(build: "IndexBuild") -> T.List[zf.Item]:  # pragma: no cover
     return [
         zf.Item(
-            uid="uid",
-            title="Creating index, it may takes 5-30 seconds ...",
-            subtitle="please wait, don't press any key",
+            uid="uid-index-failed",
+            title=f"Failed to create index for {build.dataset!r} dataset",
+            subtitle=f"{build.error!r}, append '!~' to your query to retry",
         )
     ]
 
 
-def preprocess_query(query: T.Optional[str]) -> str:
+class UIEventQueue:
+    """
+    The event generator of the UI input loop, it yields the key presses and
+    the repaint requests of the background threads. A repaint is a
+    :class:`zelfred.events.RepaintEvent`, the loop runs the handler and
+    redraws the UI for it like for a key press, so only the loop thread
+    draws on the terminal.
+
+    The keys are read in a background thread, one key per :meth:`next` call
+    that waits for one, so no key is read after the loop exits.
+
+    :param key_events: where to read the keys, default is the keyboard.
     """
-    Preprocess query, automatically add fuzzy search term if applicable.
+
+    def __init__(self, key_events: T.Optional[events.KeyEventGenerator] = None):
+        self.key_events = key_events or events.KeyEventGenerator()
+        self._events: queue.Queue = queue.Queue()
+        self._read_key = threading.Event()
+        self._reading = False
+        self._repaint_posted = False
+        self._lock = threading.Lock()
+        self._thread: T.Optional[threading.Thread] = None
+
+    def _read_keys(self):
+        while 1:
+            self._read_key.wait()
+            self._read_key.clear()
+            try:
+                event = self.key_events.next()
+            except BaseException as e:
+                # e.g. KeyboardInterrupt, raise it in the loop thread
+                event = e
+            self._events.put(event)
+
+    def next(self) -> events.Event:
+        """
+        Wait for the next key press or repaint request.
+        """
+        if self._reading is False:
+            self._reading = True
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._read_keys,
+                    name="findref-keys",
+                    daemon=True,
+                )
+                self._thread.start()
+            self._read_key.set()
+        event = self._events.get()
+        if isinstance(event, events.RepaintEvent):
+            with self._lock:
+                self._repaint_posted = False
+            return event
+        self._reading = False
+        if isinstance(event, BaseException):
+            raise event
+        return event
+
+    def post_repaint(self):
+        """
+        Ask the loop to repaint the UI, it is safe to call from any thread.
+        The requests posted before the loop takes one are merged.
+        """
+        with self._lock:
+            if self._repaint_posted:
+                return
+            self._repaint_posted = True
+        self._events.put(events.RepaintEvent())
+
+
+def post_repaint(ui: zf.UI):  # pragma: no cover
     """
-    delimiter = ".-_@+"
-    if query:
-        for char in delimiter:
-            query = query.replace(char, " ")
-        words = list()
-        for word in query.split():
-            if word.strip():
-                word = word.strip()
-                if len(word) == 1:
-                    if word == "*":
-                        words.append(word)
-                else:
-                    try:
-                        if word[-2] != "~":
-                            word = f"{word}~1"
-                    except IndexError:
-                        word = f"{word}~1"
-                    words.append(word)
-        if words:
-            return " ".join(words)
-        else:
-            return "*"
-    else:
-        return "*"
+    Ask the UI loop to re-run the handler with the current query and redraw
+    the UI, see :class:`UIEventQueue`. It is called from the background build
+    thread and the dispatcher worker thread, so the progress and the new
+    results show up without waiting for the next keystroke.
+    """
+    if isinstance(ui.event_generator, UIEventQueue):
+        ui.event_generator.post_repaint()
+
+
+def start_building_index(
+    dataset: str,
+    ui: zf.UI,
+    repaint_interval: float = 0.5,
+) -> "IndexBuild":  # pragma: no cover
+    """
+    Build the index in background, repaint the UI to show the progress at
+    most once every ``repaint_interval`` seconds, and once more when it is done.
+    """
+    from .builder import builder
+
+    last_repaint_time = [0.0]
+
+    def on_progress(build: "IndexBuild"):
+        now = time.time()
+        if (now - last_repaint_time[0]) >= repaint_interval:
+            last_repaint_time[0] = now
+            post_repaint(ui)
+
+    def on_done(build: "IndexBuild"):
+        result_cache.invalidate(dataset)
+        post_repaint(ui)
+
+    return builder.start(dataset, on_progress=on_progress, on_done=on_done)
+
+
+@functools.lru_cache(maxsize=1)
+def get_daemon_client() -> T.Optional[DaemonClient]:
+    """
+    The client of the findref daemon if it is running when the UI starts,
+    otherwise None and the UI searches the index in this process.
+    """
+    return get_client()
+
+
+def drop_daemon_client(client: DaemonClient):  # pragma: no cover
+    """
+    Close the connection to the daemon that is gone, so the socket is not
+    leaked, the next keystroke checks whether a daemon is running again.
+    """
+    client.close()
+    get_daemon_client.cache_clear()
+
+
+def daemon_error_items(error: DaemonError) -> T.List[zf.Item]:  # pragma: no cover
+    """
+    The daemon is running but failed to handle the request, for example the
+    query can't be parsed or it didn't respond in time.
+    """
+    return [
+        zf.Item(
+            uid="uid-daemon-error",
+            title="findref daemon failed to handle the query",
+            subtitle=str(error),
+        )
+    ]
+
+
+def search_with_daemon(
+    client: DaemonClient,
+    dataset: str,
+    query: str,
+    refresh_data: bool = False,
+    limit: int = 50,
+) -> T.List[zf.Item]:
+    """
+    Search the given dataset with the findref daemon, it builds the index in
+    background if needed, the UI shows the progress on the next keystroke.
+    """
+    if refresh_data:
+        client.refresh(dataset)
+    res = client.search(dataset=dataset, query=query, limit=limit)
+    items = list()
+    if res["error"] is not None:
+        items.append(
+            zf.Item(
+                uid="uid-index-failed",
+                title=f"Failed to create index for {dataset!r} dataset",
+                subtitle=f"{res['error']}, append '!~' to your query to retry",
+            )
+        )
+    elif res["indexing"]:
+        items.append(
+            zf.Item(
+                uid="uid-indexing",
+                title=f"Creating index in daemon, {res['progress']} indexed ...",
+                subtitle="keep typing to see the progress",
+            )
+        )
+    items.extend(to_url_items_from_fields(res["items"]))
+    return items
 
 
 def handler_for_searching_reference(
@@ -156,48 +450,199 @@ def handler_for_searching_reference(
     """
     This handler search the reference url using the given dataset and query.
     """
-    ds = models.create_sayt_dataset(
-        dataset=dataset,
-        dir_index=dir_index,
-        dir_cache=dir_cache,
-    )
+    client = None if _test else get_daemon_client()
+    if client is not None:
+        refresh_data = query.strip().endswith("!~")
+        if refresh_data:
+            ui.line_editor.press_backspace(n=2)
+            query = query.strip()[:-2]
+        try:
+            with tracer.span("daemon"):
+                return search_with_daemon(
+                    client, dataset, query, refresh_data=refresh_data, limit=limit
+                )
+        except DaemonNotRunningError:
+            # the daemon is gone, fall back to search in this process
+            drop_daemon_client(client)
+        except DaemonError as e:
+            return daemon_error_items(e)
+
+    from .registry import registry
+    from .builder import builder
+
+    ds = registry.get(dataset)
 
     # preprocess query, automatically add fuzzy search term
-    new_query = preprocess_query(query)
+    with tracer.span("preprocess"):
+        new_query = preprocess_query(query)
     # print(f"new_query = {new_query!r}")
     if _test:
         return search(dataset=dataset, ds=ds, query=new_query, limit=limit)
 
-    # display "creating index ..." message
-    if ds.cache_key not in ds.cache:
-        ui.run_handler(items=creating_index_items())
-        ui.move_to_end()
-        ui.clear_items()
-        ui.clear_query()
-        ui.print_query()
-        ui.print_items()
+    build = builder.get(dataset)
+    # manually refresh data, the index is rebuilt in background
+    if query.strip().endswith("!~"):
+        ui.line_editor.press_backspace(n=2)
+        new_query = preprocess_query(query.strip()[:-2])
+        build = start_building_index(dataset, ui)
+    # first use, or the dataset is expired. don't retry automatically if the
+    # last build failed, user can use "!~" to retry
+    elif (ds.is_fresh() is False) and ((build is None) or build.is_succeeded):
+        build = start_building_index(dataset, ui)
+
+    if build is not None:
+        if build.is_running:
+            has_index = ds.has_index()
+            items = indexing_items(build, has_index=has_index)
+            # the old index keeps serving queries until the new one is ready
+            if has_index:
+                store, doc_ids = ds.search_ids(query=new_query, limit=limit)
+                items.extend(to_url_items_from_records(dataset, store, doc_ids))
+            return items
+        if build.is_failed:
+            return index_failed_items(build)
 
-        return search(dataset=dataset, ds=ds, query=new_query, limit=limit)
+    return search(dataset=dataset, ds=ds, query=new_query, limit=limit)
 
-    # manually refresh data
-    if query.strip().endswith("!~"):
-        ui.run_handler(items=creating_index_items())
-        ui.move_to_end()
-        ui.clear_items()
-        ui.clear_query()
-        ui.print_query()
-        ui.print_items()
 
-        ui.line_editor.press_backspace(n=2)
-        return search(
-            dataset=dataset,
-            ds=ds,
-            query=query.strip()[:-2],
-            refresh_data=True,
-            limit=limit,
+def handler_for_federated_search(
+    query: str,
+    ui: zf.UI,
+    limit: int = 50,
+    timeout: float = 0.5,
+):
+    """
+    This handler search all datasets that already have an index at once.
+    """
+    client = get_daemon_client()
+    if client is not None:
+        try:
+            res = client.federated(query=query, limit=limit, timeout=timeout)
+        except DaemonNotRunningError:
+            drop_daemon_client(client)
+        except DaemonError as e:
+            return daemon_error_items(e)
+        else:
+            items = to_url_items_from_fields(res["items"])
+            skipped = res["not_indexed"] + res["timed_out"] + list(res["failed"])
+            items.extend(federated_skipped_items(skipped))
+            return items
+
+    from .registry import registry
+    from .federated import federated_search
+
+    result = federated_search(
+        query=preprocess_query(query),
+        limit=limit,
+        timeout=timeout,
+        registry=registry,
+    )
+    return to_federated_url_items(result)
+
+
+def trace_items() -> T.List[zf.Item]:
+    """
+    The debug item with the stage timings of the last query, only when
+    tracing is enabled.
+    """
+    trace = tracer.last
+    if trace is None:
+        return []
+    return [
+        zf.Item(
+            uid="uid-trace",
+            title=f"⏱ {trace.total * 1000:.1f}ms for {trace.query!r} in {trace.dataset}",
+            subtitle=trace.summary(),
         )
+    ]
 
-    return search(dataset=dataset, ds=ds, query=new_query, limit=limit)
+
+def traced_handler_for_searching_reference(
+    dataset: str,
+    query: str,
+    ui: zf.UI,
+):  # pragma: no cover
+    """
+    :func:`handler_for_searching_reference` with the query traced, the stage
+    timings are shown below the results if tracing is enabled.
+    """
+    if tracer.enabled is False:
+        return handler_for_searching_reference(dataset, query, ui)
+    with tracer.query(dataset, query):
+        items = handler_for_searching_reference(dataset, query, ui)
+    return list(items) + trace_items()
+
+
+def searching_items(dataset: str, query: str) -> T.List[zf.Item]:
+    return [
+        zf.Item(
+            uid="uid-searching",
+            title=f"Searching {query!r} in {dataset} ...",
+            subtitle="results show up when it is done",
+        )
+    ]
+
+
+def dispatched_handler_for_searching_reference(
+    dataset: str,
+    query: str,
+    ui: zf.UI,
+):  # pragma: no cover
+    """
+    Run :func:`traced_handler_for_searching_reference` in the dispatcher
+    worker thread, so the input loop never waits for the search.
+
+    The first call for a query submits it and returns the previous results,
+    the worker posts a repaint to the input loop when the newest query is
+    done, and the repaint calls this handler again to take the results.
+    """
+    # "!~" edits the line editor, it has to run in the input loop
+    if query.strip().endswith("!~"):
+        dispatcher.cancel()
+        return traced_handler_for_searching_reference(dataset, query, ui)
+    return dispatch(
+        key=(dataset, query),
+        func=lambda: traced_handler_for_searching_reference(dataset, query, ui),
+        ui=ui,
+        pending_items=lambda: searching_items(dataset, query),
+    )
+
+
+def dispatched_handler_for_federated_search(
+    query: str,
+    ui: zf.UI,
+):  # pragma: no cover
+    """
+    Run :func:`handler_for_federated_search` in the dispatcher worker thread,
+    it may take up to its timeout, see
+    :func:`dispatched_handler_for_searching_reference`.
+    """
+    return dispatch(
+        key=(FEDERATED_KEYWORD, query),
+        func=lambda: handler_for_federated_search(query, ui),
+        ui=ui,
+        pending_items=lambda: searching_items(f"{FEDERATED_KEYWORD} datasets", query),
+    )
+
+
+def dispatch(
+    key: T.Hashable,
+    func: T.Callable[[], T.List[zf.Item]],
+    ui: zf.UI,
+    pending_items: T.Callable[[], T.List[zf.Item]],
+) -> T.List[zf.Item]:  # pragma: no cover
+    """
+    Take the items of the query if the dispatcher worker is done with it,
+    otherwise submit it and return the previous items, the worker posts a
+    repaint to the input loop when the newest query is done.
+    """
+    found, items = dispatcher.take(key)
+    if found:
+        return items
+    dispatcher.submit(key, func, on_done=lambda: post_repaint(ui))
+    if dispatcher.last is None:
+        return pending_items()
+    return dispatcher.last
 
 
 def handler(query: str, ui: zf.UI):  # pragma: no cover
@@ -209,21 +654,56 @@ def handler(query: str, ui: zf.UI):  # pragma: no cover
     # - ""
     # - "  "
     if not q.trimmed_parts:
+        dispatcher.cancel()
         return handler_for_selecting_dataset("", ui)
     # example
     # - "${dataset}${space}"
     # - "boto3 "
     # - "boto3 s3 bucket"
-    elif (q.trimmed_parts[0] in dataset_set) and (len(q.parts) > 1):
-        dataset = q.trimmed_parts[0]
+    # - "cfn bucket", alias of a dataset
+    elif (router.resolve(q.trimmed_parts[0]) is not None) and (len(q.parts) > 1):
+        dataset = router.resolve(q.trimmed_parts[0])
+        new_query = " ".join(q.parts[1:])
+        return dispatched_handler_for_searching_reference(dataset, new_query, ui)
+    # example
+    # - "all s3 bucket"
+    elif (q.trimmed_parts[0] == FEDERATED_KEYWORD) and (len(q.parts) > 1):
         new_query = " ".join(q.parts[1:])
-        return handler_for_searching_reference(dataset, new_query, ui)
+        return dispatched_handler_for_federated_search(new_query, ui)
+    # example
+    # - "s3 boto3"
+    # - "put object boto3"
+    elif len(q.trimmed_parts) > 1:
+        detected = router.detect_dataset(q.trimmed_parts)
+        if detected is None:
+            dispatcher.cancel()
+            return handler_for_selecting_dataset(" ".join(q.trimmed_parts), ui)
+        dataset, words = detected
+        query = " ".join(words)
+        return dispatched_handler_for_searching_reference(dataset, query, ui)
     # example
     # - "dataset name query"
     else:
+        dispatcher.cancel()
         return handler_for_selecting_dataset(" ".join(q.trimmed_parts), ui)
 
 
+def _import_search_modules():
+    from . import registry, builder, federated
+
+
+def preload(delay: float = 0.1) -> threading.Timer:
+    """
+    Import the search engine modules in a background thread after ``delay``
+    seconds, the first screen is painted by then, and they are usually loaded
+    before the user picks a dataset.
+    """
+    timer = threading.Timer(delay, _import_search_modules)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
 def main():  # pragma: no cover
     """
     Enter findref interactive UI. Just type `fr` in your terminal.
@@ -231,4 +711,8 @@ def main():  # pragma: no cover
     zf.debugger.enable()
     zf.debugger.path_log_txt.unlink(missing_ok=True)
     ui = zf.UI(handler=handler, capture_error=False)
+    ui.event_generator = UIEventQueue()
+    if tracer.path_export is not None:
+        atexit.register(tracer.export)
+    preload()
     ui.run()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+"""
+Download and index many datasets at once with a process pool, so nobody
+has to wait for the index to be built in the interactive UI. It is the
+implementation of the ``fr warmup`` command.
+"""
+
+import typing as T
+import time
+import queue
+import functools
+import dataclasses
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+
+from . import models
+from .searcher import create_warm_dataset
+from .paths import dir_index, dir_cache
+
+
+T_UPDATER = T.Callable[[str, T.Optional[str]], models.DataSetUpdate]
+
+
+@dataclasses.dataclass
+class WarmupResult:
+    """
+    The result of warming up one dataset.
+
+    :param dataset: the dataset name.
+    :param elapsed: how many seconds it took.
+    :param n_indexed: number of documents indexed.
+    :param error: the error message if it failed.
+    """
+
+    dataset: str
+    elapsed: float = 0.0
+    n_indexed: int = 0
+    error: T.Optional[str] = None
+
+    @property
+    def is_succeeded(self) -> bool:
+        return self.error is None
+
+
+def warmup_one(
+    dataset: str,
+    dir_index: Path = dir_index,
+    dir_cache: Path = dir_cache,
+    progress_queue: T.Optional[queue.Queue] = None,
+    progress_every: int = 5000,
+    updater: T_UPDATER = models.get_dataset_update,
+) -> WarmupResult:
+    """
+    Download and index one dataset. It runs in a worker process. If another
+    process, for example ``fr``, is indexing the same dataset, it waits for
+    that process instead of indexing it again.
+
+    :param progress_queue: if given, put ``(dataset, n_indexed, n_total)``
+        tuples into it while indexing.
+    :param updater: takes the dataset name and the release tag name of the
+        local index, returns a :class:`~findref.models.DataSetUpdate`.
+    """
+    result = WarmupResult(dataset=dataset)
+    start = time.time()
+
+    def on_progress(n_indexed: int, n_total: T.Optional[int]):
+        result.n_indexed = n_indexed
+        if progress_queue is not None:
+            progress_queue.put((dataset, n_indexed, n_total))
+
+    try:
+        ds = create_warm_dataset(
+            dataset=dataset,
+            dir_index=dir_index,
+            dir_cache=dir_cache,
+        )
+        ds.updater = functools.partial(updater, dataset)
+        ds.refresh_index(
+            on_progress=on_progress,
+            progress_every=progress_every,
+            multi_thread=False,
+        )
+    except Exception as e:
+        result.error = f"{e!r}"
+    result.elapsed = time.time() - start
+    return result
+
+
+def _drain(progress_queue: queue.Queue, echo: T.Callable[[str], T.Any]):
+    while 1:
+        try:
+            dataset, n_indexed, n_total = progress_queue.get_nowait()
+        except queue.Empty:
+            return
+        if n_total is None:
+            echo(f"  {dataset}: {n_indexed:,} documents indexed ...")
+        else:
+            echo(f"  {dataset}: {n_indexed:,} / {n_total:,} documents indexed ...")
+
+
+def warmup(
+    datasets: T.Optional[T.Iterable[str]] = None,
+    processes: T.Optional[int] = None,
+    dir_index: Path = dir_index,
+    dir_cache: Path = dir_cache,
+    echo: T.Callable[[str], T.Any] = print,
+    updater: T_UPDATER = models.get_dataset_update,
+) -> T.List[WarmupResult]:
+    """
+    Download and index the given datasets in parallel.
+
+    :param datasets: list of dataset names, all datasets if not given.
+    :param processes: number of worker processes, default is the number of CPU.
+    :param echo: the function to report progress and timing.
+    :param updater: see :func:`warmup_one`, it is sent to the worker
+        processes, so it must be a module level function.
+
+    :return: list of :class:`WarmupResult`, in the order of ``datasets``.
+    """
+    if datasets is None:
+        datasets = [dataset.value for dataset in models.DataSetEnum]
+    else:
+        datasets = [models.DataSetEnum(dataset).value for dataset in datasets]
+    if len(datasets) == 0:  # pragma: no cover
+        return []
+
+    results: T.Dict[str, WarmupResult] = dict()
+    start = time.time()
+    with multiprocessing.Manager() as manager:
+        progress_queue = manager.Queue()
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures: T.Dict[Future, str] = {
+                pool.submit(
+                    warmup_one,
+                    dataset=dataset,
+                    dir_index=dir_index,
+                    dir_cache=dir_cache,
+                    progress_queue=progress_queue,
+                    updater=updater,
+                ): dataset
+                for dataset in datasets
+            }
+            echo(f"warming up {len(datasets)} datasets: {', '.join(datasets)}")
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                _drain(progress_queue, echo)
+                for future in done:
+                    dataset = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:  # pragma: no cover
+                        result = WarmupResult(dataset=dataset, error=f"{e!r}")
+                    results[dataset] = result
+                    if result.is_succeeded:
+                        echo(
+                            f"✅ {dataset}: {result.n_indexed:,} documents, "
+                            f"took {result.elapsed:.2f} seconds"
+                        )
+                    else:
+                        echo(
+                            f"❌ {dataset}: failed after {result.elapsed:.2f} "
+                            f"seconds, {result.error}"
+                        )
+    n_failed = sum(1 for result in results.values() if not result.is_succeeded)
+    echo(
+        f"done, {len(datasets) - n_failed} succeeded, {n_failed} failed, "
+        f"took {time.time() - start:.2f} seconds"
+    )
+    return [results[dataset] for dataset in datasets]
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+import io
+import sys
+import json
+import subprocess
+
+from findref.models import DataSetEnum, Boto3Record
+from findref.registry import DataSetRegistry
+from findref.batch import parse_line, parse_lines, run_batch, write_jsonl
+
+
+def make_docs(methods):
+    return [
+        Boto3Record(
+            url=f"https://boto3.amazonaws.com/{method}.html",
+            type="client",
+            service_id="s3",
+            service_name="S3",
+            method=method,
+        )
+        .to_doc()
+        .to_dict()
+        for method in methods
+    ]
+
+
+def test_parse_line():
+    query = parse_line(1, "boto3\ts3 put_object\n")
+    assert (query.dataset, query.query, query.error) == ("boto3", "s3 put_object", None)
+    assert parse_line(1, "cfn\tbucket").dataset == DataSetEnum.aws_cloudformation.value
+    assert parse_line(1, "boto3 s3").error is not None
+    assert parse_line(1, "nope\ts3").error == "unknown dataset 'nope'"
+    assert [query.line for query in parse_lines(["# comment", "", "tf\ts3"])] == [3]
+
+
+def test_run_batch(tmp_path):
+    registry = DataSetRegistry(
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    ds = registry.get(DataSetEnum.boto3.value)
+    ds.updater = None
+    ds.downloader = lambda: make_docs(["put_object", "get_object"])
+
+    lines = ["boto3\tput", "boto3\tget_object", "nope\tput", "boto3\txyz"]
+    records = list(run_batch(lines, limit=3, registry=registry))
+    url = "https://boto3.amazonaws.com/{}.html"
+    assert [record["line"] for record in records] == [1, 2, 3, 4]
+    assert records[0]["results"][0]["url"] == url.format("put_object")
+    assert records[1]["results"][0]["url"] == url.format("get_object")
+    assert records[2]["error"] == "unknown dataset 'nope'"
+    assert records[3]["results"] == []
+
+    # the workers reuse the index built above
+    records = list(
+        run_batch(lines * 3, limit=3, processes=2, chunk_size=2, registry=registry)
+    )
+    assert [record["line"] for record in records] == list(range(1, 13))
+    assert records[4]["results"][0]["url"] == url.format("put_object")
+
+    stream = io.StringIO()
+    assert write_jsonl(records, stream) == (12, 3)
+    assert json.loads(stream.getvalue().splitlines()[0]) == records[0]
+
+    # the batch search doesn't import the terminal UI
+    code = "\n".join(
+        [
+            "import sys",
+            "from pathlib import Path",
+            "from findref.registry import DataSetRegistry",
+            "from findref.batch import run_batch",
+            f"dir_root = Path({str(tmp_path)!r})",
+            "registry = DataSetRegistry(dir_root / '.index', dir_root / '.cache')",
+            "records = list(run_batch(['boto3\\tput'], limit=3, registry=registry))",
+            "print(records[0]['results'][0]['url'])",
+            "print(sorted(m for m in ['zelfred', 'findref.ui'] if m in sys.modules))",
+        ]
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.splitlines() == [url.format("put_object"), "[]"]
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.batch", preview=False)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import copy
+import subprocess
+
+from findref.models import DataSetEnum, get_doc_class, get_schema
+from findref.bench import (
+    make_fixture_docs,
+    make_query_corpus,
+    get_percentiles,
+    run_bench,
+    compare,
+)
+
+
+def test_make_fixture_docs():
+    dataset = DataSetEnum.boto3.value
+    docs = make_fixture_docs(dataset, n_docs=20)
+    assert docs == make_fixture_docs(dataset, n_docs=20)
+    assert list(docs[0]) == get_schema(dataset).stored_names
+    get_doc_class(dataset).from_dict(docs[0])
+
+    queries = make_query_corpus(docs, n_queries=30)
+    assert len(queries) == len(set(queries)) == 30
+    assert queries == make_query_corpus(docs, n_queries=30)
+
+
+def test_get_percentiles():
+    res = get_percentiles([float(i) for i in range(1, 101)])
+    assert res["p50"] == 50.5
+    assert 95 <= res["p95"] <= 96
+    assert get_percentiles([1.0])["p99"] == 1.0
+
+
+def test_run_bench(tmp_path):
+    result = run_bench(
+        datasets=[DataSetEnum.boto3.value],
+        n_docs=50,
+        n_queries=20,
+        dir_root=tmp_path,
+        isolate=False,
+        echo=lambda _: None,
+    )
+    (res,) = result["results"]
+    assert res["n_docs"] == 50
+    assert res["n_queries"] == 20
+    assert res["n_hits"] > 0
+    assert res["index_size"] > 0
+    assert res["latency"]["p99"] >= res["latency"]["p50"] > 0
+
+    assert compare(result, result) == []
+    slower = copy.deepcopy(result)
+    slower["results"][0]["latency"]["p95"] *= 2
+    (regression,) = compare(result, slower, threshold=0.5)
+    assert regression.startswith("boto3 (whoosh) latency.p95")
+
+
+def test_bench_imports(tmp_path):
+    # the peak memory of a dataset doesn't include the terminal UI
+    code = "\n".join(
+        [
+            "import sys",
+            "from pathlib import Path",
+            "from findref.bench import run_bench",
+            "run_bench(",
+            "    datasets=['boto3'],",
+            "    n_docs=10,",
+            "    n_queries=5,",
+            f"    dir_root=Path({str(tmp_path)!r}),",
+            "    isolate=False,",
+            "    echo=lambda _: None,",
+            ")",
+            "print(sorted(m for m in ['zelfred', 'findref.ui'] if m in sys.modules))",
+        ]
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == "[]"
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.bench", preview=False)
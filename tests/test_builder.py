@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+
+from findref.models import DataSetEnum, Boto3Record
+from findref.registry import DataSetRegistry
+from findref.builder import BackgroundIndexBuilder
+from findref.buildlock import FileLock, bump_generation
+
+
+def make_docs(methods):
+    return [
+        Boto3Record(
+            url=f"https://boto3.amazonaws.com/{method}.html",
+            type="client",
+            service_id="s3",
+            service_name="S3",
+            method=method,
+        )
+        .to_doc()
+        .to_dict()
+        for method in methods
+    ]
+
+
+def test_background_index_builder(tmp_path):
+    registry = DataSetRegistry(
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    builder = BackgroundIndexBuilder(registry=registry)
+    dataset = DataSetEnum.boto3
+
+    # first build
+    ds = registry.get(dataset)
+    ds.updater = None
+    ds.downloader = lambda: make_docs(["put_object"])
+    build = builder.start(dataset)
+    assert builder.wait(dataset, timeout=30)
+    assert build.is_succeeded
+    assert build.progress == "1 / 1 documents"
+    ds = registry.get(dataset)
+    assert ds.is_fresh()
+    assert ds.search_index("put~1")[0]["meth_ng"] == "put_object"
+
+    # second build, the old index keeps serving queries until it is done
+    event = threading.Event()
+
+    def downloader():
+        yield from make_docs(["get_object"])
+        event.wait(timeout=30)
+
+    ds.updater = None
+    ds.downloader = downloader
+    build = builder.start(dataset)
+    assert builder.start(dataset) is build
+    assert builder.is_building(dataset)
+    assert ds.search_index("put~1")[0]["meth_ng"] == "put_object"
+    assert ds.search_index("get~1") == []
+    event.set()
+    assert builder.wait(dataset, timeout=30)
+    assert build.is_succeeded
+    assert build.n_total is None
+
+    ds = registry.get(dataset)
+    assert ds.search_index("put~1") == []
+    assert ds.search_index("get~1")[0]["meth_ng"] == "get_object"
+
+    # another process is building the index, wait for it instead
+    waiting = threading.Event()
+    ds.updater = None
+    ds.downloader = lambda: make_docs(["list_objects"])
+    with FileLock(ds._path_lock):
+        build = builder.start(dataset, on_progress=lambda _: waiting.set())
+        assert waiting.wait(timeout=30)
+        assert build.is_waiting
+        assert build.progress == f"waiting for findref process {os.getpid()}"
+        bump_generation(ds._path_generation)
+    assert builder.wait(dataset, timeout=30)
+    assert build.is_succeeded
+    assert build.is_waiting is False
+    assert build.n_indexed == 0
+    ds = registry.get(dataset)
+    assert ds.search_index("get~1")[0]["meth_ng"] == "get_object"
+
+    # failed build
+    def downloader():
+        raise ConnectionError
+
+    ds.updater = None
+    ds.downloader = downloader
+    build = builder.start(dataset)
+    assert builder.wait(dataset, timeout=30)
+    assert build.is_failed
+    assert isinstance(build.error, ConnectionError)
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.builder", preview=False)
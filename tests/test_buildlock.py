@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import os
+import multiprocessing
+
+import pytest
+
+from findref.buildlock import (
+    FileLock,
+    write_atomic,
+    read_generation,
+    bump_generation,
+)
+
+
+def hold_lock(path, locked, release):
+    with FileLock(path):
+        locked.set()
+        release.wait(timeout=10)
+
+
+def test_file_lock(tmp_path):
+    path = tmp_path / "index" / "boto3.lock"
+    lock = FileLock(path, poll_interval=0.01)
+    other = FileLock(path, poll_interval=0.01)
+    assert lock.acquire()
+    assert lock.is_locked
+    assert lock.get_owner() == os.getpid()
+    with pytest.raises(RuntimeError):
+        lock.acquire()
+    # another instance in the same process is excluded too
+    assert other.acquire(blocking=False) is False
+    assert other.acquire(timeout=0.05) is False
+    assert other.is_locked is False
+    lock.release()
+    lock.release()
+    with other:
+        assert other.is_locked
+    assert other.is_locked is False
+
+
+def test_file_lock_cross_process(tmp_path):
+    path = tmp_path / "boto3.lock"
+    ctx = multiprocessing.get_context("spawn")
+    locked, release = ctx.Event(), ctx.Event()
+    process = ctx.Process(target=hold_lock, args=(path, locked, release))
+    process.start()
+    try:
+        assert locked.wait(timeout=30)
+        lock = FileLock(path, poll_interval=0.01)
+        assert lock.acquire(blocking=False) is False
+        assert lock.get_owner() == process.pid
+        release.set()
+        assert lock.acquire(timeout=30)
+        lock.release()
+    finally:
+        release.set()
+        process.join(timeout=30)
+
+
+def test_file_lock_released_on_exit(tmp_path):
+    path = tmp_path / "boto3.lock"
+    ctx = multiprocessing.get_context("spawn")
+    locked, release = ctx.Event(), ctx.Event()
+    process = ctx.Process(target=hold_lock, args=(path, locked, release))
+    process.start()
+    assert locked.wait(timeout=30)
+    # the process dies while holding the lock, no stale lock is left behind
+    process.kill()
+    process.join(timeout=30)
+    with FileLock(path) as lock:
+        assert lock.is_locked
+
+
+def test_generation(tmp_path):
+    path = tmp_path / "index" / "boto3.generation.json"
+    assert read_generation(path) == 0
+    assert bump_generation(path) == 1
+    assert bump_generation(path) == 2
+    assert read_generation(path) == 2
+    assert list(path.parent.iterdir()) == [path]
+
+    write_atomic(path, "not json")
+    assert read_generation(path) == 0
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.buildlock", preview=False)
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import stat
+import socket
+import threading
+import subprocess
+
+import pytest
+
+from findref.models import DataSetEnum, Boto3Record
+from findref import daemon
+from findref.registry import DataSetRegistry
+from findref.daemon import (
+    DAEMON_PROTOCOL_VERSION,
+    DaemonError,
+    DaemonNotRunningError,
+    DaemonTimeoutError,
+    DaemonServer,
+    DaemonClient,
+    get_client,
+)
+
+
+def make_docs(methods):
+    return [
+        Boto3Record(
+            url=f"https://boto3.amazonaws.com/{method}.html",
+            type="client",
+            service_id="s3",
+            service_name="S3",
+            method=method,
+        )
+        .to_doc()
+        .to_dict()
+        for method in methods
+    ]
+
+
+def test_daemon(tmp_path, monkeypatch):
+    path = tmp_path / "d.sock"
+    assert get_client(path) is None
+    with pytest.raises(DaemonNotRunningError):
+        DaemonClient(path=path).ping()
+
+    registry = DataSetRegistry(
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    dataset = DataSetEnum.boto3.value
+    ds = registry.get(dataset)
+    ds.updater = None
+    ds.downloader = lambda: make_docs(["put_object", "get_object"])
+
+    # other local users can't connect even before the server starts serving
+    modes = list()
+    server_activate = daemon._UnixServer.server_activate
+
+    def record_mode(self):
+        modes.append(stat.S_IMODE(os.stat(path).st_mode))
+        server_activate(self)
+
+    monkeypatch.setattr(daemon._UnixServer, "server_activate", record_mode)
+    server = DaemonServer(path=path, registry=registry).start()
+    assert len(modes) == 1
+    assert modes[0] & 0o077 == 0
+    try:
+        assert server.warm() == []
+        with pytest.raises(DaemonError):
+            DaemonServer(path=path, registry=registry).start()
+
+        client = get_client(path)
+        assert client.ping()["version"] == DAEMON_PROTOCOL_VERSION
+
+        # the first query starts the build
+        res = client.search(dataset, "put")
+        assert server.builder.wait(dataset, timeout=30)
+        res = client.search(dataset, "put")
+        assert res["indexing"] is False
+        assert res["error"] is None
+        assert [doc["meth_ng"] for doc in res["docs"]] == ["put_object"]
+        assert res["items"][0]["arg"] == "https://boto3.amazonaws.com/put_object.html"
+        assert res["items"][0]["autocomplete"].startswith(f"{dataset} ")
+        # the thin client creates the items without the search engine modules
+        code = "\n".join(
+            [
+                "import sys",
+                "from pathlib import Path",
+                "from findref.daemon import DaemonClient",
+                "from findref import ui",
+                f"client = DaemonClient(path=Path({str(path)!r}))",
+                "ui.get_daemon_client = lambda: client",
+                f"items = ui.search_with_daemon(client, {dataset!r}, 'put')",
+                "print([item.arg for item in items])",
+                "items = ui.handler_for_federated_search('put', ui=None)",
+                "print([item.subtitle[:7] for item in items])",
+                "print(sorted(m for m in ['sayt', 'findref.models'] if m in sys.modules))",
+            ]
+        )
+        output = subprocess.check_output([sys.executable, "-c", code], text=True)
+        assert output.splitlines() == [
+            "['https://boto3.amazonaws.com/put_object.html']",
+            "['[boto3]', 'not ind']",
+            "[]",
+        ]
+        # the query is already preprocessed
+        res = client.search(dataset, "get~1", preprocess=False)
+        assert [doc["meth_ng"] for doc in res["docs"]] == ["get_object"]
+        assert server.warm() == [dataset]
+
+        res = client.federated("object")
+        assert {hit["dataset"] for hit in res["hits"]} == {dataset}
+        assert len(res["hits"]) == 2
+
+        with pytest.raises(DaemonError):
+            client.search("not_a_dataset", "put")
+        with pytest.raises(DaemonError):
+            client.request("foo")
+
+        # the requests are counted in all handler threads
+        n_requests = client.ping()["n_requests"]
+        threads = [
+            threading.Thread(
+                target=lambda: [server.handle({"method": "ping"}) for _ in range(100)]
+            )
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert client.ping()["n_requests"] == n_requests + 401
+
+        # reconnect after the connection is broken
+        client._sock.close()
+        assert client.ping()["pid"] > 0
+
+        client.shutdown()
+        assert server.is_serving() is False
+        assert path.exists() is False
+    finally:
+        server.shutdown()
+
+
+def test_daemon_imports(tmp_path):
+    # the daemon doesn't import the terminal UI to handle the requests
+    code = "\n".join(
+        [
+            "import sys",
+            "from pathlib import Path",
+            "from findref.registry import DataSetRegistry",
+            "from findref.daemon import DaemonServer",
+            f"dir_root = Path({str(tmp_path)!r})",
+            "registry = DataSetRegistry(dir_root / '.index', dir_root / '.cache')",
+            "DaemonServer(registry=registry).federated('put')",
+            "print(sorted(m for m in ['zelfred', 'findref.ui'] if m in sys.modules))",
+        ]
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == "[]"
+
+
+def test_daemon_timeout(tmp_path):
+    path = tmp_path / "d.sock"
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(path))
+    listener.listen()
+    received = list()
+
+    # a daemon that reads the requests but never responds
+    def serve():
+        conn, _ = listener.accept()
+        with conn:
+            for line in conn.makefile("rb"):
+                received.append(line)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    client = DaemonClient(path=path, timeout=0.2)
+    try:
+        # the slow request is not sent again, it may still be running
+        with pytest.raises(DaemonTimeoutError):
+            client.refresh(DataSetEnum.boto3.value)
+        assert len(received) == 1
+        assert client._sock is None
+    finally:
+        client.close()
+        listener.close()
+        thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.daemon", preview=False)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pytest
+
+from findref.dispatch import Cancelled, Dispatcher
+
+
+def wait_done(done: threading.Event):
+    assert done.wait(timeout=5)
+    done.clear()
+
+
+def test_submit_and_take():
+    dispatcher = Dispatcher(coalesce_window=0.01)
+    done = threading.Event()
+    assert dispatcher.take("s3") == (False, None)
+    assert dispatcher.last is None
+
+    dispatcher.submit("s3", lambda: ["s3 item"], on_done=done.set)
+    wait_done(done)
+    assert dispatcher.take("ec2") == (False, None)
+    assert dispatcher.take("s3") == (True, ["s3 item"])
+    # the result is handed back only once, the last result is kept
+    assert dispatcher.take("s3") == (False, None)
+    assert dispatcher.last == ["s3 item"]
+
+    dispatcher.cancel()
+    assert dispatcher.last is None
+
+
+def test_error():
+    dispatcher = Dispatcher(coalesce_window=0.01)
+    done = threading.Event()
+
+    def func():
+        raise ValueError("bad query")
+
+    dispatcher.submit("bad", func, on_done=done.set)
+    wait_done(done)
+    with pytest.raises(ValueError):
+        dispatcher.take("bad")
+    assert dispatcher.last is None
+
+
+def test_coalesce():
+    dispatcher = Dispatcher(coalesce_window=0.2)
+    done = threading.Event()
+    calls = list()
+
+    for query in ["s", "s3", "s3 p", "s3 put"]:
+        dispatcher.submit(
+            query,
+            lambda query=query: calls.append(query) or query,
+            on_done=done.set,
+        )
+    wait_done(done)
+    # keystrokes within the window only search the newest query
+    assert calls == ["s3 put"]
+    assert dispatcher.take("s3 put") == (True, "s3 put")
+
+
+def test_cancel_running_query():
+    dispatcher = Dispatcher(coalesce_window=0)
+    started = threading.Event()
+    resume = threading.Event()
+    done = threading.Event()
+    checked = list()
+
+    def slow():
+        started.set()
+        assert resume.wait(timeout=5)
+        try:
+            dispatcher.check()
+        except Cancelled:
+            checked.append("cancelled")
+            raise
+        return "slow"
+
+    dispatcher.submit("slow", slow, on_done=done.set)
+    assert started.wait(timeout=5)
+    # the user keeps typing while the first query is running
+    dispatcher.submit("fast", lambda: "fast", on_done=done.set)
+    resume.set()
+    wait_done(done)
+    assert checked == ["cancelled"]
+    assert dispatcher.take("slow") == (False, None)
+    assert dispatcher.take("fast") == (True, "fast")
+    assert dispatcher.last == "fast"
+
+
+def test_drop_superseded_result():
+    dispatcher = Dispatcher(coalesce_window=0)
+    started = threading.Event()
+    resume = threading.Event()
+    calls = list()
+
+    def slow():
+        started.set()
+        assert resume.wait(timeout=5)
+        return "slow"
+
+    dispatcher.submit("slow", slow, on_done=lambda: calls.append("slow"))
+    assert started.wait(timeout=5)
+    dispatcher.cancel()
+    resume.set()
+    dispatcher.submit("fast", lambda: "fast", on_done=lambda: calls.append("fast"))
+    for _ in range(500):
+        if calls:
+            break
+        threading.Event().wait(0.01)
+    # the superseded query never repaints, and it never becomes the last result
+    assert calls == ["fast"]
+    assert dispatcher.last == "fast"
+
+
+def test_check_outside_worker():
+    dispatcher = Dispatcher()
+    dispatcher.cancel()
+    dispatcher.check()
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.dispatch", preview=False)
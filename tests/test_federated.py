@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from findref import federated
+from findref.models import DataSetEnum, Boto3Record, TfRecord
+from findref.registry import DataSetRegistry
+from findref.federated import (
+    FederatedHit,
+    normalize_hits,
+    merge_hits,
+    federated_search,
+)
+
+
+def make_boto3_docs(methods):
+    return [
+        Boto3Record(
+            url=f"https://boto3.amazonaws.com/{method}.html",
+            type="client",
+            service_id="s3",
+            service_name="S3",
+            method=method,
+        )
+        .to_doc()
+        .to_dict()
+        for method in methods
+    ]
+
+
+def test_normalize_and_merge_hits():
+    hits = normalize_hits(
+        "a",
+        [
+            {"_score": 10.0, "_source": {"n": 1}},
+            {"_score": 5.0, "_source": {"n": 2}},
+        ],
+    )
+    assert [hit.norm_score for hit in hits] == [1.0, 0.5]
+    assert normalize_hits("a", []) == []
+
+    b_hits = [
+        FederatedHit(dataset="b", score=2.0, norm_score=1.0, doc={"n": 3}),
+        FederatedHit(dataset="b", score=1.5, norm_score=0.75, doc={"n": 4}),
+    ]
+    merged = merge_hits([hits, b_hits], limit=3)
+    assert [(hit.dataset, hit.doc["n"]) for hit in merged] == [
+        ("a", 1),
+        ("b", 3),
+        ("b", 4),
+    ]
+
+
+def test_federated_search(tmp_path):
+    registry = DataSetRegistry(
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    ds = registry.get(DataSetEnum.boto3.value)
+    ds.updater = None
+    ds.downloader = lambda: make_boto3_docs(["put_object", "get_object"])
+    ds.refresh_index()
+
+    ds = registry.get(DataSetEnum.tf.value)
+    ds.updater = None
+    ds.downloader = lambda: [
+        TfRecord(
+            url="https://registry.terraform.io/aws_s3_object",
+            provider="aws",
+            type="res",
+            subcategory="S3 (Simple Storage)",
+            item_name="aws_s3_object",
+            description="Provides an S3 object resource.",
+        )
+        .to_doc()
+        .to_dict()
+    ]
+    ds.refresh_index()
+
+    result = federated_search(
+        "object~1",
+        datasets=[DataSetEnum.boto3, DataSetEnum.tf, DataSetEnum.pandas],
+        limit=10,
+        timeout=30,
+        registry=registry,
+    )
+    assert {hit.dataset for hit in result.hits} == {"boto3", "tf"}
+    assert len(result.hits) == 3
+    assert result.hits[0].norm_score == 1.0
+    assert result.not_indexed == ["pandas"]
+    assert result.timed_out == []
+    assert result.failed == {}
+
+    # a slow dataset doesn't stall the result
+    event = threading.Event()
+    ds = registry.get(DataSetEnum.tf.value)
+    search_index = ds.search_index
+    calls = []
+
+    def slow_search_index(**kwargs):
+        calls.append(kwargs["query"])
+        event.wait(timeout=30)
+        return search_index(**kwargs)
+
+    ds.search_index = slow_search_index
+    for query in ["put~1", "get~1"]:
+        result = federated_search(
+            query,
+            datasets=[DataSetEnum.boto3, DataSetEnum.tf],
+            timeout=0.2,
+            registry=registry,
+        )
+        assert [hit.dataset for hit in result.hits] == ["boto3"]
+        assert result.timed_out == ["tf"]
+    # the busy dataset is not searched again until its search is done
+    assert calls == ["put~1"]
+    event.set()
+    federated._running["tf"].result(timeout=30)
+    result = federated_search(
+        "get~1",
+        datasets=[DataSetEnum.boto3, DataSetEnum.tf],
+        timeout=30,
+        registry=registry,
+    )
+    assert calls == ["put~1", "get~1"]
+    assert result.timed_out == []
+    assert "tf" not in federated._running
+
+    # the searches that haven't started when the time is up are cancelled
+    blocked = threading.Event()
+    ds_boto3 = registry.get(DataSetEnum.boto3.value)
+    boto3_search_index = ds_boto3.search_index
+
+    def blocked_search_index(**kwargs):
+        blocked.wait(timeout=30)
+        return boto3_search_index(**kwargs)
+
+    ds_boto3.search_index = blocked_search_index
+    calls.clear()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        result = federated_search(
+            "put~1",
+            datasets=[DataSetEnum.boto3, DataSetEnum.tf],
+            timeout=0.2,
+            registry=registry,
+            executor=executor,
+        )
+        assert result.timed_out == ["boto3", "tf"]
+        assert "tf" not in federated._running
+        blocked.set()
+    assert calls == []
+    federated._running["boto3"].result(timeout=30)
+    ds_boto3.search_index = boto3_search_index
+
+    # a failed dataset doesn't break the result
+    def bad_search_index(**kwargs):
+        raise ValueError
+
+    ds.search_index = bad_search_index
+    result = federated_search(
+        "put~1",
+        datasets=[DataSetEnum.boto3, DataSetEnum.tf],
+        timeout=30,
+        registry=registry,
+    )
+    assert [hit.dataset for hit in result.hits] == ["boto3"]
+    assert isinstance(result.failed["tf"], ValueError)
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.federated", preview=False)
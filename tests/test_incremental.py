@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+from findref.models import DataSetEnum, Boto3Record
+from findref.searcher import create_warm_dataset
+from findref.incremental import is_refinement
+
+
+def make_docs():
+    docs = list()
+    for service_id in ["s3", "ec2", "sqs"]:
+        for method in [
+            "put_object",
+            "put_object_acl",
+            "get_object",
+            "delete_object",
+            "put_bucket_policy",
+            "list_objects",
+        ]:
+            docs.append(
+                Boto3Record(
+                    url=f"https://boto3.amazonaws.com/{service_id}/{method}.html",
+                    type="client",
+                    service_id=service_id,
+                    service_name=service_id.upper(),
+                    method=method,
+                )
+                .to_doc()
+                .to_dict()
+            )
+    return docs
+
+
+def test_is_refinement(tmp_path):
+    ds = create_warm_dataset(
+        dataset=DataSetEnum.boto3.value,
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    q = ds._parse_query
+    assert is_refinement(q("s3~1"), q("s3~1 put~1")) is True
+    assert is_refinement(q("s3~1 put~1"), q("s3~1 put~1 obj~1")) is True
+    assert is_refinement(q("s3~1 put~1"), q("s3~1 puto~1")) is False
+    assert is_refinement(q("s3~1 put~1"), q("s3~1")) is False
+    assert is_refinement(q("s3~1 put~1"), q("s3~1 put~1")) is False
+    assert is_refinement(q("*"), q("s3~1")) is False
+
+
+def test_incremental_search(tmp_path):
+    ds = create_warm_dataset(
+        dataset=DataSetEnum.boto3.value,
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    ds.updater = None
+    ds.downloader = make_docs
+    ds.refresh_index()
+    engine = ds.incremental
+
+    queries = [
+        "s3~1",
+        "s3~1 put~1",
+        "s3~1 put~1 obj~1",
+        "s3~1 put~1 obj~1 acl~1",
+        "s3~1 put~1 bucket~1",
+        "s3~1 get~1",
+        "ec2~1 list~1",
+        "ec2~1 list~1 objects~1",
+    ]
+    for query in queries:
+        expected = [
+            hit.fields()
+            for hit in ds.get_searcher().search(ds._parse_query(query), limit=3)
+        ]
+        assert engine.search(query, limit=3) == expected
+
+    # "s3 put", "s3 put obj", "s3 put obj acl" and "ec2 list objects"
+    # narrow the previous result
+    assert engine.n_incremental == 4
+    assert engine.n_full == 4
+
+    # the index is rebuilt, the previous doc ids are not valid anymore
+    engine.search("s3~1", limit=3)
+    ds.refresh_index()
+    engine.search("s3~1 put~1", limit=3)
+    assert engine.n_incremental == 4
+
+    # too many candidates
+    engine.max_candidates = 1
+    engine.search("s3~1 put~1 obj~1", limit=3)
+    assert engine.n_incremental == 4
+
+    engine.reset()
+    assert engine._last is None
+    ds.close_searcher()
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.incremental", preview=False)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+from findref.lru import LRUCache
+
+
+def test_lru_cache():
+    cache = LRUCache(maxsize=2)
+    assert cache.get(("boto3", "put~1", 50)) is None
+    assert cache.misses == 1
+
+    cache.put(("boto3", "put~1", 50), 1)
+    cache.put(("boto3", "get~1", 50), 2)
+    assert cache.get(("boto3", "put~1", 50)) == 1
+    assert cache.hits == 1
+
+    # "get~1" is the least recently used one
+    cache.put(("tf", "s3~1", 50), 3)
+    assert len(cache) == 2
+    assert ("boto3", "get~1", 50) not in cache
+    assert ("boto3", "put~1", 50) in cache
+    assert cache.hit_rate == 0.5
+
+    cache.invalidate("boto3")
+    assert ("boto3", "put~1", 50) not in cache
+    assert ("tf", "s3~1", 50) in cache
+
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.lru", preview=False)
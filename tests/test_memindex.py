@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+import random
+from array import array
+
+from findref.models import DataSetEnum, Boto3Record, get_fields
+from findref.searcher import create_warm_dataset
+from findref.memindex import (
+    SearchBackendEnum,
+    parse_query,
+    iter_ngrams,
+    gallop_to,
+    intersect,
+    MemoryIndex,
+)
+
+
+def make_docs(pairs):
+    return [
+        Boto3Record(
+            url=f"https://boto3.amazonaws.com/{service_id}/{method}.html",
+            type="client",
+            service_id=service_id,
+            service_name=service_id.upper(),
+            method=method,
+        )
+        .to_doc()
+        .to_dict()
+        for service_id, method in pairs
+    ]
+
+
+def test_parse_query():
+    assert parse_query("*") is None
+    assert parse_query("") is None
+    assert parse_query("S3~1 put~1") == ["s3", "put"]
+    assert parse_query("put_obj*") == ["put_obj"]
+
+
+def test_iter_ngrams():
+    assert list(iter_ngrams("abcd", 2, 3)) == ["ab", "bc", "cd", "abc", "bcd"]
+    assert list(iter_ngrams("a", 2, 3)) == []
+
+
+def test_intersect():
+    arr = array("I", [1, 3, 5, 7, 9, 11])
+    assert gallop_to(arr, 0, 0) == 0
+    assert gallop_to(arr, 6, 0) == 3
+    assert gallop_to(arr, 6, 4) == 4
+    assert gallop_to(arr, 100, 0) == 6
+
+    rnd = random.Random(1)
+    for _ in range(100):
+        a = sorted(rnd.sample(range(1000), rnd.randint(0, 50)))
+        b = sorted(rnd.sample(range(1000), rnd.randint(0, 500)))
+        expected = sorted(set(a) & set(b))
+        assert list(intersect(array("I", a), array("I", b))) == expected
+        assert list(intersect(array("I", b), array("I", a))) == expected
+
+
+def test_memory_index():
+    docs = make_docs(
+        [
+            ("s3", "put_object"),
+            ("s3", "put_object_acl"),
+            ("s3", "get_bucket_lifecycle_configuration"),
+            ("ec2", "run_instances"),
+        ]
+    )
+    index = MemoryIndex.build(get_fields(DataSetEnum.boto3.value), docs)
+    assert len(index) == 4
+
+    def search(query, limit=10):
+        return [
+            index.docs[doc_id]["meth_ng"] for doc_id, _ in index.search(query, limit)
+        ]
+
+    # prefix and substring, the shorter value wins
+    assert search("s3~1 put~1 obj~1") == ["put_object", "put_object_acl"]
+    assert search("acl") == ["put_object_acl"]
+    # longer than the max n-gram size
+    assert search("lifecycle configuration") == ["get_bucket_lifecycle_configuration"]
+    assert search("lifecyclx") == []
+    assert search("ec2 run") == ["run_instances"]
+    assert search("s3 run") == []
+    assert search("x") == []
+    assert len(search("*", limit=3)) == 3
+
+
+def test_warm_dataset_memory_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv("FINDREF_MEMORY_BACKEND", "tf,boto3")
+    ds = create_warm_dataset(
+        dataset=DataSetEnum.boto3.value,
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    assert ds.backend == SearchBackendEnum.memory.value
+    ds.updater = None
+    ds.prebuilt_downloader = None
+    ds.downloader = lambda: make_docs([("s3", "put_object"), ("s3", "get_object")])
+    ds.refresh_index()
+
+    assert ds.search_index("get~1")[0]["meth_ng"] == "get_object"
+    res = ds.search_index("put obj", simple_response=False)
+    assert res["hits"][0]["_source"]["meth_ng"] == "put_object"
+    assert ds.incremental.search("put obj")[0]["meth_ng"] == "put_object"
+    index = ds.get_memory_index()
+    assert ds.get_memory_index() is index
+
+    # the index is rebuilt, the in-memory index is reloaded
+    ds.downloader = lambda: make_docs([("s3", "delete_object")])
+    ds.refresh_index()
+    assert ds.get_memory_index() is not index
+    assert ds.search_index("delete~1")[0]["meth_ng"] == "delete_object"
+    ds.close_searcher()
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.memindex", preview=False)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import io
+import json
+
+import pytest
+
+from findref.models import (
+    Metadata,
+    Release,
+    ReleaseDelta,
+    RELEASE_MAGIC,
+    UnsupportedReleaseFormatError,
+    read_release_header,
+    iter_compressed_release,
+    iter_json_array,
+)
+
+
+def test_iter_json_array():
+    docs = [
+        {"url": "https://example.com/1", "title": "你好 世界", "n": 1},
+        {"url": "https://example.com/2", "title": "a\"b", "n": [1, 2.5, None]},
+        {"url": "https://example.com/3", "title": "🔍", "n": 123456789},
+    ]
+    release = Release(metadata=Metadata(dataset_name="test"), docs=docs)
+    binary = release.to_binary()
+    for chunk_size in [1, 2, 3, 7, 64, 1024 * 1024]:
+        stream = io.BytesIO(binary)
+        assert list(iter_json_array(stream, "docs", chunk_size)) == docs
+
+    # the array is not the first key, and there are whitespaces
+    binary = json.dumps(
+        {"a": {"docs": [0]}, "docs": [1, 22, 333], "z": "x"}, indent=4
+    ).encode("utf-8")
+    for chunk_size in [1, 5, 1024]:
+        stream = io.BytesIO(binary)
+        assert list(iter_json_array(stream, "docs", chunk_size)) == [1, 22, 333]
+
+    assert list(iter_json_array(io.BytesIO(b'{"docs": []}'), "docs")) == []
+    assert list(iter_json_array(io.BytesIO(b'{"other": []}'), "docs")) == []
+    assert list(iter_json_array(io.BytesIO(b"{}"), "docs")) == []
+
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.BytesIO(b"[]"), "docs"))
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.BytesIO(b'{"docs": [1, 2'), "docs"))
+
+
+def test_compressed_release():
+    docs = [
+        {"url": "https://example.com/1", "title": "你好 世界", "prop": None},
+        {"url": "https://example.com/2", "title": "a\nb", "prop": "x"},
+    ]
+    release = Release(metadata=Metadata(dataset_name="test"), docs=docs)
+    binary = release.to_compressed_binary()
+    assert binary.startswith(RELEASE_MAGIC)
+    assert len(binary) < len(release.to_binary())
+
+    release1 = Release.from_binary(binary)
+    assert release1 == release
+    assert Release.from_binary(release.to_binary()) == release
+
+    for chunk_size in [1, 3, 1024]:
+        items = list(iter_compressed_release(io.BytesIO(binary), chunk_size))
+        assert items[0]["metadata"] == {"dataset_name": "test"}
+        assert items[1:] == docs
+
+    assert read_release_header(io.BytesIO(binary)) == "gzip"
+    with pytest.raises(UnsupportedReleaseFormatError):
+        read_release_header(io.BytesIO(release.to_binary()))
+    with pytest.raises(UnsupportedReleaseFormatError):
+        read_release_header(io.BytesIO(RELEASE_MAGIC + bytes([255, 1])))
+    with pytest.raises(UnsupportedReleaseFormatError):
+        read_release_header(io.BytesIO(RELEASE_MAGIC + bytes([1, 255])))
+
+
+def test_release_delta():
+    metadata = Metadata(dataset_name="test")
+    v1 = Release(metadata=metadata, docs=[{"url": "a", "n": 1}, {"url": "b", "n": 2}])
+    v2 = Release(metadata=metadata, docs=[{"url": "a", "n": 0}, {"url": "c", "n": 3}])
+    delta = ReleaseDelta.from_releases(v1, v2, from_tag="v1", to_tag="v2")
+    assert delta.upserts == v2.docs
+    assert delta.deletes == ["b"]
+    assert ReleaseDelta.from_binary(delta.to_binary()) == delta
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.models", preview=False)
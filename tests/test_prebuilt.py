@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+
+import pytest
+
+from findref.models import (
+    DataSetEnum,
+    Boto3Record,
+    UnsupportedReleaseFormatError,
+    get_fields,
+    get_release_index_filename,
+)
+from findref.memindex import MemoryIndex
+from findref.searcher import create_warm_dataset
+from findref.prebuilt import (
+    build_prebuilt_index,
+    read_prebuilt_header,
+    read_prebuilt_tag,
+    open_prebuilt_index,
+    download_prebuilt_index,
+)
+from findref.sources import format_checksums
+
+
+def make_docs(pairs):
+    return [
+        Boto3Record(
+            url=f"https://boto3.amazonaws.com/{service_id}/{method}.html",
+            type="client",
+            service_id=service_id,
+            service_name=service_id.upper(),
+            method=method,
+        )
+        .to_doc()
+        .to_dict()
+        for service_id, method in pairs
+    ]
+
+
+docs = make_docs(
+    [
+        ("s3", "put_object"),
+        ("s3", "put_object_acl"),
+        ("s3", "get_bucket_lifecycle_configuration"),
+        ("ec2", "run_instances"),
+        ("ec2", "describe_instances"),
+    ]
+)
+fields = get_fields(DataSetEnum.boto3.value)
+
+
+def test_prebuilt_index(tmp_path):
+    binary = build_prebuilt_index(fields, docs, metadata={"tag": "v1"})
+    path = tmp_path / "findref-boto3.fri"
+    path.write_bytes(binary)
+    assert read_prebuilt_tag(path, fields) == "v1"
+    assert read_prebuilt_tag(tmp_path / "not-exists.fri", fields) is None
+    assert read_prebuilt_tag(path, get_fields(DataSetEnum.tf.value)) is None
+
+    expected = MemoryIndex.build(fields, docs)
+    index = open_prebuilt_index(path, fields)
+    assert len(index) == len(docs)
+    assert list(index.docs) == docs
+    for query in [
+        "*",
+        "s3 put",
+        "put obj acl",
+        "lifecycle configuration",
+        "ec2 instances",
+        "client",
+        "nothing",
+        "你好",
+    ]:
+        assert index.search(query) == expected.search(query)
+
+    with pytest.raises(UnsupportedReleaseFormatError):
+        read_prebuilt_header(b"FRRL")
+    with pytest.raises(UnsupportedReleaseFormatError):
+        read_prebuilt_header(b"FRRL" + binary[4:])
+    with pytest.raises(UnsupportedReleaseFormatError):
+        read_prebuilt_header(binary[:4] + bytes([255]) + binary[5:])
+    with pytest.raises(UnsupportedReleaseFormatError):
+        open_prebuilt_index(path, get_fields(DataSetEnum.tf.value))
+
+
+def test_warm_dataset_prebuilt_index(tmp_path):
+    ds = create_warm_dataset(
+        dataset=DataSetEnum.boto3.value,
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    ds.backend = "memory"
+    calls = []
+
+    def prebuilt_downloader(path, current_tag):
+        calls.append(current_tag)
+        if current_tag != "v1":
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(build_prebuilt_index(fields, docs, {"tag": "v1"}))
+        return "v1"
+
+    def downloader():  # pragma: no cover
+        raise AssertionError("the index should not be built locally")
+
+    ds.prebuilt_downloader = prebuilt_downloader
+    ds.updater = None
+    ds.downloader = downloader
+
+    progress = []
+    assert ds.refresh_index(on_progress=lambda *args: progress.append(args))
+    assert progress == [(5, 5)]
+    assert ds.is_fresh()
+    assert ds.has_index()
+    # no whoosh index
+    assert ds._index_signature() is None
+    assert ds.search_index("put obj acl")[0]["meth_ng"] == "put_object_acl"
+    assert ds.search("run~1")[0]["meth_ng"] == "run_instances"
+    index = ds.get_memory_index()
+
+    # already up to date
+    assert ds.refresh_index()
+    assert calls == [None, "v1"]
+    assert ds.get_memory_index() is index
+
+    # the release doesn't publish the prebuilt index anymore
+    ds.prebuilt_downloader = lambda path, current_tag: None
+    ds.downloader = lambda: make_docs([("s3", "delete_object")])
+    assert ds.refresh_index()
+    assert ds._path_prebuilt.exists() is False
+    assert ds.search_index("delete~1")[0]["meth_ng"] == "delete_object"
+    ds.close_searcher()
+
+
+def test_download_prebuilt_index_schema_mismatch(tmp_path, monkeypatch):
+    # a prebuilt index published before the schema changed
+    dataset = DataSetEnum.boto3.value
+    dir_tag = tmp_path / "mirror" / "v1"
+    dir_tag.mkdir(parents=True)
+    binary = build_prebuilt_index(
+        get_fields(DataSetEnum.tf.value), [], metadata={"tag": "v1"}
+    )
+    filename = get_release_index_filename(dataset)
+    (dir_tag / filename).write_bytes(binary)
+    (dir_tag / "SHA256SUMS").write_text(
+        format_checksums({filename: hashlib.sha256(binary).hexdigest()})
+    )
+    (dir_tag.parent / "LATEST").write_text("v1\n")
+    monkeypatch.setenv("FINDREF_RELEASE_SOURCE", f"file://{dir_tag.parent}")
+
+    path = tmp_path / ".index" / "findref-boto3.fri"
+    assert download_prebuilt_index(dataset, path, fields=fields) is None
+    assert list(path.parent.iterdir()) == []
+    # the matching one is downloaded
+    assert (
+        download_prebuilt_index(dataset, path, fields=get_fields(DataSetEnum.tf.value))
+        == "v1"
+    )
+    path.unlink()
+
+    # the index is built locally instead
+    ds = create_warm_dataset(
+        dataset=dataset,
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    ds.backend = "memory"
+    ds.updater = None
+    ds.downloader = lambda: make_docs([("s3", "put_object")])
+    assert ds.refresh_index()
+    assert ds._path_prebuilt.exists() is False
+    assert ds.search_index("put~1")[0]["meth_ng"] == "put_object"
+    ds.close_searcher()
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.prebuilt", preview=False)
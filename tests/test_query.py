@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+from findref.query import preprocess_query
+
+
+def test_preprocess_query():
+    assert preprocess_query(None) == "*"
+    assert preprocess_query("") == "*"
+    assert preprocess_query("*") == "*"
+    assert preprocess_query("abc") == "abc~1"
+    assert preprocess_query("abc~2") == "abc~2"
+    assert preprocess_query("abc xyz") == "abc~1 xyz~1"
+    assert preprocess_query("abc~2 xyz") == "abc~2 xyz~1"
+    assert preprocess_query("a") == "*"
+    assert preprocess_query("a b c xyz") == "xyz~1"
+    assert preprocess_query("s3.put_obj") == "s3~1 put~1 obj~1"
+    assert preprocess_query("s*") == "s*~1"
+    assert preprocess_query("s?") == "s?~1"
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.query", preview=False)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+import dataclasses
+
+from findref.models import DataSetEnum, TfDocument, Boto3Record, Boto3Document
+from findref.records import RecordStore, get_row_class
+from findref.searcher import create_warm_dataset
+from findref.memindex import SearchBackendEnum
+
+
+def make_tf_doc(url: str, item: str, **kwargs) -> dict:
+    return dict(
+        url=url,
+        provider="aws",
+        type="resource",
+        cate_ng="S3",
+        item_ng=item,
+        desc="",
+        **kwargs,
+    )
+
+
+def test_record_store():
+    field_names = [field.name for field in dataclasses.fields(TfDocument)]
+    docs = [
+        (0, make_tf_doc("https://a", "aws_s3_bucket")),
+        # doc 1 is deleted
+        (2, make_tf_doc("https://b", "aws_s3_object", extra="ignored")),
+    ]
+    store = RecordStore.build(field_names, docs)
+    assert len(store) == 3
+    assert store.get(1, "url") is None
+    assert store.get(2, "item_ng") == "aws_s3_object"
+    assert store.to_dict(0) == docs[0][1]
+    # the repeated values are interned
+    assert store.columns["provider"][0] is store.columns["provider"][2]
+
+    row, row2 = store.rows(TfDocument, [0, 2])
+    assert isinstance(row, TfDocument)
+    assert type(row) is get_row_class(TfDocument)
+    assert row.to_dict() == docs[0][1]
+    assert row.title == TfDocument(**docs[0][1]).title
+    assert row.autocomplete == TfDocument(**docs[0][1]).autocomplete
+    assert row2.uid == "https://b"
+    # nothing is rendered without the document class
+    assert store.rendered == {}
+
+
+def test_rendered_fields():
+    field_names = [field.name for field in dataclasses.fields(TfDocument)]
+    dct = make_tf_doc("https://a", "aws_s3_bucket")
+    store = RecordStore.build(field_names, [(1, dct)], doc_class=TfDocument)
+    doc = TfDocument(**dct)
+    assert TfDocument.render_fields == ("title", "autocomplete")
+    assert doc.render() == {"title": doc.title, "autocomplete": doc.autocomplete}
+    assert store.rendered == {
+        "title": [None, doc.title],
+        "autocomplete": [None, doc.autocomplete],
+    }
+
+    (row,) = store.rows(TfDocument, [1])
+    assert row.render() == doc.render()
+    # the rows read the rendered values
+    store.rendered["title"][1] = "rendered title"
+    assert row.title == "rendered title"
+
+
+def make_docs():
+    return [
+        Boto3Record(
+            url=f"https://boto3.amazonaws.com/{service_id}/{method}.html",
+            type="client",
+            service_id=service_id,
+            service_name=service_id.upper(),
+            method=method,
+        )
+        .to_doc()
+        .to_dict()
+        for service_id in ["s3", "ec2"]
+        for method in ["put_object", "get_object", "list_objects"]
+    ]
+
+
+def test_search_ids(tmp_path):
+    for backend in SearchBackendEnum:
+        ds = create_warm_dataset(
+            dataset=DataSetEnum.boto3.value,
+            dir_index=tmp_path / backend.value / ".index",
+            dir_cache=tmp_path / backend.value / ".cache",
+        )
+        ds.updater = None
+        ds.prebuilt_downloader = None
+        ds.backend = backend.value
+        ds.downloader = make_docs
+        ds.refresh_index()
+
+        for query in ["s3~1 put~1", "object~1", "*"]:
+            expected = ds.search_index(query=query, limit=3)
+            store, doc_ids = ds.search_ids(query=query, limit=3)
+            assert [store.to_dict(doc_id) for doc_id in doc_ids] == expected
+            store, doc_ids = ds.incremental.search_ids(query=query, limit=3)
+            assert [store.to_dict(doc_id) for doc_id in doc_ids] == expected
+            rows = store.rows(Boto3Document, doc_ids)
+            assert store.doc_class is Boto3Document
+            assert [row.title for row in rows] == [
+                Boto3Document(**dct).title for dct in expected
+            ]
+
+        # the store is reloaded after the index is rebuilt
+        store = ds.get_record_store()
+        assert ds.get_record_store() is store
+        ds.refresh_index()
+        assert ds.get_record_store() is not store
+        ds.close_searcher()
+
+
+def test_search_ids_during_rebuild(tmp_path):
+    def new_dataset():
+        ds = create_warm_dataset(
+            dataset=DataSetEnum.boto3.value,
+            dir_index=tmp_path / ".index",
+            dir_cache=tmp_path / ".cache",
+        )
+        ds.updater = None
+        ds.prebuilt_downloader = None
+        return ds
+
+    ds = new_dataset()
+    ds.downloader = lambda: make_docs()[:2]
+    ds.refresh_index(multi_thread=False)
+    parse_query = ds._parse_query
+
+    def commit_then_parse(query):
+        # another process commits a new generation while we are searching
+        other = new_dataset()
+        other.downloader = lambda: make_docs()[::-1]
+        other.refresh_index(multi_thread=False)
+        return parse_query(query)
+
+    ds._parse_query = commit_then_parse
+    for search_ids in [ds.search_ids, ds.incremental.search_ids]:
+        ds.close_searcher()
+        store, doc_ids = search_ids(query="s3~1", limit=10)
+        # the doc ids belong to the store, whichever generation it is
+        assert len(doc_ids) > 0
+        assert all(doc_id < len(store) for doc_id in doc_ids)
+        assert {store.get(doc_id, "srv_id_ng") for doc_id in doc_ids} == {"s3"}
+    ds.close_searcher()
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.records", preview=False)
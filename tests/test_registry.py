@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+from findref.models import DataSetEnum
+from findref.registry import DataSetRegistry
+
+
+def test_registry(tmp_path):
+    registry = DataSetRegistry(
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    assert registry.is_warm(DataSetEnum.boto3) is False
+
+    ds1 = registry.get(DataSetEnum.boto3)
+    ds2 = registry.get(DataSetEnum.boto3)
+    assert ds1 is ds2
+    assert registry.is_warm(DataSetEnum.boto3) is True
+
+    ds3 = registry.get(DataSetEnum.tf)
+    assert ds3 is not ds1
+    assert ds3.cache is ds1.cache
+
+    registry.invalidate(DataSetEnum.boto3)
+    assert registry.is_warm(DataSetEnum.boto3) is False
+    assert registry.is_warm(DataSetEnum.tf) is True
+    assert registry.get(DataSetEnum.boto3) is not ds1
+
+    registry.invalidate()
+    assert registry.is_warm(DataSetEnum.tf) is False
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.registry", preview=False)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from findref.models import DataSetEnum
+from findref.router import (
+    get_trigrams,
+    rank_datasets,
+    resolve,
+    detect_dataset,
+)
+
+
+def test_get_trigrams():
+    assert get_trigrams("tf") == {"  t", " tf", "tf "}
+
+
+def test_rank_datasets():
+    assert rank_datasets("") == [ds.value for ds in DataSetEnum]
+    assert rank_datasets("airflow")[0] == DataSetEnum.airflow.value
+    assert rank_datasets("bot")[0] == DataSetEnum.boto3.value
+    assert rank_datasets("panda")[0] == DataSetEnum.pandas.value
+    assert rank_datasets("cfn")[0] == DataSetEnum.aws_cloudformation.value
+    assert rank_datasets("terra")[0] == DataSetEnum.tf.value
+    assert set(rank_datasets("cdk")[:2]) == {
+        DataSetEnum.cdk_python.value,
+        DataSetEnum.cdk_ts.value,
+    }
+    assert len(rank_datasets("xyz")) == len(DataSetEnum)
+
+
+def test_resolve():
+    assert resolve("boto3") == DataSetEnum.boto3.value
+    assert resolve("CFN") == DataSetEnum.aws_cloudformation.value
+    assert resolve("terraform") == DataSetEnum.tf.value
+    # ambiguous alias
+    assert resolve("cdk") is None
+    assert resolve("s3") is None
+
+
+def test_detect_dataset():
+    assert detect_dataset(["boto3", "s3"]) == (DataSetEnum.boto3.value, ["s3"])
+    assert detect_dataset(["s3", "boto3"]) == (DataSetEnum.boto3.value, ["s3"])
+    assert detect_dataset(["bucket", "cfn", "policy"]) == (
+        DataSetEnum.aws_cloudformation.value,
+        ["bucket", "policy"],
+    )
+    assert detect_dataset(["cdk", "bucket"]) is None
+    assert detect_dataset(["s3", "bucket"]) is None
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.router", preview=False)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+import typing as T
+import dataclasses
+
+import pytest
+import sayt.api as sayt
+
+from findref.models import (
+    BaseRecord,
+    CommonDocument,
+    DataSetEnum,
+    Boto3Record,
+    Boto3Document,
+    get_schema,
+    get_fields,
+    get_doc_class,
+)
+from findref.schema import (
+    attr,
+    text,
+    ngram,
+    keyword,
+    compile_schema,
+    format_field_sizes,
+)
+from findref.searcher import create_warm_dataset
+
+
+@dataclasses.dataclass
+class NoteRecord(BaseRecord):
+    url: str = attr("url")
+    kind: str = attr("kind", keyword(boost=2.0, lowercase=True))
+    name: str = attr("name", text(tokenify=True), ngram(maxsize=4))
+    body: T.Optional[str] = attr("body", text())
+
+
+note_schema = compile_schema(
+    dataset="note",
+    record_class=NoteRecord,
+    doc_name="NoteDocument",
+    doc_base=CommonDocument,
+    title=lambda doc: doc.name_ng,
+    backend="whoosh",
+)
+
+
+def test_compile_schema():
+    assert NoteRecord.schema is note_schema
+    assert note_schema.stored_names == ["url", "kind", "name_ng", "body"]
+    assert [(type(field).__name__, field.name) for field in note_schema.fields] == [
+        ("StoredField", "url"),
+        ("KeywordField", "kind"),
+        ("TextField", "name"),
+        ("NgramWordsField", "name_ng"),
+        ("TextField", "body"),
+    ]
+    # each value is stored once
+    stored = [
+        field.name
+        for field in note_schema.fields
+        if isinstance(field, sayt.StoredField) or field.stored
+    ]
+    assert stored == note_schema.stored_names
+    kind, name_ng = note_schema.fields[1], note_schema.fields[3]
+    assert (kind.field_boost, kind.lowercase) == (2.0, True)
+    assert (name_ng.minsize, name_ng.maxsize) == (2, 4)
+
+    NoteDocument = note_schema.doc_class
+    assert NoteDocument.__name__ == "NoteDocument"
+    assert issubclass(NoteDocument, CommonDocument)
+    assert ":param name_ng: same as :attr:`NoteRecord.name`" in NoteDocument.__doc__
+    doc = NoteRecord(url="u", kind="Howto", name="git.rebase", body=None).to_doc()
+    assert doc.to_dict() == dict(url="u", kind="Howto", name_ng="git.rebase", body=None)
+    assert doc.title == "git.rebase"
+    assert note_schema.mapper_entry["doc_class"] is NoteDocument
+
+
+def test_compile_schema_error():
+    @dataclasses.dataclass
+    class BadRecord(BaseRecord):
+        url: str = dataclasses.field()
+
+    with pytest.raises(TypeError):
+        compile_schema(
+            dataset="bad",
+            record_class=BadRecord,
+            doc_name="BadDocument",
+            doc_base=CommonDocument,
+            title=lambda doc: doc.url,
+            backend="whoosh",
+        )
+
+    @dataclasses.dataclass
+    class TokenifiedRecord(BaseRecord):
+        desc: str = attr("desc", text(tokenify=True))
+
+    # the tokenified text field and the stored field have the same name
+    with pytest.raises(ValueError):
+        compile_schema(
+            dataset="bad",
+            record_class=TokenifiedRecord,
+            doc_name="TokenifiedDocument",
+            doc_base=CommonDocument,
+            title=lambda doc: doc.desc,
+            backend="whoosh",
+        )
+
+
+def test_to_index_doc():
+    doc = NoteRecord(url="u", kind="howto", name="git.rebase", body="a-b").to_doc()
+    assert note_schema.to_index_doc(doc.to_dict()) == dict(
+        url="u",
+        kind="howto",
+        name_ng="git.rebase",
+        body="a-b",
+        name="git rebase",
+    )
+    # the derived fields of the old documents are ignored and recomputed
+    legacy = dict(url="u", kind="howto", name="stale", name_ng="git", extra=1)
+    assert note_schema.to_index_doc(legacy) == dict(
+        url="u",
+        kind="howto",
+        name_ng="git",
+        body=None,
+        name="git",
+    )
+
+
+def test_dataset_schema():
+    for dataset in DataSetEnum:
+        schema = get_schema(dataset.value)
+        assert schema.fields is get_fields(dataset.value)
+        assert schema.doc_class is get_doc_class(dataset.value)
+        field_names = [field.name for field in dataclasses.fields(schema.doc_class)]
+        assert field_names == schema.stored_names
+
+    doc = Boto3Record(
+        url="u",
+        type="client",
+        service_id="s3",
+        service_name="S3",
+        method="put_object",
+    ).to_doc()
+    assert isinstance(doc, Boto3Document)
+    index_doc = get_schema(DataSetEnum.boto3.value).to_index_doc(doc.to_dict())
+    assert index_doc["meth"] == "put object"
+
+
+def test_get_field_sizes(tmp_path):
+    ds = create_warm_dataset(
+        dataset=DataSetEnum.boto3.value,
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    ds.updater = None
+    ds.prebuilt_downloader = None
+    ds.downloader = lambda: [
+        Boto3Record(
+            url=f"https://boto3.amazonaws.com/{method}.html",
+            type="client",
+            service_id="s3",
+            service_name="S3",
+            method=method,
+        )
+        .to_doc()
+        .to_dict()
+        for method in ["put_object", "get_object"]
+    ]
+    ds.refresh_index()
+    docs = ds.search_index(query="put object", limit=3)
+    assert [doc["meth_ng"] for doc in docs] == ["put_object"]
+
+    sizes = {size.name: size for size in ds.get_field_sizes()}
+    assert list(sizes) == [field.name for field in ds.fields]
+    assert sizes["url"].stored and sizes["url"].n_terms == 0
+    assert sizes["url"].stored_bytes > 0
+    assert sizes["meth"].stored is False
+    assert sizes["meth"].stored_bytes == 0
+    # put, get, object
+    assert (sizes["meth"].n_terms, sizes["meth"].n_postings) == (3, 4)
+    assert sizes["srv_id"].n_postings == 2
+    assert sizes["meth_ng"].n_terms > sizes["meth"].n_terms
+    assert sizes["meth_ng"].stored_bytes == len('"put_object""get_object"')
+    report = format_field_sizes(DataSetEnum.boto3.value, list(sizes.values()))
+    assert report.startswith("boto3:")
+    assert "meth_ng" in report
+    ds.close_searcher()
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.schema", preview=False)
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+import dataclasses
+
+import pytest
+import sayt.api as sayt
+from sayt.tracker import TrackerIsLockedError
+
+from findref.models import (
+    DataSetEnum,
+    Boto3Record,
+    Metadata,
+    Release,
+    ReleaseDelta,
+    DataSetUpdate,
+    Boto3Document,
+    get_fields,
+    get_schema,
+)
+from findref.searcher import create_warm_dataset
+
+
+def make_docs(methods):
+    return [
+        Boto3Record(
+            url=f"https://boto3.amazonaws.com/{method}.html",
+            type="client",
+            service_id="s3",
+            service_name="S3",
+            method=method,
+        )
+        .to_doc()
+        .to_dict()
+        for method in methods
+    ]
+
+
+def test_warm_dataset(tmp_path):
+    methods = ["put_object", "get_object"]
+    ds = create_warm_dataset(
+        dataset=DataSetEnum.boto3,
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    ds.downloader = lambda: make_docs(methods)
+
+    res = ds.search("put~1", refresh_data=True)
+    assert len(res) == 1
+    assert res[0]["meth_ng"] == "put_object"
+
+    searcher = ds.get_searcher()
+    res = ds.search("get~1")
+    assert res[0]["meth_ng"] == "get_object"
+    assert ds.get_searcher() is searcher
+
+    # rebuild the index, the searcher is reopened
+    methods = ["delete_object"]
+    res = ds.search("delete~1", refresh_data=True)
+    assert res[0]["meth_ng"] == "delete_object"
+    assert ds.get_searcher() is not searcher
+
+    ds.close_searcher()
+    assert ds._searcher is None
+
+
+def test_refresh_index_with_updater(tmp_path):
+    ds = create_warm_dataset(
+        dataset=DataSetEnum.boto3,
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    metadata = Metadata(dataset_name=DataSetEnum.boto3)
+    v1 = Release(metadata=metadata, docs=make_docs(["put_object", "get_object"]))
+    v2 = Release(metadata=metadata, docs=make_docs(["put_object", "list_objects"]))
+    v2.docs[0]["srv_ng"] = "Amazon S3"
+    calls = []
+
+    def updater(current_tag):
+        calls.append(current_tag)
+        if current_tag is None:
+            return DataSetUpdate(tag="v1", docs=iter(v1.docs))
+        elif current_tag == "v1":
+            delta = ReleaseDelta.from_releases(v1, v2, from_tag="v1", to_tag="v2")
+            return DataSetUpdate(tag="v2", delta=delta)
+        else:
+            return DataSetUpdate(tag="v2")
+
+    ds.updater = updater
+
+    # full build
+    progress = []
+    assert ds.refresh_index(on_progress=lambda *args: progress.append(args))
+    assert progress[-1] == (2, None)
+    assert ds.read_state() == {"tag": "v1"}
+    assert ds.is_fresh()
+    assert ds.search_index("get~1")[0]["meth_ng"] == "get_object"
+
+    # incremental update
+    assert ds.refresh_index()
+    assert ds.read_state() == {"tag": "v2"}
+    assert ds.search_index("get~1") == []
+    assert ds.search_index("list~1")[0]["meth_ng"] == "list_objects"
+    assert ds.search_index("put~1")[0]["srv_ng"] == "Amazon S3"
+    assert ds.get_searcher().doc_count() == 2
+
+    # a broken delta doesn't leave the index locked
+    broken = ReleaseDelta.from_releases(v2, v1, from_tag="v2", to_tag="v3")
+    broken.upserts.append({"meth_ng": "no_url"})
+    # keep the traceback alive like the background builder does
+    with pytest.raises(KeyError) as excinfo:
+        ds._apply_delta(broken)
+    assert ds.search_index("list~1")[0]["meth_ng"] == "list_objects"
+    ds._apply_delta(ReleaseDelta.from_releases(v2, v2, from_tag="v2", to_tag="v2"))
+    del excinfo
+
+    # already up to date
+    ds.remove_cache()
+    assert ds.is_fresh() is False
+    assert ds.refresh_index()
+    assert ds.is_fresh()
+    assert calls == [None, "v1", "v2"]
+
+
+
+def test_refresh_index_download_failed(tmp_path):
+    ds = create_warm_dataset(
+        dataset=DataSetEnum.boto3.value,
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    ds.updater = None
+    ds.prebuilt_downloader = None
+    ds.downloader = lambda: make_docs(["put_object"])
+    assert ds.refresh_index(multi_thread=False)
+
+    def downloader():
+        yield from make_docs(["get_object"])
+        raise ConnectionError("network dropped")
+
+    errors = []
+    for multi_thread in [False, True]:
+        ds.downloader = downloader
+        # keep the traceback alive like the background builder does
+        with pytest.raises(ConnectionError) as excinfo:
+            ds.refresh_index(multi_thread=multi_thread)
+        errors.append(excinfo)
+        # the old index is kept
+        assert ds.search_index("put~1")[0]["meth_ng"] == "put_object"
+        assert ds.search_index("get~1") == []
+
+    # the whoosh write lock is released, the retry succeeds
+    ds.downloader = lambda: make_docs(["get_object"])
+    assert ds.refresh_index(multi_thread=False)
+    assert ds.search_index("get~1")[0]["meth_ng"] == "get_object"
+    ds.close_searcher()
+
+
+def test_index_built_with_old_schema(tmp_path):
+    # the schema before the derived fields were unstored
+    old_fields = [
+        (
+            field
+            if isinstance(field, sayt.StoredField)
+            else dataclasses.replace(field, stored=True)
+        )
+        for field in get_fields(DataSetEnum.boto3.value)
+    ]
+    schema = get_schema(DataSetEnum.boto3.value)
+    old_ds = sayt.DataSet(
+        dir_index=tmp_path / ".index",
+        index_name="findref-boto3",
+        fields=old_fields,
+        dir_cache=tmp_path / ".cache",
+        cache_key="findref-boto3",
+        cache_tag="findref-boto3",
+        cache_expire=3600,
+        downloader=lambda: [
+            schema.to_index_doc(doc) for doc in make_docs(["put_object"])
+        ],
+    )
+    assert old_ds.search("put~1", refresh_data=True)[0]["meth"] == "put object"
+    old_ds.cache.close()
+
+    ds = create_warm_dataset(
+        dataset=DataSetEnum.boto3.value,
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    ds.updater = None
+    ds.prebuilt_downloader = None
+    ds.downloader = lambda: make_docs(["put_object", "get_object"])
+    assert ds.has_index()
+    assert ds._has_compatible_index() is False
+    # the old index is not fresh, so it is rebuilt
+    assert ds.is_fresh() is False
+    # it keeps serving queries until then, the old stored keys are ignored
+    res = ds.search_index("put~1")
+    assert res[0]["meth"] == "put object"
+    assert Boto3Document.from_dict(res[0]).meth_ng == "put_object"
+
+    assert ds.refresh_index(multi_thread=False)
+    assert ds._has_compatible_index()
+    assert ds.is_fresh()
+    res = ds.search_index("get~1")
+    assert sorted(res[0]) == sorted(schema.stored_names)
+    ds.close_searcher()
+
+
+def test_single_flight_refresh(tmp_path):
+    def new_dataset():
+        ds = create_warm_dataset(
+            dataset=DataSetEnum.boto3,
+            dir_index=tmp_path / ".index",
+            dir_cache=tmp_path / ".cache",
+        )
+        ds.updater = None
+        ds.prebuilt_downloader = None
+        ds.downloader = downloader
+        return ds
+
+    started, resume = threading.Event(), threading.Event()
+    calls = []
+
+    def downloader():
+        calls.append(1)
+        started.set()
+        assert resume.wait(timeout=10)
+        return make_docs(["put_object"])
+
+    # two findref processes share the index directory
+    ds1, ds2 = new_dataset(), new_dataset()
+    results = {}
+    waits = []
+    waiting = threading.Event()
+
+    def on_wait(pid):
+        waits.append(pid)
+        waiting.set()
+
+    thread1 = threading.Thread(
+        target=lambda: results.setdefault(1, ds1.refresh_index(multi_thread=False))
+    )
+    thread1.start()
+    assert started.wait(timeout=10)
+
+    with pytest.raises(TrackerIsLockedError):
+        ds2.refresh_index(raise_lock_error=True)
+    assert ds2.refresh_index(lock_timeout=0.05, on_wait=waits.append) is False
+    assert waits == [os.getpid()]
+    waits.clear()
+
+    thread2 = threading.Thread(
+        target=lambda: results.setdefault(
+            2, ds2.refresh_index(multi_thread=False, on_wait=on_wait)
+        )
+    )
+    thread2.start()
+    assert waiting.wait(timeout=10)
+    resume.set()
+    thread1.join(timeout=10)
+    thread2.join(timeout=10)
+
+    # only the first one downloaded and built the index, the other waited
+    assert results == {1: True, 2: False}
+    assert calls == [1]
+    assert waits == [os.getpid()]
+    assert ds1.read_build_generation() == ds2.read_build_generation() == 1
+    assert ds2.is_fresh()
+    assert ds2.search_index("put~1")[0]["meth_ng"] == "put_object"
+
+    # nobody else is building, so the next refresh builds again
+    assert ds2.refresh_index(multi_thread=False)
+    assert calls == [1, 1]
+    assert ds1.read_build_generation() == 2
+    assert ds1.build_index(make_docs(["get_object"]), multi_thread=False)
+    assert ds1.read_build_generation() == 3
+    ds1.close_searcher()
+    ds2.close_searcher()
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.searcher", preview=False)
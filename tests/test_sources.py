@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+
+import pytest
+
+from findref import models
+from findref.models import DataSetEnum, Metadata, Release, Boto3Record
+from findref.sources import (
+    AssetNotFoundError,
+    ChecksumMismatchError,
+    GitHubReleaseSource,
+    MirrorReleaseSource,
+    parse_checksums,
+    format_checksums,
+    get_release_source,
+    mirror,
+)
+
+
+def make_docs(methods):
+    return [
+        Boto3Record(
+            url=f"https://boto3.amazonaws.com/{method}.html",
+            type="client",
+            service_id="s3",
+            service_name="S3",
+            method=method,
+        )
+        .to_doc()
+        .to_dict()
+        for method in methods
+    ]
+
+
+def make_upstream(dir_root, tag_name="v1"):
+    """
+    A mirror with a compressed boto3 release and a JSON tf release.
+    """
+    dir_tag = dir_root / tag_name
+    dir_tag.mkdir(parents=True)
+    boto3 = Release(metadata=Metadata(dataset_name="boto3"), docs=make_docs(["put"]))
+    tf = Release(metadata=Metadata(dataset_name="tf"), docs=[])
+    (dir_tag / "boto3-LATEST.frr").write_bytes(boto3.to_compressed_binary())
+    (dir_tag / "tf-LATEST.json").write_bytes(tf.to_binary())
+    (dir_root / "LATEST").write_text(f"{tag_name}\n")
+    checksums = {
+        path.name: hashlib.sha256(path.read_bytes()).hexdigest()
+        for path in dir_tag.iterdir()
+    }
+    (dir_tag / "SHA256SUMS").write_text(format_checksums(checksums))
+    return MirrorReleaseSource(root=str(dir_root))
+
+
+def test_parse_checksums():
+    checksums = {"b.frr": "ab" * 32, "a.json": "cd" * 32}
+    text = format_checksums(checksums)
+    assert text.splitlines()[0].endswith("  a.json")
+    assert parse_checksums(text) == checksums
+
+
+def test_get_release_source(tmp_path):
+    assert isinstance(get_release_source(""), GitHubReleaseSource)
+    source = get_release_source(f"file://{tmp_path}")
+    assert source.root == str(tmp_path)
+    assert source.is_http is False
+    assert get_release_source(str(tmp_path)).root == str(tmp_path)
+    assert get_release_source("https://mirror.example.com/findref").is_http
+
+
+def test_mirror(tmp_path, monkeypatch):
+    upstream = make_upstream(tmp_path / "upstream")
+    dir_mirror = tmp_path / "mirror"
+    tag_name = mirror(
+        dir_mirror,
+        datasets=["boto3", "tf", "pandas"],
+        source=upstream,
+        echo=lambda _: None,
+    )
+    assert tag_name == "v1"
+    assert (dir_mirror / "LATEST").read_text().strip() == "v1"
+    checksums = parse_checksums((dir_mirror / "v1" / "SHA256SUMS").read_text())
+    assert set(checksums) == {"boto3-LATEST.frr", "tf-LATEST.json"}
+    assert list(dir_mirror.rglob("*.tmp")) == []
+
+    # index from the mirror, no network
+    monkeypatch.setenv("FINDREF_RELEASE_SOURCE", f"file://{dir_mirror}")
+    assert models.get_latest_tag() == "v1"
+    docs = list(models.iter_dataset_data(DataSetEnum.boto3.value))
+    assert [doc["meth_ng"] for doc in docs] == ["put"]
+    assert list(models.iter_dataset_data(DataSetEnum.tf.value)) == []
+    update = models.get_dataset_update(DataSetEnum.boto3.value, current_tag="v0")
+    assert update.tag == "v1"
+    assert len(list(update.docs)) == 1
+    with pytest.raises(AssetNotFoundError):
+        list(models.iter_dataset_data(DataSetEnum.pandas.value))
+
+    # a corrupted asset
+    path = dir_mirror / "v1" / "boto3-LATEST.frr"
+    binary = path.read_bytes()
+    path.write_bytes(binary[:-1] + bytes([binary[-1] ^ 0xFF]))
+    with pytest.raises(Exception):
+        list(models.iter_dataset_data(DataSetEnum.boto3.value))
+    with pytest.raises(ChecksumMismatchError):
+        with MirrorReleaseSource(root=str(dir_mirror)).open("v1", path.name) as f:
+            f.read()
+
+    # a mirror without checksums
+    (dir_mirror / "v1" / "SHA256SUMS").unlink()
+    with pytest.raises(ChecksumMismatchError):
+        MirrorReleaseSource(root=str(dir_mirror)).open("v1", path.name)
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.sources", preview=False)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+from findref.startup import (
+    parse_importtime,
+    is_heavy,
+    profile_startup,
+    report,
+)
+
+
+def test_parse_importtime():
+    text = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       183 |        183 |     findref._version",
+            "import time:       286 |        469 |   findref",
+            "import time:      7319 |     160094 | findref.ui",
+        ]
+    )
+    records = parse_importtime(text)
+    assert [record.module for record in records] == [
+        "findref._version",
+        "findref",
+        "findref.ui",
+    ]
+    assert [record.depth for record in records] == [2, 1, 0]
+    assert records[-1].self_us == 7319
+    assert records[-1].cumulative_us == 160094
+
+
+def test_is_heavy():
+    assert is_heavy("whoosh")
+    assert is_heavy("whoosh.query")
+    assert is_heavy("findref.models")
+    assert is_heavy("whooshy") is False
+    assert is_heavy("findref.ui") is False
+
+
+def test_profile_startup():
+    profile = profile_startup()
+    # the search engine modules are imported on first search
+    assert profile.heavy_modules == []
+    assert "findref.ui" in {record.module for record in profile.imports}
+    assert "time to first screen" in report(profile, n=5)
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.startup", preview=False)
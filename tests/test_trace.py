@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from findref.trace import Tracer
+
+
+def test_tracer_disabled():
+    tracer = Tracer.from_env({})
+    assert tracer.enabled is False
+    with tracer.query("boto3", "s3"):
+        with tracer.span("search"):
+            pass
+    tracer.incr("result_cache.hit")
+    assert tracer.snapshot() == {"stages": {}, "counters": {}, "recent": []}
+    assert tracer.last is None
+    assert tracer.export() is None
+
+
+def test_tracer(tmp_path):
+    path = tmp_path / "trace.json"
+    tracer = Tracer.from_env({"FINDREF_TRACE": str(path)})
+    assert tracer.enabled is True
+    assert Tracer.from_env({"FINDREF_TRACE": "1"}).path_export is None
+
+    for query in ["s3", "s3 put"]:
+        with tracer.query("boto3", query):
+            with tracer.span("preprocess"):
+                pass
+            for _ in range(2):
+                with tracer.span("search"):
+                    pass
+    tracer.incr("result_cache.miss", 2)
+    # not in a query
+    with tracer.span("search"):
+        pass
+
+    assert tracer.stages["search"].count == 5
+    assert tracer.stages["preprocess"].count == 2
+    assert tracer.counters == {"result_cache.miss": 2}
+    last = tracer.last
+    assert last.query == "s3 put"
+    assert list(last.stages) == ["preprocess", "search"]
+    assert last.total >= last.stages["search"]
+    assert last.summary().startswith("preprocess ")
+
+    assert tracer.export() == path
+    data = json.loads(path.read_text())
+    assert data["stages"]["search"]["count"] == 5
+    assert [trace["query"] for trace in data["recent"]] == ["s3", "s3 put"]
+
+    tracer.reset()
+    assert tracer.last is None
+
+
+def test_ring_buffer():
+    tracer = Tracer(enabled=True, ring_size=2)
+    for query in ["a", "b", "c"]:
+        with tracer.query("tf", query):
+            pass
+    assert [trace.query for trace in tracer.recent] == ["b", "c"]
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.trace", preview=False)
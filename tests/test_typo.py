@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+
+from findref.models import DataSetEnum, Boto3Record
+from findref.searcher import create_warm_dataset
+from findref.typo import iter_deletes, is_within_one_edit, TypoDictionary
+
+
+def osa_distance(a, b):
+    d = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a) + 1):
+        d[i][0] = i
+    for j in range(len(b) + 1):
+        d[0][j] = j
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[len(a)][len(b)]
+
+
+def test_is_within_one_edit():
+    assert list(iter_deletes("abc")) == ["bc", "ac", "ab"]
+    words = [
+        "".join(chars) for n in range(5) for chars in itertools.product("ab", repeat=n)
+    ]
+    words.extend(["abc", "acb", "bac", "abcd", "abdc"])
+    for a in words:
+        for b in words:
+            assert is_within_one_edit(a, b) == (osa_distance(a, b) <= 1), (a, b)
+
+
+def test_typo_dictionary(tmp_path):
+    dictionary = TypoDictionary.build(
+        ["object", "objects", "bucket", "put", "s3", "Policy"],
+        fields=["meth"],
+    )
+    assert "s3" not in dictionary.words
+    assert dictionary.lookup("objct") == ["object"]
+    assert dictionary.lookup("object") == ["object", "objects"]
+    assert dictionary.lookup("bukcet") == ["bucket"]
+    assert dictionary.lookup("plicy") == ["policy"]
+    assert dictionary.lookup("pt") == []
+    assert dictionary.lookup("xyz") == []
+
+    assert dictionary.expand_query("s3~1 objct~1 bucket~1") == (
+        "s3 (objct OR meth:object) bucket"
+    )
+    assert dictionary.expand_query("put~2 pu*~1 xyz~1") == "put~2 pu*~1 xyz"
+
+    path = tmp_path / "typo.json"
+    dictionary.dump(path, metadata={"signature": [1, 2]})
+    dictionary1, metadata = TypoDictionary.load(path)
+    assert dictionary1 == dictionary
+    assert metadata == {"signature": [1, 2]}
+
+
+def test_warm_dataset_typo_dictionary(tmp_path):
+    ds = create_warm_dataset(
+        dataset=DataSetEnum.boto3.value,
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    assert ds.get_typo_dictionary() is None
+    ds.updater = None
+    ds.downloader = lambda: [
+        Boto3Record(
+            url=f"https://boto3.amazonaws.com/{method}.html",
+            type="client",
+            service_id="s3",
+            service_name="S3",
+            method=method,
+        )
+        .to_doc()
+        .to_dict()
+        for method in ["put_object", "get_bucket_policy"]
+    ]
+    ds.refresh_index()
+    dictionary = ds.get_typo_dictionary()
+    assert "policy" in dictionary.words
+    assert ds.get_typo_dictionary() is dictionary
+    assert ds.search_index("plicy~1")[0]["meth_ng"] == "get_bucket_policy"
+    assert ds.search_index("s3~1 objetc~1")[0]["meth_ng"] == "put_object"
+
+    # the dictionary doesn't belong to the index on disk, whoosh expands it
+    text = ds._path_typo.read_text()
+    ds._path_typo.write_text(text.replace('"signature":[', '"signature":[-1,'))
+    ds._typo_dictionary_signature = None
+    assert ds.get_typo_dictionary() is None
+    ds.remove_cache()
+    assert ds.search_index("plicy~1")[0]["meth_ng"] == "get_bucket_policy"
+    ds.close_searcher()
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.typo", preview=False)
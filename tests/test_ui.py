@@ -1,29 +1,101 @@
 # -*- coding: utf-8 -*-
 
+import time
+import queue
+import threading
 from pprint import pprint
+
+import pytest
 import zelfred.api as zf
-from findref.models import DataSetEnum
+from zelfred import events
+from findref.models import DataSetEnum, Boto3Record
+from findref.searcher import create_warm_dataset
 from findref.ui import (
-    preprocess_query,
+    result_cache,
+    search,
     handler,
+    UIEventQueue,
     handler_for_selecting_dataset as hdl1,
     handler_for_searching_reference as hdl2,
 )
 
 
-def test_preprocess_query():
-    assert preprocess_query(None) == "*"
-    assert preprocess_query("") == "*"
-    assert preprocess_query("*") == "*"
-    assert preprocess_query("abc") == "abc~1"
-    assert preprocess_query("abc~2") == "abc~2"
-    assert preprocess_query("abc xyz") == "abc~1 xyz~1"
-    assert preprocess_query("abc~2 xyz") == "abc~2 xyz~1"
-    assert preprocess_query("a") == "*"
-    assert preprocess_query("a b c xyz") == "xyz~1"
-    assert preprocess_query("s3.put_obj") == "s3~1 put~1 obj~1"
-    assert preprocess_query("s*") == "s*~1"
-    assert preprocess_query("s?") == "s?~1"
+def test_search_result_cache(tmp_path):
+    ds = create_warm_dataset(
+        dataset=DataSetEnum.boto3.value,
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    ds.updater = None
+    ds.downloader = lambda: [
+        Boto3Record(
+            url="https://boto3.amazonaws.com/put_object.html",
+            type="client",
+            service_id="s3",
+            service_name="S3",
+            method="put_object",
+        )
+        .to_doc()
+        .to_dict()
+    ]
+    result_cache.invalidate()
+    items1 = search("boto3", ds, "put~1", limit=3)
+    items2 = search("boto3", ds, "put~1", limit=3)
+    assert items1 is items2
+    assert len(items1) == 1
+    assert result_cache.hits >= 1
+
+    # a new dataset object after refresh, the cached items are ignored
+    ds.close_searcher()
+    ds1 = create_warm_dataset(
+        dataset=DataSetEnum.boto3.value,
+        dir_index=tmp_path / ".index",
+        dir_cache=tmp_path / ".cache",
+    )
+    assert search("boto3", ds1, "put~1", limit=3) is not items1
+
+    # refresh_data invalidates the dataset
+    result_cache.invalidate()
+    search("boto3", ds1, "put~1", limit=3)
+    ds1.updater = None
+    ds1.downloader = ds.downloader
+    search("boto3", ds1, "get~1", limit=3, refresh_data=True)
+    assert ("boto3", "put~1", 3) not in result_cache
+    ds1.close_searcher()
+
+
+def test_event_queue():
+    keys = queue.Queue()
+    n_reads = list()
+
+    def read_key():
+        n_reads.append(1)
+        key = keys.get(timeout=10)
+        if key is None:
+            raise KeyboardInterrupt
+        return key
+
+    event_queue = UIEventQueue(events.KeyEventGenerator(key_generator=read_key))
+    # the requests posted before the loop takes one are merged
+    event_queue.post_repaint()
+    event_queue.post_repaint()
+    assert isinstance(event_queue.next(), events.RepaintEvent)
+    thread = threading.Thread(target=event_queue.post_repaint)
+    thread.start()
+    thread.join()
+    assert isinstance(event_queue.next(), events.RepaintEvent)
+    keys.put("a")
+    assert event_queue.next().value == "a"
+    # no key is read until the loop asks for the next one
+    time.sleep(0.05)
+    assert len(n_reads) == 1
+    # the error of the reader thread is raised in the loop thread
+    keys.put(None)
+    with pytest.raises(KeyboardInterrupt):
+        event_queue.next()
+    keys.put("b")
+    assert event_queue.next().value == "b"
+    assert len(n_reads) == 3
 
 
 def test_ui():
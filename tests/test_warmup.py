@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+from findref.models import DataSetEnum, Boto3Record, DataSetUpdate
+from findref.searcher import create_warm_dataset
+from findref.warmup import warmup
+
+
+def make_docs(methods):
+    return [
+        Boto3Record(
+            url=f"https://boto3.amazonaws.com/{method}.html",
+            type="client",
+            service_id="s3",
+            service_name="S3",
+            method=method,
+        )
+        .to_doc()
+        .to_dict()
+        for method in methods
+    ]
+
+
+def get_dataset_update(dataset, current_tag=None):
+    if dataset == DataSetEnum.tf:
+        raise ConnectionError("tf is not available")
+    return DataSetUpdate(tag="v1", docs=make_docs(["put_object", "get_object"]))
+
+
+def test_warmup(tmp_path):
+    dir_index = tmp_path / ".index"
+    dir_cache = tmp_path / ".cache"
+    messages = []
+    results = warmup(
+        datasets=[DataSetEnum.boto3, DataSetEnum.tf],
+        processes=2,
+        dir_index=dir_index,
+        dir_cache=dir_cache,
+        echo=messages.append,
+        updater=get_dataset_update,
+    )
+    assert [result.dataset for result in results] == ["boto3", "tf"]
+    assert results[0].is_succeeded
+    assert results[0].n_indexed == 2
+    assert results[1].is_succeeded is False
+    assert "tf is not available" in results[1].error
+    assert "1 succeeded, 1 failed" in messages[-1]
+
+    ds = create_warm_dataset(DataSetEnum.boto3.value, dir_index, dir_cache)
+    assert ds.is_fresh()
+    assert ds.search_index("put~1")[0]["meth_ng"] == "put_object"
+
+
+if __name__ == "__main__":
+    from findref.tests import run_cov_test
+
+    run_cov_test(__file__, "findref.warmup", preview=False)